@@ -0,0 +1,368 @@
+#!/usr/bin/env python3
+import fnmatch
+import json
+import os
+import socket
+import threading
+import time
+import urllib.request
+from collections import deque
+from datetime import datetime
+from result_store import parse_timestamp
+from rollups import extract_metrics
+from latency_engine import percentile
+
+OPERATORS = {
+    ">": lambda v, t: v > t,
+    ">=": lambda v, t: v >= t,
+    "<": lambda v, t: v < t,
+    "<=": lambda v, t: v <= t
+}
+AGGREGATES = {
+    "last": lambda values: values[-1],
+    "avg": lambda values: sum(values) / len(values),
+    "min": min,
+    "max": max,
+    "p95": lambda values: percentile(values, 95),
+    "count": len
+}
+# Nagios Return-Codes für passive Checks
+NAGIOS_CODES = {"resolved": 0, "warning": 1, "critical": 2}
+MAX_PENDING = 1000
+
+
+def alert_metrics(result):
+    """Metriken für die Regeln: die der Rollups plus speedtest.failed (1 = Speedtest fehlgeschlagen)"""
+    metrics = extract_metrics(result)
+    st = result.get("speedtest")
+    if st is not None:
+        metrics.append(("speedtest.failed", 1 if "error" in st else 0))
+    return metrics
+
+
+class Rule:
+    """Schwellwert über ein rollendes Zeitfenster mit Hysterese
+
+    {"name": "latenz_hoch", "metric": "ping.*.p95_ms", "aggregate": "avg", "op": ">",
+     "threshold": 150, "clear_threshold": 100, "window_seconds": 300, "min_samples": 3}
+
+    `metric` darf Wildcards enthalten, dann gibt es einen eigenen Alarm pro
+    passender Metrik. Ausgelöst wird, wenn das Aggregat der Werte im Fenster
+    die Schwelle überschreitet; aufgehoben erst, wenn es `clear_threshold`
+    (Standard: threshold) wieder unterschreitet.
+    """
+
+    def __init__(self, config):
+        self.name = config["name"]
+        self.metric = config["metric"]
+        self.op = config.get("op", ">")
+        if self.op not in OPERATORS:
+            raise ValueError(f"Regel {self.name}: unbekannter Operator {self.op}")
+        self.aggregate = config.get("aggregate", "last")
+        if self.aggregate not in AGGREGATES:
+            raise ValueError(f"Regel {self.name}: unbekanntes Aggregat {self.aggregate}")
+        self.threshold = config["threshold"]
+        self.clear_threshold = config.get("clear_threshold", self.threshold)
+        self.window = config.get("window_seconds", 0)
+        self.min_samples = config.get("min_samples", 1)
+        self.severity = config.get("severity", "warning")
+        self.message = config.get("message", "")
+        self.repeat = config.get("repeat_seconds")
+
+    def matches(self, metric):
+        return fnmatch.fnmatchcase(metric, self.metric)
+
+    def evaluate(self, samples, now, firing):
+        """Aggregat im Fenster und neuer Zustand (True = ausgelöst), None wenn zu wenig Daten"""
+        values = [v for ts, v in samples if ts >= now - self.window] if self.window else [samples[-1][1]]
+        if len(values) < self.min_samples:
+            return None, firing
+        value = AGGREGATES[self.aggregate](values)
+        compare = OPERATORS[self.op]
+        if firing:
+            # Hysterese: erst aufheben, wenn auch die Rücksetzschwelle nicht mehr verletzt ist
+            return value, compare(value, self.clear_threshold)
+        return value, compare(value, self.threshold)
+
+
+def legacy_rules(monitoring):
+    """Die bisherigen alert_on_* Schalter als Regeln"""
+    rules = []
+    if monitoring.get("alert_on_no_internet"):
+        rules.append({"name": "Keine Internet-Verbindung", "metric": "speedtest.failed", "op": ">=",
+                      "threshold": 1, "severity": "critical",
+                      "message": "WiFi Prober kann keine Internet-Geschwindigkeit messen"})
+    if monitoring.get("alert_on_low_speed_mbps", 0) > 0:
+        rules.append({"name": "Niedrige Internet-Geschwindigkeit", "metric": "speedtest.download_mbps", "op": "<",
+                      "threshold": monitoring["alert_on_low_speed_mbps"], "severity": "warning",
+                      "message": f"Download unter {monitoring['alert_on_low_speed_mbps']} Mbps"})
+    return rules
+
+
+# --- Sinks: bekommen pro Batch eine Liste von Events ---
+
+class FileSink:
+    """Hängt einen Batch als JSON-Lines in einem Schreibvorgang an"""
+
+    def __init__(self, path="/home/azubi/alerts.json"):
+        self.path = path
+
+    def deliver(self, events):
+        with open(self.path, "a") as f:
+            f.write("".join(json.dumps(e) + "\n" for e in events))
+
+
+class WebhookSink:
+    """POST {"alerts": [...]} als JSON"""
+
+    def __init__(self, url, timeout=10, headers=None):
+        self.url = url
+        self.timeout = timeout
+        self.headers = dict(headers or {}, **{"Content-Type": "application/json"})
+
+    def deliver(self, events):
+        body = json.dumps({"host": socket.gethostname(), "alerts": events}).encode()
+        request = urllib.request.Request(self.url, data=body, headers=self.headers, method="POST")
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            response.read()
+
+
+class SyslogSink:
+    def __init__(self, ident="wifi-prober"):
+        import syslog
+        self.syslog = syslog
+        syslog.openlog(ident, 0, syslog.LOG_DAEMON)
+
+    def deliver(self, events):
+        for e in events:
+            priority = self.syslog.LOG_CRIT if e["severity"] == "critical" else self.syslog.LOG_WARNING
+            if e["state"] == "resolved":
+                priority = self.syslog.LOG_NOTICE
+            self.syslog.syslog(priority, format_event(e))
+
+
+class NagiosSink:
+    """Passive Service-Checks über die Nagios-Command-Datei (PROCESS_SERVICE_CHECK_RESULT)"""
+
+    def __init__(self, command_file="/var/lib/nagios4/rw/nagios.cmd", host=None, service_prefix="WiFi Prober"):
+        self.command_file = command_file
+        self.host = host or socket.gethostname()
+        self.service_prefix = service_prefix
+
+    def deliver(self, events):
+        lines = []
+        for e in events:
+            code = NAGIOS_CODES["resolved"] if e["state"] == "resolved" else NAGIOS_CODES.get(e["severity"], 1)
+            service = f"{self.service_prefix} {e['alert']}".replace(";", ",")
+            output = format_event(e).replace(";", ",").replace("\n", " ")
+            lines.append(f"[{int(time.time())}] PROCESS_SERVICE_CHECK_RESULT;{self.host};{service};{code};{output}\n")
+        with open(self.command_file, "a") as f:
+            f.write("".join(lines))
+
+
+SINKS = {"file": FileSink, "webhook": WebhookSink, "syslog": SyslogSink, "nagios": NagiosSink}
+
+
+def format_event(e):
+    state = "AUSGELÖST" if e["state"] == "firing" else "AUFGEHOBEN"
+    text = f"{state}: {e['alert']} ({e['metric']} = {e['value']}, Schwelle {e['op']} {e['threshold']})"
+    return f"{text} - {e['message']}" if e.get("message") else text
+
+
+class AlertEngine:
+    """Wertet Regeln über die Probe-Ergebnisse aus und verteilt Zustandswechsel gebündelt
+
+    Gemeldet wird nur beim Wechsel ok -> ausgelöst -> aufgehoben (plus optional
+    alle `repeat_seconds` solange ausgelöst), nicht in jedem Zyklus. Events
+    werden gesammelt und alle `batch_seconds` in einem Rutsch an alle Sinks
+    geliefert; fehlgeschlagene Zustellungen werden beim nächsten Batch erneut
+    versucht. Zustände und noch nicht zugestellte Events liegen in `state_file`
+    und überstehen einen Neustart.
+    """
+
+    def __init__(self, rules, sinks, state_file=None, batch_seconds=30, logger=None):
+        self.rules = [r if isinstance(r, Rule) else Rule(r) for r in rules]
+        self.sinks = sinks
+        self.state_file = state_file
+        self.batch_seconds = batch_seconds
+        self.logger = logger
+        self.lock = threading.Lock()
+        self.samples = {}   # metrik -> deque[(ts, wert)]
+        self.states = {}    # "regel|metrik" -> {"firing", "since", "value", "notified"}
+        self.pending = {}   # sink-name -> [events]
+        self.max_window = max([r.window for r in self.rules] + [0])
+        self.stopped = threading.Event()
+        self.thread = None
+        self._load_state()
+
+    # --- Zustand ---
+
+    def _load_state(self):
+        if not self.state_file:
+            return
+        try:
+            with open(self.state_file, "r") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            self._log("error", f"Alert-Zustand nicht lesbar: {e}")
+            return
+        names = {name for name, _ in self.sinks}
+        self.states = data.get("states", {})
+        self.pending = {name: events for name, events in data.get("pending", {}).items() if name in names}
+
+    def _save_state(self):
+        if not self.state_file:
+            return
+        tmp = f"{self.state_file}.tmp"
+        try:
+            with open(tmp, "w") as f:
+                json.dump({"states": self.states, "pending": self.pending}, f)
+            os.replace(tmp, self.state_file)
+        except OSError as e:
+            self._log("error", f"Alert-Zustand nicht gespeichert: {e}")
+
+    def _log(self, level, message):
+        if self.logger:
+            getattr(self.logger, level)(message)
+
+    # --- Auswertung ---
+
+    def observe(self, result):
+        """Neues (Teil-)Ergebnis einarbeiten, gibt die erzeugten Events zurück"""
+        ts = parse_timestamp(result["timestamp"])
+        events = []
+        with self.lock:
+            for metric, value in alert_metrics(result):
+                if value is None:
+                    continue
+                rules = [r for r in self.rules if r.matches(metric)]
+                if not rules:
+                    continue
+                samples = self.samples.setdefault(metric, deque())
+                samples.append((ts, float(value)))
+                while samples and samples[0][0] < ts - self.max_window:
+                    samples.popleft()
+                for rule in rules:
+                    event = self._evaluate(rule, metric, samples, ts, result["timestamp"])
+                    if event:
+                        events.append(event)
+            if events:
+                for sink_name, _ in self.sinks:
+                    queue = self.pending.setdefault(sink_name, [])
+                    queue.extend(events)
+                    del queue[:-MAX_PENDING]
+                self._save_state()
+        for e in events:
+            self._log("warning" if e["state"] == "firing" else "info", f"ALERT {format_event(e)}")
+        return events
+
+    def _evaluate(self, rule, metric, samples, now, timestamp):
+        key = f"{rule.name}|{metric}"
+        state = self.states.get(key, {"firing": False})
+        value, firing = rule.evaluate(samples, now, state["firing"])
+        if value is None:
+            return None
+        event = None
+        if firing != state["firing"]:
+            state = {"firing": firing, "since": timestamp, "value": value, "notified": now}
+            event = self._event(rule, metric, "firing" if firing else "resolved", value, timestamp)
+        else:
+            state["value"] = value
+            if firing and rule.repeat and now - state.get("notified", 0) >= rule.repeat:
+                state["notified"] = now
+                event = self._event(rule, metric, "firing", value, timestamp, repeat=True)
+        self.states[key] = state
+        return event
+
+    def _event(self, rule, metric, state, value, timestamp, repeat=False):
+        event = {
+            "timestamp": timestamp,
+            "alert": rule.name,
+            "metric": metric,
+            "state": state,
+            "severity": rule.severity,
+            "value": round(value, 3),
+            "op": rule.op,
+            "threshold": rule.clear_threshold if state == "resolved" else rule.threshold,
+            "window_seconds": rule.window,
+            "message": rule.message
+        }
+        if repeat:
+            event["repeat"] = True
+        return event
+
+    def notify(self, title, message, severity="warning"):
+        """Einmaliges Event ohne Regel (z.B. manuell ausgelöst)"""
+        event = {"timestamp": datetime.now().isoformat(), "alert": title, "metric": "", "state": "firing",
+                 "severity": severity, "value": None, "op": "", "threshold": None, "message": message}
+        with self.lock:
+            for sink_name, _ in self.sinks:
+                self.pending.setdefault(sink_name, []).append(event)
+            self._save_state()
+
+    def active(self):
+        """Aktuell ausgelöste Alarme"""
+        with self.lock:
+            return {key: dict(state) for key, state in self.states.items() if state.get("firing")}
+
+    # --- Zustellung ---
+
+    def flush(self):
+        """Alle gesammelten Events zustellen, pro Sink ein Batch"""
+        with self.lock:
+            batches = {name: events for name, events in self.pending.items() if events}
+            for name in batches:
+                self.pending[name] = []
+        if not batches:
+            return
+        failed = {}
+        for sink_name, sink in self.sinks:
+            events = batches.get(sink_name)
+            if not events:
+                continue
+            try:
+                sink.deliver(events)
+            except Exception as e:
+                self._log("error", f"Alert-Zustellung über {sink_name} fehlgeschlagen: {e}")
+                failed[sink_name] = events
+        with self.lock:
+            for name, events in failed.items():
+                queue = events + self.pending.get(name, [])
+                self.pending[name] = queue[-MAX_PENDING:]
+            self._save_state()
+
+    def start(self):
+        self.thread = threading.Thread(target=self._run, name="alerts", daemon=True)
+        self.thread.start()
+        return self
+
+    def _run(self):
+        while not self.stopped.wait(self.batch_seconds):
+            self.flush()
+
+    def close(self):
+        self.stopped.set()
+        if self.thread is not None:
+            self.thread.join(5)
+        self.flush()
+
+
+def alerts_from_config(config, logger=None):
+    """AlertEngine aus den Abschnitten `alerts` und `monitoring` von wifi_config.json"""
+    alerts = config.get("alerts", {})
+    rules = legacy_rules(config.get("monitoring", {})) + list(alerts.get("rules", []))
+    sinks = []
+    for i, sink in enumerate(alerts.get("sinks", [{"type": "file"}])):
+        sink = dict(sink)
+        kind = sink.pop("type")
+        if kind not in SINKS:
+            raise ValueError(f"Unbekannter Alert-Sink: {kind}")
+        sinks.append((sink.pop("name", f"{kind}-{i}"), SINKS[kind](**sink)))
+    return AlertEngine(
+        rules, sinks,
+        state_file=alerts.get("state_file"),
+        batch_seconds=alerts.get("batch_seconds", 30),
+        logger=logger
+    ).start()
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""Vergleich alter vs. neuer iwlist-Parser: Korrektheit und Durchsatz
+
+Aufruf aus dem Projektverzeichnis:
+    python3 benchmarks/bench_iwlist_parser.py [--cells 250] [--rounds 200]
+
+Prüft alle Fixtures in benchmarks/fixtures gegen expected.json, vergleicht
+die gemeinsamen Felder mit dem alten Parser und misst danach beide Parser
+auf einem künstlich verdichteten Scan (viele BSSIDs wie in einem Büro).
+"""
+import argparse
+import json
+import re
+import sys
+import time
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(BENCH_DIR.parent))
+sys.path.insert(0, str(BENCH_DIR))
+
+import legacy_iwlist_parser
+from wifi_scanner import WiFiScanner
+
+FIXTURES = BENCH_DIR / "fixtures"
+# Felder, die der alte Parser bereits korrekt geliefert hat
+COMMON_FIELDS = ("bssid", "essid", "signal", "frequency")
+
+
+def load_fixtures():
+    return {p.name: p.read_text() for p in sorted(FIXTURES.glob("iwlist_*.txt"))}
+
+
+def check_correctness(scanner, fixtures):
+    expected = json.loads((FIXTURES / "expected.json").read_text())
+    errors = []
+    for name, text in fixtures.items():
+        new = scanner.parse_scan_results(text)
+        old = legacy_iwlist_parser.parse_scan_results(text)
+        fixture_expected = expected.get(name, {})
+        if len(new) != len(old):
+            errors.append(f"{name}: {len(new)} Zellen statt {len(old)} (alter Parser)")
+        for n, o in zip(new, old):
+            for field in COMMON_FIELDS:
+                # expected.json hat Vorrang, dort stehen auch Fälle, die der alte Parser falsch las
+                if field not in fixture_expected.get(n["bssid"], {}) and n[field] != o[field]:
+                    errors.append(f"{name} {n['bssid']}: {field} {n[field]!r} != alt {o[field]!r}")
+        by_bssid = {n["bssid"]: n for n in new}
+        for bssid, fields in fixture_expected.items():
+            net = by_bssid.get(bssid)
+            if net is None:
+                errors.append(f"{name}: {bssid} fehlt")
+                continue
+            for field, value in fields.items():
+                if net.get(field) != value:
+                    errors.append(f"{name} {bssid}: {field} {net.get(field)!r}, erwartet {value!r}")
+        if len({n["timestamp"] for n in new}) > 1:
+            errors.append(f"{name}: mehrere Zeitstempel in einem Scan")
+    return errors
+
+
+def dense_scan(fixtures, cells):
+    """Zellen aller Fixtures mit fortlaufenden BSSIDs zu einem großen Scan vervielfältigen"""
+    blocks = []
+    for text in fixtures.values():
+        blocks += re.split(r"(?m)^(?=\s*Cell \d+ - Address:)", text)[1:]
+    out = ["wlan0     Scan completed :\n"]
+    for i in range(cells):
+        block = re.sub(r"Cell \d+ - Address: \S+",
+                       f"Cell {i + 1:02d} - Address: 02:00:00:{i >> 16 & 255:02X}:{i >> 8 & 255:02X}:{i & 255:02X}",
+                       blocks[i % len(blocks)])
+        out.append(block)
+    return "".join(out)
+
+
+def measure(parsers, text, rounds, repeats=7):
+    """Bestzeit pro Scan für jeden Parser, abwechselnd gemessen gegen Schwankungen der Maschine"""
+    best = [float("inf")] * len(parsers)
+    for fn in parsers:
+        fn(text)  # Aufwärmen
+    for _ in range(repeats):
+        for i, fn in enumerate(parsers):
+            start = time.perf_counter()
+            for _ in range(rounds):
+                fn(text)
+            best[i] = min(best[i], (time.perf_counter() - start) / rounds)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark iwlist-Parser alt vs. neu")
+    parser.add_argument("--cells", type=int, default=250, help="BSSIDs im verdichteten Scan")
+    parser.add_argument("--rounds", type=int, default=50, help="Durchläufe pro Messung")
+    args = parser.parse_args()
+
+    scanner = WiFiScanner()
+    fixtures = load_fixtures()
+
+    errors = check_correctness(scanner, fixtures)
+    for e in errors:
+        print(f"FEHLER: {e}")
+    print(f"Korrektheit: {len(fixtures)} Fixtures, {len(errors)} Abweichungen")
+
+    text = dense_scan(fixtures, args.cells)
+    old, new = measure([legacy_iwlist_parser.parse_scan_results, scanner.parse_scan_results], text, args.rounds)
+    print(f"Verdichteter Scan: {args.cells} Zellen, {len(text.splitlines())} Zeilen")
+    print(f"  alt: {old * 1000:8.3f} ms/Scan  {args.cells / old:10.0f} Zellen/s")
+    print(f"  neu: {new * 1000:8.3f} ms/Scan  {args.cells / new:10.0f} Zellen/s")
+    print(f"  Faktor: {old / new:.2f}x")
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
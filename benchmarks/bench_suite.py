@@ -0,0 +1,352 @@
+#!/usr/bin/env python3
+"""Offline-Benchmark und Lasttest für die heißen Pfade von Prober und Dashboard
+
+Aufruf aus dem Projektverzeichnis:
+    python3 benchmarks/bench_suite.py [--sizes 1000,10000,100000] [--backends segmented,sqlite]
+                                      [--clients 8] [--requests 400] [--out bench_report.json]
+                                      [--baseline alter_report.json] [--tolerance 0.2]
+
+Für jede Historiengröße und jedes Storage-Backend wird in einem temporären
+Verzeichnis eine synthetische Historie erzeugt (benchmarks/synthetic.py).
+Jede Phase läuft in einem eigenen Prozess, damit das Peak-RSS pro Phase
+stimmt und das Dashboard seine Konfiguration beim Import frisch liest:
+
+  parse      iwlist-Parser auf einem verdichteten Scan (Zellen/s)
+  probe      scan_iwlist und Speedtest über die Fakes in benchmarks/fakes
+             (sudo, ip, iwlist, speedtest-cli), Ping-Burst gegen 127.0.0.1
+  generate   Historie schreiben und Rollups aufbauen
+  save       Latenz von store.append + rollups.add_result (wie save_result)
+  endpoints  Dashboard mit --clients parallelen Clients, p50/p99 pro Endpoint
+
+Der Bericht ist JSON; mit --baseline werden alle Messwerte gegen einen
+älteren Bericht verglichen, Verschlechterungen über --tolerance führen zu
+Exit-Code 1. Es wird kein Netz gebraucht. 1M Datensätze: --sizes 1000000
+(mehrere GB Platz und einige Minuten).
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+REPO_DIR = BENCH_DIR.parent
+sys.path.insert(0, str(REPO_DIR))
+sys.path.insert(0, str(BENCH_DIR))
+
+from latency_engine import percentile
+
+FAKES = BENCH_DIR / "fakes"
+ENDPOINTS = [
+    "/api/stats",
+    "/api/outages",
+    "/api/networks",
+    "/api/bssids/24",
+    "/api/chart/ping/24",
+    "/api/chart/ping/168",
+    "/api/chart/wifi/24",
+    "/api/chart/speedtest/24",
+    "/api/chart/speedtest/720",
+    "/api/chart/bufferbloat/168",
+    "/api/ping_multi",
+    "/metrics"
+]
+
+
+def peak_rss_mb():
+    # ru_maxrss ist unter Linux in KiB
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+def latency_stats(samples):
+    """p50/p99/max in ms aus einer Liste von Sekunden"""
+    ms = [s * 1000 for s in samples]
+    return {"p50_ms": round(percentile(ms, 50), 3), "p99_ms": round(percentile(ms, 99), 3),
+            "max_ms": round(max(ms), 3), "count": len(ms)}
+
+
+# --- Phasen (laufen jeweils im eigenen Prozess) ---
+
+def phase_parse(args, config):
+    from bench_iwlist_parser import load_fixtures, dense_scan, measure
+    from wifi_scanner import WiFiScanner
+    text = dense_scan(load_fixtures(), args.cells)
+    best, = measure([WiFiScanner().parse_scan_results], text, rounds=20, repeats=5)
+    return {"cells": args.cells, "ms_per_scan": round(best * 1000, 3), "cells_per_s": round(args.cells / best)}
+
+
+def phase_probe(args, config):
+    from wifi_scanner import WiFiScanner
+    from latency_engine import engine_from_config
+    from speedtest_runner import speedtest_from_config
+    from latency_engine import targets_from_config
+
+    scanner = WiFiScanner(interface="lo", backend="iwlist")
+    scans = []
+    for _ in range(args.probe_rounds):
+        start = time.perf_counter()
+        networks = scanner.scan_networks()
+        scans.append(time.perf_counter() - start)
+    latency = engine_from_config(config)
+    targets = targets_from_config(config)
+    pings = []
+    for _ in range(args.probe_rounds):
+        start = time.perf_counter()
+        result = latency.ping_many_burst(targets, count=10, interval=0.01, budget=5)
+        pings.append(time.perf_counter() - start)
+    speedtest = speedtest_from_config(config, targets=targets, latency=latency)
+    start = time.perf_counter()
+    st = speedtest.run_speedtest()
+    # Abzüglich der Wartezeit des Fakes bleibt der Overhead von Prozess, Sampling und Auswertung
+    overhead = time.perf_counter() - start - float(os.environ["BENCH_SPEEDTEST_SECONDS"])
+    return {
+        "scan": dict(latency_stats(scans), bssids=len(networks)),
+        "ping_burst": dict(latency_stats(pings), success=all(p.get("success") for p in result.values())),
+        "speedtest": {"overhead_ms": round(overhead * 1000, 1), "success": bool(st)}
+    }
+
+
+def phase_generate(args, config):
+    from synthetic import build_history
+    return build_history(config, args.size)
+
+
+def phase_save(args, config):
+    from result_store import open_store
+    from rollups import open_rollups
+    from synthetic import synthetic_results
+
+    store = open_store(config)
+    rollups = open_rollups(config)
+    appends, rollup_adds, total = [], [], []
+    # Zeitstempel nach der vorhandenen Historie, damit die Rollups offene Buckets fortschreiben
+    for r in synthetic_results(args.saves, end=time.time() + args.saves * 60, seed=2):
+        t0 = time.perf_counter()
+        store.append(r)
+        t1 = time.perf_counter()
+        rollups.add_result(r)
+        t2 = time.perf_counter()
+        appends.append(t1 - t0)
+        rollup_adds.append(t2 - t1)
+        total.append(t2 - t0)
+    store.close()
+    return {"store_append": latency_stats(appends), "rollup_add": latency_stats(rollup_adds),
+            "save_result": latency_stats(total)}
+
+
+def phase_endpoints(args, config):
+    import http.client
+    try:
+        from werkzeug.serving import make_server
+        start = time.perf_counter()
+        import dashboard_server
+    except ImportError as e:
+        return {"skipped": f"Dashboard nicht importierbar: {e}"}
+    import_seconds = time.perf_counter() - start
+
+    server = make_server("127.0.0.1", 0, dashboard_server.app, threaded=True)
+    port = server.server_port
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    def get(path):
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+        start = time.perf_counter()
+        conn.request("GET", path)
+        response = conn.getresponse()
+        response.read()
+        conn.close()
+        return response.status, time.perf_counter() - start
+
+    # Erster Aufruf pro Endpoint: lädt Historie/Cache, getrennt ausgewiesen
+    cold = {path: get(path)[1] for path in ENDPOINTS}
+    samples = {path: [] for path in ENDPOINTS}
+    errors = {path: 0 for path in ENDPOINTS}
+    lock = threading.Lock()
+
+    def client(i):
+        path = ENDPOINTS[i % len(ENDPOINTS)]
+        status, seconds = get(path)
+        with lock:
+            samples[path].append(seconds)
+            if status != 200:
+                errors[path] += 1
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(args.clients) as pool:
+        list(pool.map(client, range(args.requests)))
+    wall = time.perf_counter() - start
+    server.shutdown()
+    return {
+        "clients": args.clients,
+        "import_seconds": round(import_seconds, 3),
+        "requests_per_s": round(args.requests / wall, 1),
+        "per_endpoint": {path: dict(latency_stats(samples[path]), cold_ms=round(cold[path] * 1000, 3),
+                                    errors=errors[path]) for path in ENDPOINTS if samples[path]}
+    }
+
+
+PHASES = {"parse": phase_parse, "probe": phase_probe, "generate": phase_generate, "save": phase_save,
+          "endpoints": phase_endpoints}
+
+
+def run_worker(args):
+    from probe_config import load_config
+    config = load_config(args.config)
+    result = PHASES[args.worker](args, config)
+    result["peak_rss_mb"] = peak_rss_mb()
+    Path(args.result_file).write_text(json.dumps(result))
+
+
+def run_phase(phase, args, workdir, config_path, env=None):
+    result_file = Path(workdir) / f"{phase}.json"
+    cmd = [sys.executable, __file__, "--worker", phase, "--config", str(config_path),
+           "--result-file", str(result_file), "--size", str(args.size), "--saves", str(args.saves),
+           "--clients", str(args.clients), "--requests", str(args.requests), "--cells", str(args.cells),
+           "--probe-rounds", str(args.probe_rounds)]
+    env = dict(os.environ, WIFI_PROBER_CONFIG=str(config_path), **(env or {}))
+    start = time.perf_counter()
+    proc = subprocess.run(cmd, env=env, cwd=workdir, capture_output=True, text=True)
+    if proc.returncode != 0:
+        return {"error": proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else f"Exit {proc.returncode}"}
+    result = json.loads(result_file.read_text())
+    result["wall_seconds"] = round(time.perf_counter() - start, 3)
+    return result
+
+
+# --- Bericht und Vergleich ---
+
+def flatten(data, prefix=""):
+    items = {}
+    for key, value in data.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            items.update(flatten(value, name + "."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            items[name] = value
+    return items
+
+
+def direction(metric):
+    """+1 wenn größer besser ist, -1 wenn kleiner besser ist, 0 = nicht vergleichen"""
+    leaf = metric.rsplit(".", 1)[-1]
+    if leaf.endswith("_per_s"):
+        return 1
+    if leaf.endswith(("_ms", "_mb", "_seconds")) and leaf != "wall_seconds":
+        return -1
+    return 0
+
+
+def compare(report, baseline, tolerance):
+    """[(metrik, alt, neu, änderung)] für alle Verschlechterungen über `tolerance`"""
+    old, new = flatten(baseline["results"]), flatten(report["results"])
+    regressions = []
+    for metric, value in new.items():
+        sign = direction(metric)
+        base = old.get(metric)
+        if not sign or not base:
+            continue
+        change = (value - base) / base
+        if change * sign < -tolerance:
+            regressions.append((metric, base, value, change))
+    return regressions
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR, capture_output=True,
+                              text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline-Benchmark für Prober und Dashboard")
+    parser.add_argument("--sizes", default="1000,10000,100000", help="Historiengrößen, kommagetrennt")
+    parser.add_argument("--backends", default="segmented,sqlite", help="Storage-Backends, kommagetrennt")
+    parser.add_argument("--clients", type=int, default=8, help="Parallele Clients beim Lasttest")
+    parser.add_argument("--requests", type=int, default=400, help="Requests pro Lasttest (über alle Endpoints)")
+    parser.add_argument("--saves", type=int, default=200, help="Gemessene save_result Aufrufe")
+    parser.add_argument("--cells", type=int, default=250, help="BSSIDs im verdichteten Scan")
+    parser.add_argument("--probe-rounds", type=int, default=5, help="Scans/Ping-Bursts über die Fakes")
+    parser.add_argument("--speedtest-seconds", type=float, default=1.0, help="Laufzeit des speedtest-cli Fakes")
+    parser.add_argument("--out", default="bench_report.json", help="Bericht (JSON)")
+    parser.add_argument("--baseline", help="Älterer Bericht zum Vergleich")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Erlaubte Verschlechterung (0.2 = 20%%)")
+    parser.add_argument("--keep", action="store_true", help="Temporäre Historien nicht löschen")
+    # intern: eine Phase im Unterprozess
+    parser.add_argument("--worker", choices=sorted(PHASES), help=argparse.SUPPRESS)
+    parser.add_argument("--config", help=argparse.SUPPRESS)
+    parser.add_argument("--result-file", help=argparse.SUPPRESS)
+    parser.add_argument("--size", type=int, default=0, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args)
+        return 0
+
+    from synthetic import write_config
+    fake_env = {"PATH": f"{FAKES}{os.pathsep}{os.environ.get('PATH', '')}", "BENCH_CELLS": str(args.cells),
+                "BENCH_SPEEDTEST_SECONDS": str(args.speedtest_seconds)}
+    results = {}
+    root = Path(tempfile.mkdtemp(prefix="wifi_bench_"))
+    try:
+        workdir = root / "common"
+        workdir.mkdir()
+        config_path, _ = write_config(workdir, "segmented", 1000)
+        for phase in ("parse", "probe"):
+            print(f"{phase} ...", flush=True)
+            results[phase] = run_phase(phase, args, workdir, config_path, fake_env)
+
+        for backend in args.backends.split(","):
+            for size in (int(s) for s in args.sizes.split(",")):
+                key = f"{backend}/{size}"
+                workdir = root / key.replace("/", "_")
+                workdir.mkdir()
+                config_path, _ = write_config(workdir, backend, size)
+                args.size = size
+                results[key] = {}
+                for phase in ("generate", "save", "endpoints"):
+                    print(f"{key} {phase} ...", flush=True)
+                    results[key][phase] = run_phase(phase, args, workdir, config_path)
+    finally:
+        if args.keep:
+            print(f"Historien in {root}")
+        else:
+            subprocess.run(["rm", "-rf", str(root)])
+
+    report = {
+        "meta": {
+            "created": datetime.now().isoformat(),
+            "git": git_revision(),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "args": {k: v for k, v in vars(args).items() if k not in ("worker", "config", "result_file", "size")}
+        },
+        "results": results
+    }
+    Path(args.out).write_text(json.dumps(report, indent=2))
+    print(json.dumps(results, indent=2))
+    print(f"Bericht: {args.out}")
+
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text())
+        regressions = compare(report, baseline, args.tolerance)
+        for metric, old, new, change in regressions:
+            print(f"VERSCHLECHTERT: {metric}: {old} -> {new} ({change:+.0%})")
+        print(f"Vergleich mit {args.baseline} ({baseline['meta'].get('git')}): {len(regressions)} Verschlechterungen")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""Collector und mehrere Stationen auf localhost durchspielen
+
+Startet einen Collector (fleet.py) auf einem freien Port und pro Station
+einen FleetPusher mit eigenem Spool, gefüttert mit synthetischen Historien
+(synthetic.py, pro Station eigener Seed). Mittendrin wird der Collector
+gestoppt: die Stationen spoolen weiter und versuchen es mit Backoff erneut,
+bis er wieder läuft. Am Ende muss jede Probe genau einmal angekommen sein,
+dann werden die Flotten-Endpoints abgefragt.
+
+    python3 benchmarks/fleet_local.py --stations 3 --records 2000
+"""
+import argparse
+import gzip
+import json
+import shutil
+import sys
+import tempfile
+import time
+import urllib.request
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(BENCH_DIR.parent))
+sys.path.insert(0, str(BENCH_DIR))
+
+from fleet import FleetStore, FleetSpool, FleetPusher, serve_collector
+from synthetic import synthetic_results
+
+
+def wait_for(condition, timeout):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.2)
+    return False
+
+
+def get(port, path):
+    request = urllib.request.Request(f"http://127.0.0.1:{port}{path}", headers={"Accept-Encoding": "gzip"})
+    with urllib.request.urlopen(request, timeout=30) as response:
+        body = response.read()
+        if response.headers.get("Content-Encoding") == "gzip":
+            body = gzip.decompress(body)
+    return json.loads(body)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--stations", type=int, default=3)
+    parser.add_argument("--records", type=int, default=2000, help="Datensätze pro Station")
+    parser.add_argument("--outage-seconds", type=float, default=4, help="So lange ist der Collector weg")
+    parser.add_argument("--keep", action="store_true", help="Arbeitsverzeichnis nicht löschen")
+    args = parser.parse_args()
+
+    workdir = Path(tempfile.mkdtemp(prefix="fleet_local_"))
+    store = FleetStore(workdir / "fleet.sqlite")
+    server = serve_collector(store, "127.0.0.1", 0)
+    port = server.server_port
+    print(f"Collector auf 127.0.0.1:{port}, Arbeitsverzeichnis {workdir}")
+
+    stations = {}
+    for i in range(args.stations):
+        name = f"station-{i + 1}"
+        pusher = FleetPusher(f"http://127.0.0.1:{port}", name, FleetSpool(workdir / name), batch_size=200,
+                             push_seconds=0.5, max_backoff_seconds=2, timeout=5).start()
+        stations[name] = (pusher, list(synthetic_results(args.records, seed=i + 1)))
+    half = args.records // 2
+    ok = True
+
+    def drained():
+        return all(not p.spool.pending_bytes() for p, _ in stations.values())
+
+    start = time.perf_counter()
+    for pusher, records in stations.values():
+        for r in records[:half]:
+            pusher.add(r)
+    ok &= wait_for(drained, 60)
+    print(f"Phase 1: {half} Datensätze pro Station in {time.perf_counter() - start:.1f}s übertragen")
+
+    server.shutdown()
+    server.server_close()
+    for pusher, records in stations.values():
+        for r in records[half:]:
+            pusher.add(r)
+    time.sleep(args.outage_seconds)
+    spooled = {name: p.spool.pending_bytes() for name, (p, _) in stations.items()}
+    failures = {name: p.failures for name, (p, _) in stations.items()}
+    print(f"Phase 2: Collector gestoppt, im Spool {spooled}, Fehlversuche {failures}")
+    ok &= all(spooled.values()) and all(failures.values())
+
+    start = time.perf_counter()
+    server = serve_collector(store, "127.0.0.1", port)
+    ok &= wait_for(drained, 60)
+    print(f"Phase 3: Collector wieder da, Spools nach {time.perf_counter() - start:.1f}s leer")
+
+    # Ein wiederholter Push (Antwort verloren) darf nichts doppelt zählen
+    pusher, records = next(iter(stations.values()))
+    repeat = pusher.send(records[:50])
+    print(f"Wiederholter Push: {repeat}")
+    ok &= repeat["inserted"] == 0
+
+    for name, (pusher, records) in stations.items():
+        pusher.close()
+        received = next(s["records"] for s in get(port, "/api/fleet/stations")["stations"] if s["station"] == name)
+        print(f"{name}: {received}/{len(records)} Datensätze, {pusher.failures} Fehlversuche")
+        ok &= received == len(records)
+
+    hours = args.records // 40 + 2
+    for endpoint in ("latency", "throughput", "availability"):
+        print(f"\n/api/fleet/{endpoint}?hours={hours}")
+        for row in get(port, f"/api/fleet/{endpoint}?hours={hours}")["stations"]:
+            print("  " + json.dumps(row))
+    channels = get(port, f"/api/fleet/channels?hours={hours}")
+    print(f"\n/api/fleet/channels?hours={hours} (Flotte, belegteste Kanäle)")
+    for row in channels["fleet"][:5]:
+        print("  " + json.dumps(row))
+
+    server.shutdown()
+    store.close()
+    if not args.keep:
+        shutil.rmtree(workdir)
+    print("\nOK" if ok else "\nFEHLER: nicht alle Datensätze genau einmal angekommen oder kein Spooling")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""Eingefrorene Kopie des alten iwlist-Parsers (vor dem Single-Pass-Parser), nur als Vergleich für bench_iwlist_parser.py"""
+import re
+from datetime import datetime
+
+
+def parse_scan_results(scan_output):
+    """Parse iwlist scan Ausgabe"""
+    networks = []
+    current_network = {}
+    
+    for line in scan_output.split('\n'):
+        line = line.strip()
+        
+        # Neues Netzwerk
+        if "Cell" in line and "Address:" in line:
+            if current_network:
+                networks.append(current_network)
+            current_network = {
+                "timestamp": datetime.now().isoformat(),
+                "bssid": "",
+                "essid": "",
+                "signal": 0,
+                "frequency": "",
+                "encryption": "Open"
+            }
+            
+            # MAC-Adresse extrahieren
+            mac_match = re.search(r'([0-9A-Fa-f]{2}[:-]){5}([0-9A-Fa-f]{2})', line)
+            if mac_match:
+                current_network["bssid"] = mac_match.group(0)
+        
+        # ESSID (Netzwerk-Name)
+        elif "ESSID:" in line:
+            essid_match = re.search(r'ESSID:"([^"]*)"', line)
+            if essid_match:
+                current_network["essid"] = essid_match.group(1)
+        
+        # Signal-Stärke
+        elif "Signal level=" in line:
+            signal_match = re.search(r'Signal level=(-?\d+)', line)
+            if signal_match:
+                current_network["signal"] = int(signal_match.group(1))
+        
+        # Frequenz
+        elif "Frequency:" in line:
+            freq_match = re.search(r'Frequency:([0-9.]+) GHz', line)
+            if freq_match:
+                current_network["frequency"] = freq_match.group(1) + " GHz"
+        
+        # Verschlüsselung
+        elif "Encryption key:on" in line:
+            current_network["encryption"] = "WEP/WPA"
+        elif "WPA" in line:
+            current_network["encryption"] = "WPA/WPA2"
+    
+    # Letztes Netzwerk hinzufügen
+    if current_network:
+        networks.append(current_network)
+    
+    return networks
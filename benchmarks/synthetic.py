@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""Synthetische Probe-Historien und Konfigurationen für bench_suite.py
+
+Die Datensätze haben die Form, die die Scheduler-Jobs des Probers speichern:
+ein Ping-Ergebnis pro Minute, dazwischen Scans und Speedtests als eigene
+Datensätze, jeweils mit dem letzten System-Status. Die Scan-Netze stammen aus
+den iwlist-Fixtures, Signal und Latenzen schwanken zufällig (fester Seed).
+"""
+import json
+import random
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(BENCH_DIR.parent))
+
+from wifi_scanner import WiFiScanner, count_ssids
+
+FIXTURES = BENCH_DIR / "fixtures"
+# Abstand der Ping-Datensätze wie beim Standard-Ping-Job
+STEP_SECONDS = 60
+
+
+def fixture_networks():
+    scanner = WiFiScanner()
+    networks = []
+    for path in sorted(FIXTURES.glob("iwlist_*.txt")):
+        networks += scanner.parse_scan_results(path.read_text(), "2026-01-01T00:00:00")
+    return networks
+
+
+def synthetic_results(count, end=None, seed=1):
+    """`count` Datensätze in zeitlicher Reihenfolge, der letzte kurz vor `end` (Standard: jetzt)"""
+    rng = random.Random(seed)
+    networks = fixture_networks()
+    # Pro Minute ein Ping, alle 5 Minuten zusätzlich Scan und Speedtest -> 7 Datensätze pro 5 Minuten
+    minutes = count * 5 // 7 + 1
+    t = (end or time.time()) - minutes * STEP_SECONDS
+    system_info = {"uptime": "up 3 days", "memory_usage": "41.2%", "disk_usage": "23%", "cpu_temp": "48.3°C",
+                   "wifi_status": "Verbunden mit IP", "wifi_ip": "192.168.178.42"}
+    outage = 0
+    produced = 0
+    minute = 0
+    while produced < count:
+        timestamp = datetime.fromtimestamp(t).isoformat()
+        if outage == 0 and rng.random() < 0.002:
+            outage = rng.randint(1, 10)
+        records = [{"timestamp": timestamp, "ping": synthetic_pings(rng, outage > 0), "system_info": system_info}]
+        outage = max(outage - 1, 0)
+        if minute % 5 == 2:
+            records.append({"timestamp": datetime.fromtimestamp(t + 20).isoformat(),
+                            "wifi_scan": synthetic_scan(rng, networks), "system_info": system_info})
+        if minute % 5 == 4:
+            records.append({"timestamp": datetime.fromtimestamp(t + 30).isoformat(),
+                            "speedtest": synthetic_speedtest(rng), "system_info": system_info})
+        for r in records[:count - produced]:
+            yield r
+        produced += len(records)
+        minute += 1
+        t += STEP_SECONDS
+
+
+def synthetic_pings(rng, down):
+    pings = {}
+    for name, base in (("google", 14.0), ("cloudflare", 11.0)):
+        if down:
+            pings[name] = {"avg_ms": 0, "success": False, "sent": 10, "received": 0, "loss_pct": 100.0}
+            continue
+        rtts = sorted(base + rng.expovariate(1 / 3) for _ in range(10))
+        pings[name] = {
+            "avg_ms": round(sum(rtts) / 10, 3), "success": True, "sent": 10, "received": 10, "loss_pct": 0.0,
+            "min_ms": round(rtts[0], 3), "max_ms": round(rtts[-1], 3), "p50_ms": round(rtts[4], 3),
+            "p95_ms": round(rtts[9], 3), "p99_ms": round(rtts[9], 3), "jitter_ms": round(rng.uniform(0.2, 2), 3),
+            "stddev_ms": round(rng.uniform(0.5, 3), 3), "method": "icmp"
+        }
+    return pings
+
+
+def synthetic_scan(rng, networks):
+    seen = []
+    for net in networks:
+        if rng.random() < 0.9:
+            seen.append(dict(net, signal=net["signal"] + rng.randint(-4, 4)))
+    return {"networks_found": count_ssids(seen), "bssids_found": len(seen), "backend": "nl80211", "networks": seen}
+
+
+def synthetic_speedtest(rng):
+    if rng.random() < 0.02:
+        return {"error": "Fehlgeschlagen"}
+    idle = rng.uniform(10, 16)
+    loaded = {"idle_ms": round(idle, 1), "download_ms": round(idle + rng.uniform(5, 120), 1),
+              "upload_ms": round(idle + rng.uniform(5, 200), 1)}
+    loaded["bufferbloat_ms"] = round(max(loaded["download_ms"], loaded["upload_ms"]) - idle, 1)
+    return {"download_mbps": round(rng.uniform(60, 100), 2), "upload_mbps": round(rng.uniform(20, 40), 2),
+            "ping_ms": round(idle, 1), "server": "Synthetisch", "isp": "Offline", "backend": "speedtest-cli",
+            "duration_seconds": 21.4, "loaded_latency": loaded}
+
+
+def write_config(workdir, backend, max_results, **sections):
+    """wifi_config.json, deren Pfade alle in `workdir` liegen und die nur 127.0.0.1 anpingt"""
+    workdir = Path(workdir)
+    config = {
+        "general": {"max_stored_results": max_results, "log_level": "WARNING"},
+        "targets": {"local": "127.0.0.1"},
+        "wifi": {"interface": "lo", "scan_backend": "iwlist"},
+        "speedtest": {"check_targets": ["local"]},
+        "monitoring": {"metrics_enabled": False},
+        "storage": {
+            "backend": backend,
+            "path": str(workdir / "results"),
+            "legacy_file": None,
+            "sqlite_path": str(workdir / "results.sqlite"),
+            "rollup_path": str(workdir / "rollups.sqlite"),
+            "outage_path": str(workdir / "outages.sqlite")
+        },
+        "alerts": {"sinks": [{"type": "file", "path": str(workdir / "alerts.json")}],
+                   "state_file": str(workdir / "alert_state.json")}
+    }
+    for section, values in sections.items():
+        config.setdefault(section, {}).update(values)
+    path = workdir / "wifi_config.json"
+    path.write_text(json.dumps(config, indent=2))
+    return path, config
+
+
+def build_history(config, count):
+    """Historie mit `count` Datensätzen in den konfigurierten Store schreiben und die Rollups aufbauen"""
+    from result_store import open_store, SegmentedStore, parse_timestamp
+    from rollups import open_rollups
+
+    store = open_store(config)
+    start = time.perf_counter()
+    if isinstance(store, SegmentedStore):
+        # Ein Segment pro Tag, wie es die Rotation im Betrieb erzeugt
+        day, batch = None, []
+        for r in synthetic_results(count):
+            ts_day = int(parse_timestamp(r["timestamp"]) // 86400)
+            if day is not None and ts_day != day:
+                store.import_results(batch)
+                batch = []
+            day = ts_day
+            batch.append(r)
+        store.import_results(batch)
+    else:
+        store.import_results(synthetic_results(count))
+    written = time.perf_counter() - start
+
+    start = time.perf_counter()
+    rollups = open_rollups(config)
+    rollups.rebuild(store.iter_results())
+    rebuild = time.perf_counter() - start
+    store.close()
+    return {"write_seconds": round(written, 3), "rollup_rebuild_seconds": round(rebuild, 3)}
@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+import itertools
+import json
+import os
+import socket
+import socketserver
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+# Befehl -> Scheduler-Jobs; die Ausschlussregeln serialisieren sie in der
+# Reihenfolge ihres Namens (ping, scan, speedtest) wie der alte Probe-Zyklus
+COMMANDS = {
+    "cycle": ("system_info", "ping", "scan", "speedtest"),
+    "ping": ("ping",),
+    "scan": ("scan",),
+    "speedtest": ("speedtest",)
+}
+MAX_JOBS = 50
+MAX_REQUEST_BYTES = 65536
+
+
+class ControlJob:
+    """Ein Auftrag über den Control-Socket, fertig wenn alle seine Scheduler-Jobs gelaufen sind"""
+
+    def __init__(self, job_id, command, steps):
+        self.id = job_id
+        self.command = command
+        self.created = datetime.now().isoformat()
+        self.finished = None
+        self.steps = {name: {"state": "queued"} for name in steps}
+        self.results = {}
+        self.done = threading.Event()
+        self.lock = threading.Lock()
+        if not steps:
+            self._finish()
+
+    def step_done(self, name, result, error, duration):
+        with self.lock:
+            self.steps[name] = {"state": "failed" if error else "done", "error": error,
+                                "duration_seconds": round(duration, 3)}
+            if result is not None:
+                self.results[name] = result
+            if all(s["state"] in ("done", "failed") for s in self.steps.values()):
+                self._finish()
+
+    def _finish(self):
+        self.finished = datetime.now().isoformat()
+        self.done.set()
+
+    @property
+    def state(self):
+        states = {s["state"] for s in self.steps.values()}
+        if not self.done.is_set():
+            return "queued" if states == {"queued"} else "running"
+        return "failed" if "failed" in states else "done"
+
+    def to_dict(self, results=True):
+        with self.lock:
+            data = {"id": self.id, "command": self.command, "state": self.state, "created": self.created,
+                    "finished": self.finished, "steps": {k: dict(v) for k, v in self.steps.items()}}
+            if results:
+                data["results"] = dict(self.results)
+            return data
+
+
+class ControlHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        line = self.rfile.readline(MAX_REQUEST_BYTES)
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise ValueError("JSON-Objekt erwartet")
+            response = self.server.control.handle(request)
+        except (TypeError, ValueError) as e:
+            response = {"ok": False, "error": f"Ungültige Anfrage: {e}"}
+        self.wfile.write(json.dumps(response).encode() + b"\n")
+
+
+class ControlServer:
+    """Befehle an den laufenden Prober über einen Unix-Socket (eine JSON-Zeile hin, eine zurück)
+
+    {"cmd": "scan"}                    -> {"ok": true, "job": {"id": 3, "state": "queued", ...}}
+    {"cmd": "job", "id": 3, "wait": 60} -> Status und Ergebnisse, mit wait blockierend bis fertig
+    {"cmd": "status"}                  -> Scheduler-Statistik und die letzten Aufträge
+
+    Befehle: cycle, ping, scan, speedtest (siehe COMMANDS). Sie stoßen die
+    Jobs im laufenden Scheduler an, es wird kein Prozess neu gestartet und ein
+    laufender Speedtest wird nicht abgebrochen.
+    """
+
+    def __init__(self, path, scheduler, logger=None):
+        self.path = path
+        self.scheduler = scheduler
+        self.logger = logger
+        self.jobs = OrderedDict()
+        self.ids = itertools.count(1)
+        self.lock = threading.Lock()
+        self.server = None
+
+    def start(self):
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+        self.server = socketserver.ThreadingUnixStreamServer(self.path, ControlHandler)
+        self.server.daemon_threads = True
+        self.server.control = self
+        # Nur der Prober-Benutzer (auch das Dashboard läuft als azubi)
+        os.chmod(self.path, 0o600)
+        threading.Thread(target=self.server.serve_forever, name="control", daemon=True).start()
+        return self
+
+    def close(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+            try:
+                os.unlink(self.path)
+            except FileNotFoundError:
+                pass
+
+    def submit(self, command):
+        """Auftrag anlegen und seine Jobs im Scheduler anstoßen"""
+        if command not in COMMANDS:
+            raise ValueError(f"Unbekannter Befehl {command}, erlaubt: {', '.join(COMMANDS)}")
+        steps = [name for name in COMMANDS[command] if name in self.scheduler.jobs]
+        if not steps:
+            raise ValueError(f"Job {command} ist nicht aktiv")
+        with self.lock:
+            job = ControlJob(next(self.ids), command, steps)
+            self.jobs[job.id] = job
+            while len(self.jobs) > MAX_JOBS:
+                self.jobs.popitem(last=False)
+        errors = []
+        for name in steps:
+            try:
+                self.scheduler.trigger(name, lambda result, error, duration, name=name:
+                                       job.step_done(name, result, error, duration))
+            except (KeyError, RuntimeError) as e:
+                # Nie angestoßen: sofort als fehlgeschlagen markieren, sonst wartet "wait" bis zum Timeout
+                error = str(e) if isinstance(e, RuntimeError) else f"Job {name} ist nicht aktiv"
+                job.step_done(name, None, error, 0)
+                errors.append(error)
+        if len(errors) == len(steps):
+            with self.lock:
+                self.jobs.pop(job.id, None)
+            raise RuntimeError(errors[0])
+        if self.logger:
+            self.logger.info(f"Control: Auftrag {job.id} ({command}) angenommen")
+        return job
+
+    def handle(self, request):
+        cmd = request.get("cmd")
+        if not isinstance(cmd, str):
+            return {"ok": False, "error": "cmd muss ein Text sein"}
+        wait = request.get("wait") or 0
+        if not isinstance(wait, (int, float)) or isinstance(wait, bool):
+            return {"ok": False, "error": "wait muss eine Zahl sein"}
+        if cmd == "status":
+            with self.lock:
+                jobs = [job.to_dict(results=False) for job in self.jobs.values()]
+            return {"ok": True, "scheduler": self.scheduler.stats(), "jobs": jobs}
+        if cmd == "job":
+            with self.lock:
+                job = self.jobs.get(request.get("id"))
+            if job is None:
+                return {"ok": False, "error": f"Auftrag {request.get('id')} unbekannt"}
+        else:
+            try:
+                job = self.submit(cmd)
+            except (ValueError, RuntimeError) as e:
+                return {"ok": False, "error": str(e)}
+        wait = min(max(float(wait), 0), 600)
+        if wait:
+            job.done.wait(wait)
+        return {"ok": True, "job": job.to_dict(results=request.get("results", True))}
+
+
+def send_command(path, request, timeout=10):
+    """Eine Anfrage an den Control-Socket des Probers, gibt die Antwort zurück
+
+    OSError, wenn der Prober nicht läuft; `timeout` muss ein eventuelles
+    "wait" der Anfrage abdecken.
+    """
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(timeout)
+        sock.connect(path)
+        sock.sendall(json.dumps(request).encode() + b"\n")
+        data = b""
+        while not data.endswith(b"\n"):
+            chunk = sock.recv(65536)
+            if not chunk:
+                break
+            data += chunk
+    return json.loads(data)
+
+
+def control_path(config):
+    return config.get("control", {}).get("socket", "/home/azubi/wifi_prober.sock")
+
+
+def main():
+    import argparse
+    from probe_config import load_config
+    parser = argparse.ArgumentParser(description="Befehl an den laufenden WiFi Prober schicken")
+    parser.add_argument("cmd", choices=sorted(COMMANDS) + ["status", "job"])
+    parser.add_argument("id", nargs="?", type=int, help="Auftrags-ID für 'job'")
+    parser.add_argument("--wait", type=float, default=0, help="Bis zu N Sekunden auf das Ende warten")
+    args = parser.parse_args()
+    request = {"cmd": args.cmd, "wait": args.wait}
+    if args.id is not None:
+        request["id"] = args.id
+    start = time.monotonic()
+    print(json.dumps(send_command(control_path(load_config()), request, timeout=args.wait + 10), indent=2))
+    print(f"({time.monotonic() - start:.1f}s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,27 +1,50 @@
 #!/usr/bin/env python3
 
-from flask import Flask, render_template, jsonify
+from flask import Flask, Response, render_template, jsonify, request, stream_with_context
 from flask_cors import CORS
-import json
-import subprocess
 import threading
 import time
-import re
+import math
 import psutil
-from datetime import datetime, timedelta
-from pathlib import Path
+import os
+import sys
+import gzip
+import hashlib
+from bisect import bisect_left
+from probe_config import load_config
+from result_store import open_store, read_segment, parse_timestamp, ResultStore, SegmentedStore, JsonFileStore, PING_FIELDS
+from rollups import open_rollups, pick_resolution, bucket_label
+from latency_engine import engine_from_config, targets_from_config, split_target
+from live_stream import broadcaster_from_config
+from interface_state import state_from_config
+from metrics import Registry, CONTENT_TYPE
+from outages import open_outages, format_outage, PERIODS
+from control import send_command, control_path, COMMANDS as CONTROL_COMMANDS
+from live_history import history_from_config, AGGREGATES as LIVE_AGGREGATES
+from live_state import shared_state_from_config
+from export import Export, export_chunks, gzip_chunks, check_format, export_filename, parse_time, FORMATS
 
 app = Flask(__name__)
 CORS(app)
 
-RESULTS_FILE = "/home/azubi/wifi_probe_results.json"
-SCAN_IN_PROGRESS = False
+CONFIG = load_config()
+CONTROL_SOCKET = control_path(CONFIG)
+
+# standalone: Entwicklungsserver, Sampler und Web in einem Prozess (Standard)
+# sampler:    nur die Live-Worker, schreibt den Live-Zustand ins Shared-Memory (python3 dashboard_server.py --sampler)
+# web:        nur Requests, liest den Live-Zustand lock-frei (gunicorn mit mehreren Workern)
+ROLE = "sampler" if __name__ == '__main__' and "--sampler" in sys.argv[1:] else \
+    os.environ.get("WIFI_DASHBOARD_ROLE", "standalone")
+if ROLE not in ("standalone", "sampler", "web"):
+    raise SystemExit(f"Unbekannte WIFI_DASHBOARD_ROLE {ROLE}, erlaubt: standalone, sampler, web")
+SAMPLER = ROLE != "web"
+# Antworten ab dieser Größe werden gzip-komprimiert, wenn der Client es annimmt
+GZIP_MIN_BYTES = 1024
+GZIP_MIMETYPES = {"application/json", "text/html", "text/plain", "text/css", "application/javascript"}
 
 current_live_data = {
-    "ping": {
-        "google": {"avg_ms": 0, "success": False},
-        "cloudflare": {"avg_ms": 0, "success": False}
-    },
+    "ping": {name: {"avg_ms": 0, "success": False} for name in CONFIG.get("targets", {})},
+    "targets": {},
     "system": {
         "cpu": 0,
         "ram": 0,
@@ -30,15 +53,180 @@ current_live_data = {
     }
 }
 
-def load_results():
-    try:
-        if Path(RESULTS_FILE).exists():
-            with open(RESULTS_FILE, 'r') as f:
-                return json.load(f)
-        return {"probe_results": []}
-    except Exception as e:
-        print(f"Fehler beim Laden der Ergebnisse: {e}")
-        return {"probe_results": []}
+class HistoryCache(ResultStore):
+    """Geparste Historie im Speicher, geteilt von allen Endpoints
+
+    Die Datei(en) werden nur neu gelesen, wenn sich ihr stat (inode, Größe,
+    mtime) geändert hat. Bei Segmenten werden nur neu angehängte Zeilen
+    nachgelesen. Zeitstempel liegen als Epoch-Floats vor, Zeitfenster werden
+    per bisect statt per fromisoformat über alle Datensätze gefiltert.
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.extends = 0
+        self._times = []
+        self._records = []
+        self._files = []  # [pfad, inode, größe, mtime_ns, offset, anzahl_datensätze]
+
+    def append(self, result):
+        self.store.append(result)
+
+    def _source_files(self):
+        if isinstance(self.store, SegmentedStore):
+            return [str(p) for p in self.store.segment_files()]
+        if isinstance(self.store, JsonFileStore):
+            return [self.store.path] if os.path.exists(self.store.path) else []
+        return []
+
+    def _add(self, records, times, new_records):
+        count = 0
+        for r in new_records:
+            try:
+                ts = parse_timestamp(r["timestamp"])
+            except Exception:
+                continue
+            times.append(ts)
+            records.append(r)
+            count += 1
+        return count
+
+    def _reload(self):
+        times, records, files = [], [], []
+        if isinstance(self.store, JsonFileStore):
+            for path in self._source_files():
+                st = os.stat(path)
+                count = self._add(records, times, self.store.iter_results())
+                files.append([path, st.st_ino, st.st_size, st.st_mtime_ns, st.st_size, count])
+        else:
+            for path in self._source_files():
+                try:
+                    st = os.stat(path)
+                    new, offset = read_segment(path)
+                except FileNotFoundError:
+                    continue
+                files.append([path, st.st_ino, st.st_size, st.st_mtime_ns, offset, self._add(records, times, new)])
+        self._times, self._records, self._files = times, records, files
+
+    def _try_extend(self, paths, stats):
+        """Nur angehängt/rotiert/alte Segmente gelöscht? Dann inkrementell erweitern."""
+        if not isinstance(self.store, SegmentedStore) or not self._files:
+            return False
+        cached = [f[0] for f in self._files]
+        # Vorne dürfen Segmente durch Retention wegfallen, hinten neue dazukommen
+        if not paths or paths[0] not in cached:
+            return False
+        dropped = cached.index(paths[0])
+        kept = self._files[dropped:]
+        if paths[:len(kept)] != [f[0] for f in kept]:
+            return False
+        for f, st in zip(kept[:-1], stats):
+            if (f[1], f[2], f[3]) != (st.st_ino, st.st_size, st.st_mtime_ns):
+                return False
+        last, last_st = kept[-1], stats[len(kept) - 1]
+        if last[1] != last_st.st_ino or last_st.st_size < last[4]:
+            return False
+
+        times, records = self._times, self._records
+        skip = sum(f[5] for f in self._files[:dropped])
+        if skip:
+            times, records = times[skip:], records[skip:]
+        new, offset = read_segment(last[0], last[4])
+        last[4], last[5] = offset, last[5] + self._add(records, times, new)
+        last[1], last[2], last[3] = last_st.st_ino, last_st.st_size, last_st.st_mtime_ns
+        files = kept
+        for path, st in zip(paths[len(kept):], stats[len(kept):]):
+            new, offset = read_segment(path)
+            files.append([path, st.st_ino, st.st_size, st.st_mtime_ns, offset, self._add(records, times, new)])
+        self._times, self._records, self._files = times, records, files
+        return True
+
+    def refresh(self):
+        with self.lock:
+            paths = self._source_files()
+            try:
+                stats = [os.stat(p) for p in paths]
+            except FileNotFoundError:
+                self.misses += 1
+                self._reload()
+                return
+            current = [(p, st.st_ino, st.st_size, st.st_mtime_ns) for p, st in zip(paths, stats)]
+            if current == [tuple(f[:4]) for f in self._files]:
+                self.hits += 1
+                return
+            try:
+                extended = self._try_extend(paths, stats)
+            except FileNotFoundError:
+                extended = False
+            if extended:
+                self.extends += 1
+            else:
+                self.misses += 1
+                self._reload()
+
+    def iter_timed(self, since=None):
+        self.refresh()
+        times, records = self._times, self._records
+        start = bisect_left(times, since) if since is not None else 0
+        for i in range(start, len(records)):
+            yield times[i], records[i]
+
+    def iter_results(self, since=None):
+        for ts, r in self.iter_timed(since):
+            yield r
+
+    def version(self):
+        self.refresh()
+        times = self._times
+        return f"{len(times)}-{times[-1] if times else None}"
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "incremental_extends": self.extends,
+            "records": len(self._records),
+            "files": len(self._files)
+        }
+
+
+def open_history(config):
+    """Dateibasierte Backends bekommen den Cache, SQLite fragt direkt per Index ab"""
+    store = open_store(config)
+    if isinstance(store, (SegmentedStore, JsonFileStore)):
+        return HistoryCache(store)
+    return store
+
+STORE = open_history(CONFIG)
+ROLLUPS = open_rollups(CONFIG)
+LATENCY = engine_from_config(CONFIG)
+LIVE = broadcaster_from_config(CONFIG)
+# Pings, Interface-Status und Live-Historie schreibt nur der Sampler
+IFACE = state_from_config(CONFIG) if SAMPLER else None
+OUTAGES = open_outages(CONFIG)
+HISTORY = history_from_config(CONFIG, CONFIG.get("targets", {})) if SAMPLER else None
+SHARED = shared_state_from_config(CONFIG, writer=SAMPLER)
+# Live-Metriken des Dashboards, vom background_worker fortgeschrieben (Probe-Metriken liefert der Prober selbst)
+METRICS = Registry()
+LIVE_RTT = METRICS.histogram("wifi_prober_live_rtt_seconds", "RTT der Live-Pings (1 pro Sekunde)", ("target",))
+LIVE_UP = METRICS.gauge("wifi_prober_live_ping_up", "1 wenn der letzte Live-Ping beantwortet wurde", ("target",))
+SYSTEM_GAUGES = {key: METRICS.gauge(f"wifi_prober_system_{key}_{unit}", text) for key, unit, text in (
+    ("cpu", "percent", "CPU-Auslastung"),
+    ("ram", "percent", "RAM-Auslastung"),
+    ("disk", "percent", "Belegung der Root-Partition"),
+    ("temp", "celsius", "CPU-Temperatur")
+)}
+# Pro Prozess: im Web-Betrieb hat jeder Worker seine eigenen Stream-Clients
+WORKER_METRICS = Registry()
+LIVE_CLIENTS = WORKER_METRICS.gauge("wifi_prober_live_stream_clients", "Verbundene Live-Stream Clients",
+                                    ("pid",))
+
+def window_start(hours):
+    """Epoch-Zeitpunkt `hours` Stunden in der Vergangenheit"""
+    return time.time() - hours * 3600
 
 def get_cpu_temp():
     try:
@@ -47,77 +235,126 @@ def get_cpu_temp():
     except:
         return 0
         
+def live_state():
+    """Letzter Stand des Samplers aus dem Shared-Memory, leer solange er nicht läuft"""
+    return SHARED.read()[1] or {}
+
 def get_wlan0_ip():
-    try:
-        result = subprocess.run(
-            ['ip', '-4', 'addr', 'show', 'wlan0'],
-            capture_output=True, text=True, timeout=5
-        )
-        match = re.search(r'inet\s+(\d+\.\d+\.\d+\.\d+)', result.stdout)
-        if match:
-            return match.group(1)
-    except Exception as e:
-        print(f"Fehler beim Holen der wlan0 IP: {e}")
-    return "Nicht verfügbar"
-
-def detect_wifi_outages(results):
-    outages = []
-    for i, r in enumerate(results):
-        ping_google = r.get("ping", {}).get("google", {})
-        ping_cloudflare = r.get("ping", {}).get("cloudflare", {})
-        speedtest = r.get("speedtest", {})
-        
-        ping_fail = not ping_google.get("success", False) and not ping_cloudflare.get("success", False)
-        speedtest_fail = "error" in speedtest
-        
-        if ping_fail or speedtest_fail:
-            outages.append({
-                "timestamp": r["timestamp"],
-                "reason": "Kein Ping" if ping_fail else "Speedtest fehlgeschlagen",
-                "index": i
-            })
-    return outages
+    # Aus dem Schnappschuss des InterfaceState, kein ip-Prozess pro Request
+    return live_state().get("interface", {}).get("ip") or "Nicht verfügbar"
 
-def run_single_ping(target):
-    try:
-        # Versuche Ping über wlan0
-        cmd = ['ping', '-I', 'wlan0', '-c', '1', '-W', '1', target]
-        result = subprocess.run(cmd, capture_output=True, text=True)
-        
-        # Fallback ohne Interface-Bindung falls wlan0 fehlschlägt
-        if result.returncode != 0:
-            cmd = ['ping', '-c', '1', '-W', '1', target]
-            result = subprocess.run(cmd, capture_output=True, text=True)
-
-        if result.returncode == 0:
-            match = re.search(r'time=([\d.]+)', result.stdout)
-            if match:
-                val = float(match.group(1))
-                return {"avg_ms": val, "success": True}
-    except:
-        pass
-    return {"avg_ms": 0, "success": False}
+def live_history():
+    """Web-Worker öffnen die Historie des Samplers nur lesend, neu wenn er sie neu angelegt hat"""
+    global HISTORY
+    if HISTORY is None or (not SAMPLER and HISTORY.stale()):
+        try:
+            HISTORY = history_from_config(CONFIG, CONFIG.get("targets", {}), create=False)
+        except (OSError, ValueError):
+            return None
+    return HISTORY
+
+def target_label(target):
+    host, port = split_target(target)
+    return f"{host}:{port}" if port else host
 
 def background_worker():
-    targets = {"google": "8.8.8.8", "cloudflare": "1.1.1.1"}
     print("Live-Worker gestartet (Ping & System Stats)...")
+    budget = CONFIG.get("ping", {}).get("live_budget_seconds", 1.5)
     while True:
-        for name, ip in targets.items():
-            res = run_single_ping(ip)
-            current_live_data["ping"][name] = res
+        # Alle Ziele gleichzeitig aus einem Event-Loop, keine ping-Prozesse.
+        # Ziele jedes Mal neu auflösen, damit sich ändernde Gateways/DNS-Server mitkommen.
+        targets = targets_from_config(CONFIG)
+        pings = {}
+        try:
+            current_live_data["targets"] = {name: target_label(t) for name, t in targets.items()}
+            pings = LATENCY.ping_many(targets, budget)
+            current_live_data["ping"].update(pings)
+            OUTAGES.observe_live(time.time(), pings)
+            for name, p in pings.items():
+                LIVE_UP.set(1 if p.get("success") else 0, target=name)
+                if p.get("success"):
+                    LIVE_RTT.observe(p["avg_ms"] / 1000, target=name)
+        except Exception as e:
+            print(f"Fehler bei Live-Ping: {e}")
 
         try:
             current_live_data["system"]["cpu"] = psutil.cpu_percent(interval=None)
             current_live_data["system"]["ram"] = psutil.virtual_memory().percent
             current_live_data["system"]["disk"] = psutil.disk_usage('/').percent
             current_live_data["system"]["temp"] = get_cpu_temp()
+            for key, gauge in SYSTEM_GAUGES.items():
+                gauge.set(current_live_data["system"][key])
         except Exception as e:
             print(f"Fehler bei System-Stats: {e}")
 
-        time.sleep(1)
+        # 1 Hz Historie: nur Pings dieses Durchlaufs, verlorene bleiben leer
+        samples = {f"ping.{name}": p["avg_ms"] for name, p in pings.items() if p.get("success")}
+        samples.update(current_live_data["system"])
+        HISTORY.record(time.time(), samples)
 
-worker = threading.Thread(target=background_worker, daemon=True)
-worker.start()
+        # Einmal pro Sample für alle Web-Worker veröffentlichen, die es an ihre Dashboards verteilen
+        try:
+            SHARED.publish({
+                "live": current_live_data,
+                "interface": IFACE.get(),
+                "interface_stats": IFACE.stats(),
+                "metrics": METRICS.render().decode(),
+                "updated": time.time()
+            })
+        except ValueError as e:
+            print(f"Fehler beim Veröffentlichen des Live-Zustands: {e}")
+        # Auf die nächste volle Sekunde, ein Slot pro Sekunde in der Historie
+        time.sleep(1 - time.time() % 1)
+
+def outage_worker():
+    """Übernimmt neue Probe-Ergebnisse in die Ausfall-Intervalle und rechnet die SLA-Perioden nach"""
+    interval = CONFIG.get("outages", {}).get("refresh_seconds", 60)
+    while True:
+        try:
+            OUTAGES.sync_probes(STORE)
+            OUTAGES.refresh_sla()
+        except Exception as e:
+            print(f"Fehler bei der Ausfall-Auswertung: {e}")
+        time.sleep(interval)
+
+def live_relay():
+    """Reicht neue Stände aus dem Shared-Memory an die Live-Stream Clients dieses Prozesses weiter"""
+    last = None
+    while True:
+        seq = SHARED.sequence()
+        if seq is not None and seq != last:
+            seq, state = SHARED.read()
+            if state:
+                LIVE.publish("live", state["live"])
+            last = seq
+        time.sleep(0.1)
+
+if SAMPLER:
+    worker = threading.Thread(target=background_worker, daemon=True)
+    worker.start()
+    threading.Thread(target=outage_worker, daemon=True).start()
+if ROLE != "sampler":
+    threading.Thread(target=live_relay, daemon=True).start()
+
+@app.after_request
+def compress_and_cache(response):
+    """ETag und 304 für GET-Antworten, gzip für Text und JSON; Streams bleiben unberührt"""
+    if request.method != "GET" or response.status_code != 200 or response.is_streamed \
+            or response.direct_passthrough:
+        return response
+    # Chart-Endpoints setzen ihre ETag selbst, ohne die Daten zu hashen
+    response.add_etag()
+    response.headers.setdefault("Cache-Control", "no-cache")
+    response.make_conditional(request)
+    if response.status_code != 200:
+        return response
+    if response.mimetype in GZIP_MIMETYPES and "Content-Encoding" not in response.headers \
+            and (response.content_length or 0) >= GZIP_MIN_BYTES \
+            and "gzip" in request.accept_encodings:
+        response.set_data(gzip.compress(response.get_data(), compresslevel=6))
+        response.headers["Content-Encoding"] = "gzip"
+    response.vary.add("Accept-Encoding")
+    return response
 
 @app.route('/')
 def dashboard():
@@ -125,197 +362,317 @@ def dashboard():
 
 @app.route('/api/ping_multi')
 def api_ping_multi():
-    return jsonify(current_live_data)
+    return jsonify(live_state().get("live", current_live_data))
+
+@app.route('/api/live/stream')
+def api_live_stream():
+    client = LIVE.subscribe()
+    if client is None:
+        return jsonify({"error": "Zu viele Live-Verbindungen"}), 503
+    return Response(
+        stream_with_context(LIVE.stream(client)),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.route('/api/live/history')
+def api_live_history():
+    seconds = request.args.get("seconds", 3600, type=int)
+    step = request.args.get("step", type=int)
+    if step is None:
+        # Ohne Angabe auf das Punkte-Budget der Charts verdichten
+        step = math.ceil(seconds / CONFIG.get("dashboard", {}).get("chart_point_budget", 500))
+    aggregate = request.args.get("agg", "avg")
+    if aggregate not in LIVE_AGGREGATES:
+        return jsonify({"error": f"Unbekannte Aggregation, erlaubt: {', '.join(LIVE_AGGREGATES)}"}), 400
+    metrics = request.args.get("metrics")
+    history = live_history()
+    if history is None:
+        return jsonify({"error": "Noch keine Live-Historie, läuft der Sampler?"}), 503
+    return jsonify(history.history(seconds, step, metrics.split(",") if metrics else None, aggregate))
 
 @app.route('/api/stats')
 def api_stats():
-    data = load_results()
-    results = data.get("probe_results", [])
-    if not results:
+    summary = STORE.summary(window_start(24))
+    if not summary["total_probes"]:
         return jsonify({})
 
-    cutoff = datetime.now() - timedelta(hours=24)
-    recent = [r for r in results if datetime.fromisoformat(r["timestamp"].replace("Z", "")) > cutoff]
-
-    wifi_counts = [r.get("wifi_scan", {}).get("networks_found", 0) for r in recent]
-    avg_wifi = sum(wifi_counts) / len(wifi_counts) if wifi_counts else 0
-
-    speeds = []
-    for r in recent:
-        st = r.get("speedtest", {})
-        if "download_mbps" in st:
-            speeds.append(st["download_mbps"])
-    avg_speed = sum(speeds) / len(speeds) if speeds else 0
-
     return jsonify({
-        "total_probes": len(results),
-        "probes_24h": len(recent),
-        "avg_wifi_networks": round(avg_wifi, 1),
-        "avg_download_speed": round(avg_speed, 2),
-        "last_probe": results[-1]["timestamp"] if results else ""
+        "total_probes": summary["total_probes"],
+        "probes_24h": summary["probes_in_window"],
+        "avg_wifi_networks": round(summary["avg_wifi_networks"], 1),
+        "avg_download_speed": round(summary["avg_download_speed"], 2),
+        "last_probe": summary["last_probe"]
     })
     
 @app.route('/api/wlan0_ip')
 def api_wlan0_ip():
     ip = get_wlan0_ip()
-    return jsonify({"ip": ip, "interface": "wlan0", "status": "ok" if ip != "Nicht verfügbar" else "error"})
+    snapshot = live_state().get("interface", {})
+    return jsonify({"ip": ip, "interface": snapshot.get("interface"), "status": "ok" if ip != "Nicht verfügbar" else "error",
+                    "link": {key: snapshot.get(key) for key in
+                             ("operstate", "ssid", "bssid", "frequency", "signal", "tx_bitrate_mbps", "updated_at")}})
 
 @app.route('/api/outages')
 def api_outages():
-    data = load_results()
-    results = data.get("probe_results", [])
-    cutoff = datetime.now() - timedelta(hours=24)
-    
-    recent = []
-    for r in results:
-        try:
-            ts = datetime.fromisoformat(r["timestamp"].replace("Z", ""))
-            if ts > cutoff:
-                recent.append(r)
-        except:
-            continue
-    
-    outages = detect_wifi_outages(recent)
-    total_probes = len(recent)
-    outage_count = len(outages)
-    availability = round((1 - outage_count / total_probes) * 100, 1) if total_probes > 0 else 100
-    
-    return jsonify({
-        "outages": outages,
-        "outage_count": outage_count,
-        "total_probes": total_probes,
-        "availability_percent": availability
-    })
+    # Zusammengeführte Intervalle statt einzelner fehlgeschlagener Probes,
+    # Verfügbarkeit gewichtet über die beobachtete Zeit
+    report = OUTAGES.summarize(window_start(24))
+    report["outages"] = [format_outage(o) for o in report["outages"]]
+    if report["availability_percent"] is None:
+        report["availability_percent"] = 100
+    return jsonify(report)
+
+@app.route('/api/sla/<period>')
+def api_sla(period):
+    if period not in PERIODS:
+        return jsonify({"error": f"Unbekannte Periode, erlaubt: {', '.join(PERIODS)}"}), 400
+    limit = request.args.get("limit", 12, type=int)
+    return jsonify({"period": period, "reports": OUTAGES.sla(period, limit)})
 
 @app.route('/api/networks')
 def api_networks():
-    data = load_results()
-    results = data.get("probe_results", [])
-    cutoff = datetime.now() - timedelta(hours=24)
-    networks = {}
-
-    for r in results:
-        try:
-            ts = datetime.fromisoformat(r["timestamp"].replace("Z", ""))
-            if ts < cutoff:
-                continue
-        except:
-            continue
-
-        scan = r.get("wifi_scan", {}).get("networks", [])
-        for net in scan:
-            ssid = net.get("essid", "")
-            if not ssid:
-                continue
-
-            if ssid not in networks:
-                networks[ssid] = {
-                    "ssid": ssid,
-                    "first_seen": r["timestamp"],
-                    "last_seen": r["timestamp"],
-                    "max_signal": net.get("signal", -100),
-                    "encryption": net.get("encryption", "Unknown"),
-                    "count": 1
-                }
-            else:
-                networks[ssid]["last_seen"] = r["timestamp"]
-                networks[ssid]["count"] += 1
-                if net.get("signal", -100) > networks[ssid]["max_signal"]:
-                    networks[ssid]["max_signal"] = net.get("signal", -100)
-
-    return jsonify({"networks": list(networks.values())})
+    return jsonify({"networks": STORE.network_summary(window_start(24))})
+
+@app.route('/api/bssids')
+@app.route('/api/bssids/<int:hours>')
+def api_bssids(hours=24):
+    # Aus den stündlichen BSSID-Aggregaten, nicht aus der Rohhistorie
+    return jsonify({"hours": hours, "bssids": ROLLUPS.bssids(window_start(hours))})
+
+def chart_resolution(metric, hours):
+    """Rohdaten solange sie ins Punkte-Budget passen, sonst die passende Rollup-Auflösung"""
+    budget = CONFIG.get("dashboard", {}).get("chart_point_budget", 500)
+    if ROLLUPS.count(metric, window_start(hours)) <= budget:
+        return None
+    return pick_resolution(hours * 3600, budget)
+
+def rollup_chart(series_metrics, res, since):
+    """Chart-Daten aus Rollups: avg unter dem bisherigen Key, dazu _min/_max/_p95"""
+    data = {key: ROLLUPS.series(metric, res, since) for key, metric in series_metrics.items()}
+    buckets = sorted(set().union(*(d.keys() for d in data.values())))
+    chart = {"timestamps": [bucket_label(b) for b in buckets]}
+    for key, values in data.items():
+        for i, suffix in enumerate(["", "_min", "_max", "_p95"]):
+            chart[key + suffix] = [round(values[b][i], 2) if b in values else None for b in buckets]
+    return chart
+
+def chart_cursor(hours, resolution):
+    """Beginn der Abfrage: ?since= (letzter Punkt beim Client) oder der Fensteranfang
+
+    Liefert (since_epoch, delta). Ein Delta gibt es nur, wenn der Client dieselbe
+    Auflösung (?res=) hat - sonst bekommt er das ganze Fenster neu.
+    """
+    start = window_start(hours)
+    cursor = request.args.get("since")
+    if not cursor or request.args.get("res") != (resolution[0] if resolution else "raw"):
+        return start, False
+    try:
+        return max(parse_timestamp(cursor), start), True
+    except ValueError:
+        return start, False
+
+def chart_etag():
+    """ETag aus URL (inkl. Cursor) und Datenstand - ohne die Chart-Daten zu berechnen"""
+    return hashlib.md5(f"{request.full_path}|{STORE.version()}".encode()).hexdigest()
+
+def chart_response(chart, etag, delta):
+    # Cursor = letzter Zeitstempel; bei Rollups wird der (offene) letzte Bucket im nächsten Delta erneut geliefert
+    chart["delta"] = delta
+    chart["cursor"] = chart["timestamps"][-1] if chart["timestamps"] else request.args.get("since") if delta else None
+    response = jsonify(chart)
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = "no-cache"
+    return response
+
+def not_modified(etag):
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+        response.set_etag(etag)
+        return response
+    return None
 
 @app.route('/api/chart/speedtest/<int:hours>')
 def api_chart_speedtest(hours):
-    data = load_results()
-    results = data.get("probe_results", [])
-    cutoff = datetime.now() - timedelta(hours=hours)
-    timestamps, downloads, uploads = [], [], []
-
-    for r in results:
-        if datetime.fromisoformat(r["timestamp"].replace("Z", "")) > cutoff:
-            st = r.get("speedtest", {})
-            if "download_mbps" in st:
-                timestamps.append(r["timestamp"])
-                downloads.append(st["download_mbps"])
-                uploads.append(st.get("upload_mbps", 0))
-
-    return jsonify({"timestamps": timestamps, "downloads": downloads, "uploads": uploads})
+    etag = chart_etag()
+    cached = not_modified(etag)
+    if cached:
+        return cached
+    resolution = chart_resolution("speedtest.download_mbps", hours)
+    since, delta = chart_cursor(hours, resolution)
+    if resolution:
+        chart = rollup_chart({"downloads": "speedtest.download_mbps", "uploads": "speedtest.upload_mbps"},
+                             resolution[1], since)
+        chart["resolution"] = resolution[0]
+        return chart_response(chart, etag, delta)
+
+    rows = STORE.speedtest_series(since)
+    return chart_response({
+        "timestamps": [r[0] for r in rows],
+        "downloads": [r[1] for r in rows],
+        "uploads": [r[2] for r in rows],
+        "resolution": "raw"
+    }, etag, delta)
+
+@app.route('/api/chart/bufferbloat/<int:hours>')
+def api_chart_bufferbloat(hours):
+    # Median-Latenz im Leerlauf und während Download/Upload des Speedtests
+    etag = chart_etag()
+    cached = not_modified(etag)
+    if cached:
+        return cached
+    keys = ("idle_ms", "download_ms", "upload_ms", "added_ms")
+    resolution = chart_resolution("bufferbloat.added_ms", hours)
+    since, delta = chart_cursor(hours, resolution)
+    if resolution:
+        chart = rollup_chart({key: f"bufferbloat.{key}" for key in keys}, resolution[1], since)
+        chart["resolution"] = resolution[0]
+        return chart_response(chart, etag, delta)
+
+    rows = STORE.bufferbloat_series(since)
+    chart = {"timestamps": [r[0] for r in rows], "grades": [r[2] for r in rows], "resolution": "raw"}
+    for key in keys:
+        chart[key] = [r[1].get(key) for r in rows]
+    return chart_response(chart, etag, delta)
 
 @app.route('/api/chart/wifi/<int:hours>')
 def api_chart_wifi(hours):
-    data = load_results()
-    results = data.get("probe_results", [])
-    cutoff = datetime.now() - timedelta(hours=hours)
-    timestamps, counts = [], []
-
-    for r in results:
-        if datetime.fromisoformat(r["timestamp"].replace("Z", "")) > cutoff:
-            timestamps.append(r["timestamp"])
-            counts.append(r.get("wifi_scan", {}).get("networks_found", 0))
-
-    return jsonify({"timestamps": timestamps, "network_counts": counts})
+    etag = chart_etag()
+    cached = not_modified(etag)
+    if cached:
+        return cached
+    resolution = chart_resolution("wifi.networks_found", hours)
+    since, delta = chart_cursor(hours, resolution)
+    if resolution:
+        chart = rollup_chart({"network_counts": "wifi.networks_found"}, resolution[1], since)
+        chart["resolution"] = resolution[0]
+        return chart_response(chart, etag, delta)
+
+    rows = STORE.wifi_series(since)
+    return chart_response({"timestamps": [r[0] for r in rows], "network_counts": [r[1] for r in rows],
+                           "resolution": "raw"}, etag, delta)
 
 @app.route('/api/chart/ping/<int:hours>')
 def api_chart_ping(hours):
-    data = load_results()
-    results = data.get("probe_results", [])
-    cutoff = datetime.now() - timedelta(hours=hours)
-    timestamps, google_pings, cloudflare_pings = [], [], []
-
-    for r in results:
-        try:
-            if datetime.fromisoformat(r["timestamp"].replace("Z", "")) <= cutoff:
-                continue
-            
-            ping_data = r.get("ping", {})
-            
-            # Daten sammeln (auch null zulassen damit Chart Lücken hat statt 0)
-            g_val = None
-            c_val = None
-            
-            if ping_data:
-                g = ping_data.get("google", {})
-                c = ping_data.get("cloudflare", {})
-                if g.get("success"): g_val = g.get("avg_ms")
-                if c.get("success"): c_val = c.get("avg_ms")
-            
-            # Nur hinzufügen wenn mindestens einer Daten hat
-            if g_val is not None or c_val is not None:
-                timestamps.append(r["timestamp"])
-                google_pings.append(g_val)
-                cloudflare_pings.append(c_val)
-        except:
-            continue
-
-    return jsonify({"timestamps": timestamps, "google": google_pings, "cloudflare": cloudflare_pings})
+    # ?field= wählt die Kennzahl aus dem Ping-Burst (avg_ms, p95_ms, jitter_ms, loss_pct, ...)
+    field = request.args.get("field", "avg_ms")
+    if field not in PING_FIELDS:
+        return jsonify({"error": f"Unbekanntes Feld: {field}"}), 400
+    etag = chart_etag()
+    cached = not_modified(etag)
+    if cached:
+        return cached
+    suffix = "" if field == "avg_ms" else f".{field}"
+    names = list(CONFIG.get("targets", {}))
+    metrics = {name: f"ping.{name}{suffix}" for name in names}
+    resolution = chart_resolution(metrics[names[0]], hours) if names else None
+    since, delta = chart_cursor(hours, resolution)
+    if resolution:
+        chart = rollup_chart(metrics, resolution[1], since)
+        return chart_response({
+            "timestamps": chart["timestamps"],
+            "targets": names,
+            "series": {name: chart[name] for name in names},
+            "bands": {name: {"min": chart[name + "_min"], "max": chart[name + "_max"], "p95": chart[name + "_p95"]}
+                      for name in names},
+            "resolution": resolution[0],
+            "field": field
+        }, etag, delta)
+
+    # Fehlgeschlagene Pings sind null, damit der Chart Lücken hat statt 0
+    rows = STORE.ping_series(since, field)
+    for _, values in rows:
+        for name in values:
+            if name not in names:
+                names.append(name)  # Ziele aus der Historie, die nicht mehr konfiguriert sind
+    return chart_response({
+        "timestamps": [r[0] for r in rows],
+        "targets": names,
+        "series": {name: [r[1].get(name) for r in rows] for name in names},
+        "resolution": "raw",
+        "field": field
+    }, etag, delta)
 
 @app.route('/api/scan/trigger', methods=['POST'])
 def api_scan_trigger():
-    global SCAN_IN_PROGRESS
-    if SCAN_IN_PROGRESS:
-        return jsonify({"status": "busy", "message": "Scan läuft bereits"}), 429
-
-    def run_restart():
-        global SCAN_IN_PROGRESS
-        SCAN_IN_PROGRESS = True
-        try:
-            subprocess.run(["sudo", "systemctl", "restart", "wifi-prober.service"], timeout=10)
-            time.sleep(20)
-        finally:
-            SCAN_IN_PROGRESS = False
-
-    t = threading.Thread(target=run_restart, daemon=True)
-    t.start()
-    return jsonify({"status": "started", "message": "Scan ausgelöst"})
+    # Auftrag an den laufenden Prober (Control-Socket) statt Neustart des Dienstes
+    body = request.get_json(silent=True)
+    command = body.get("command", "scan") if isinstance(body, dict) else "scan"
+    # Nur Aufträge, keine Abfragen wie status/job über diesen Endpoint
+    if not isinstance(command, str) or command not in CONTROL_COMMANDS:
+        return jsonify({"status": "error",
+                        "message": f"Unbekannter Befehl, erlaubt: {', '.join(CONTROL_COMMANDS)}"}), 400
+    try:
+        response = send_command(CONTROL_SOCKET, {"cmd": command, "results": False})
+    except (OSError, ValueError) as e:
+        return jsonify({"status": "error", "message": f"Prober nicht erreichbar: {e}"}), 503
+    if not response.get("ok"):
+        return jsonify({"status": "error", "message": response.get("error")}), 400
+    return jsonify({"status": "started", "message": f"{command} ausgelöst", "job": response["job"]})
 
 @app.route('/api/scan/status')
 def api_scan_status():
-    return jsonify({"scanning": SCAN_IN_PROGRESS})
+    job_id = request.args.get("job", type=int)
+    wait = min(request.args.get("wait", 0, type=float), 30)
+    try:
+        if job_id is None:
+            response = send_command(CONTROL_SOCKET, {"cmd": "status"})
+        else:
+            response = send_command(CONTROL_SOCKET, {"cmd": "job", "id": job_id, "wait": wait}, timeout=wait + 10)
+    except (OSError, ValueError) as e:
+        return jsonify({"scanning": False, "error": f"Prober nicht erreichbar: {e}"}), 503
+    if not response.get("ok"):
+        return jsonify({"scanning": False, "error": response.get("error")}), 404
+    if job_id is None:
+        active = [job for job in response["jobs"] if job["state"] in ("queued", "running")]
+        return jsonify({"scanning": bool(active), "jobs": active, "scheduler": response["scheduler"]})
+    job = response["job"]
+    return jsonify({"scanning": job["state"] in ("queued", "running"), "job": job})
+
+@app.route('/api/export')
+def api_export():
+    """Historie als Stream (ndjson, csv, parquet), ohne sie in den Speicher zu laden"""
+    fmt = request.args.get("format", "ndjson")
+    tables = request.args.get("tables")
+    try:
+        start, end = parse_time(request.args.get("from")), parse_time(request.args.get("to"))
+        export = Export(STORE, start, end, request.args.get("cursor"), tables.split(",") if tables else None,
+                        request.args.get("limit", type=int))
+        check_format(fmt, export)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    chunks = export_chunks(export, fmt)
+    filename = export_filename(fmt, start, end, export.tables[0] if len(export.tables) == 1 else None)
+    headers = {"Content-Disposition": f"attachment; filename={filename}", "Cache-Control": "no-store"}
+    # Parquet ist schon komprimiert
+    if fmt != "parquet" and "gzip" in request.accept_encodings:
+        chunks = gzip_chunks(chunks)
+        headers["Content-Encoding"] = "gzip"
+        headers["Vary"] = "Accept-Encoding"
+    return Response(chunks, mimetype=FORMATS[fmt][0], headers=headers)
+
+@app.route('/api/cache/stats')
+def api_cache_stats():
+    stats = STORE.stats() if isinstance(STORE, HistoryCache) else {"enabled": False}
+    stats["live_stream"] = LIVE.stats()
+    stats["interface_state"] = live_state().get("interface_stats", {})
+    stats["shared_state"] = dict(SHARED.stats(), role=ROLE, pid=os.getpid())
+    return jsonify(stats)
+
+@app.route('/metrics')
+def metrics():
+    # Live-Metriken rendert der Sampler, die Stream-Clients zählt dieser Worker
+    LIVE_CLIENTS.set(LIVE.stats().get("clients", 0), pid=str(os.getpid()))
+    text = live_state().get("metrics", "").encode()
+    return Response(text + WORKER_METRICS.render(), content_type=CONTENT_TYPE)
 
 @app.route('/api/health')
 def api_health():
     return jsonify({"status": "ok", "message": "System online"})
 
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5000)
+    if ROLE == "sampler":
+        print(f"Sampler läuft, Live-Zustand unter {SHARED.path}")
+        threading.Event().wait()
+    # threaded: jeder Live-Stream belegt einen Thread
+    app.run(host='0.0.0.0', port=5000, threaded=True)
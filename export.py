@@ -0,0 +1,342 @@
+#!/usr/bin/env python3
+import csv
+import io
+import json
+import sys
+import zlib
+from datetime import datetime
+
+from result_store import PING_FIELDS, parse_timestamp, network_band, network_channel, network_frequency_mhz, \
+    bufferbloat_values
+
+# Spalten pro Tabelle mit Typ (f = Zahl, i = Ganzzahl, s = Text, b = Ja/Nein);
+# jede Zeile trägt den Cursor ihrer Probe
+TABLES = {
+    "probes": (("cursor", "s"), ("timestamp", "s"), ("kinds", "s"), ("targets_ok", "i"), ("targets_failed", "i"),
+               ("networks_found", "i"), ("bssids_found", "i"), ("download_mbps", "f"), ("upload_mbps", "f"),
+               ("memory_usage", "s"), ("wifi_ip_address", "s")),
+    "pings": (("cursor", "s"), ("timestamp", "s"), ("target", "s"), ("success", "b"), ("sent", "i"),
+              ("received", "i")) + tuple((field, "f") for field in PING_FIELDS) + (("method", "s"),),
+    "speedtests": (("cursor", "s"), ("timestamp", "s"), ("download_mbps", "f"), ("upload_mbps", "f"),
+                   ("ping_ms", "f"), ("bufferbloat_ms", "f"), ("server", "s"), ("isp", "s"), ("backend", "s"),
+                   ("duration_seconds", "f"), ("error", "s")),
+    "networks": (("cursor", "s"), ("timestamp", "s"), ("bssid", "s"), ("essid", "s"), ("signal", "i"),
+                 ("quality_pct", "i"), ("channel", "i"), ("band", "s"), ("frequency_mhz", "i"),
+                 ("encryption", "s"))
+}
+FORMATS = {
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "csv": ("text/csv", "csv"),
+    "parquet": ("application/vnd.apache.parquet", "parquet")
+}
+# Ausgabe in Stücken dieser Größe, Parquet in Row-Groups dieser Zeilenzahl - beides begrenzt den Speicher
+CHUNK_BYTES = 64 * 1024
+ROW_GROUP_ROWS = 10000
+
+
+def parse_time(value):
+    """ISO-Zeitstempel oder Epoch-Sekunden, None wenn leer"""
+    if value in (None, ""):
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return parse_timestamp(value)
+
+
+def format_cursor(ts, index):
+    # repr, damit der Zeitstempel beim Zurücklesen exakt gleich ist
+    return f"{ts!r}:{index}"
+
+
+def parse_cursor(cursor):
+    ts, _, index = cursor.rpartition(":")
+    return float(ts), int(index)
+
+
+def coerce(value, kind):
+    if value is None or value == "":
+        return None
+    try:
+        if kind == "f":
+            return float(value)
+        if kind == "i":
+            return int(value)
+        if kind == "b":
+            return bool(value)
+    except (TypeError, ValueError):
+        return None
+    return str(value)
+
+
+def probe_rows(result, cursor, tables):
+    """(tabelle, zeile) für ein gespeichertes Ergebnis"""
+    timestamp = result.get("timestamp")
+    pings = result.get("ping") or {}
+    scan = result.get("wifi_scan") or {}
+    speedtest = result.get("speedtest") or {}
+    if "probes" in tables:
+        system = result.get("system_info") or {}
+        yield "probes", {
+            "cursor": cursor, "timestamp": timestamp,
+            "kinds": "+".join(k for k, key in (("ping", "ping"), ("scan", "wifi_scan"), ("speedtest", "speedtest"))
+                              if result.get(key)),
+            "targets_ok": sum(1 for p in pings.values() if p.get("success")) if pings else None,
+            "targets_failed": sum(1 for p in pings.values() if not p.get("success")) if pings else None,
+            "networks_found": scan.get("networks_found"), "bssids_found": scan.get("bssids_found"),
+            "download_mbps": speedtest.get("download_mbps"), "upload_mbps": speedtest.get("upload_mbps"),
+            "memory_usage": system.get("memory_usage"), "wifi_ip_address": system.get("wifi_ip_address")
+        }
+    if "pings" in tables:
+        for target, p in pings.items():
+            row = {field: p.get(field) for field, _ in TABLES["pings"]}
+            row.update(cursor=cursor, timestamp=timestamp, target=target)
+            yield "pings", row
+    if "speedtests" in tables and speedtest:
+        row = {field: speedtest.get(field) for field, _ in TABLES["speedtests"]}
+        row.update(cursor=cursor, timestamp=timestamp, bufferbloat_ms=bufferbloat_values(speedtest).get("added_ms"))
+        yield "speedtests", row
+    if "networks" in tables:
+        for net in scan.get("networks") or []:
+            yield "networks", {
+                "cursor": cursor, "timestamp": timestamp, "bssid": net.get("bssid"),
+                "essid": net.get("essid", net.get("ssid")), "signal": net.get("signal"),
+                "quality_pct": net.get("quality_pct"), "channel": network_channel(net), "band": network_band(net),
+                "frequency_mhz": network_frequency_mhz(net), "encryption": net.get("encryption")
+            }
+
+
+class Export:
+    """Export der Probes in [start, end) hinter `cursor`, als Generator über die Zeilen
+
+    Es wird immer nur ein Ergebnis aus dem Store gehalten, der Speicherbedarf
+    hängt nicht vom Zeitraum ab. Ein Cursor ("epoch:n", die n-te Probe mit
+    diesem Zeitstempel) steht in jeder Zeile; mit dem Cursor der letzten
+    vollständig empfangenen Probe geht ein abgebrochener Export dahinter
+    weiter. `limit` begrenzt die Probes mit Zeilen pro Export (Seiten),
+    abgeschnitten wird nur zwischen zwei Probes. Nach dem Durchlauf stehen
+    `cursor`, `complete`, `probes` und `rows` fest.
+    """
+
+    def __init__(self, store, start=None, end=None, cursor=None, tables=None, limit=None):
+        self.store = store
+        self.start = start
+        self.end = end
+        self.after = parse_cursor(cursor) if cursor else None
+        self.tables = list(tables or TABLES)
+        unknown = [t for t in self.tables if t not in TABLES]
+        if unknown:
+            raise ValueError(f"Unbekannte Tabelle {', '.join(unknown)}, erlaubt: {', '.join(TABLES)}")
+        self.limit = limit
+        self.cursor = cursor
+        self.complete = False
+        self.probes = 0
+        self.rows = 0
+
+    def __iter__(self):
+        since = self.start
+        if self.after is not None:
+            since = max(since, self.after[0]) if since is not None else self.after[0]
+        last_ts, index = None, 0
+        for ts, result in self.store.iter_timed(since):
+            if self.end is not None and ts >= self.end:
+                break
+            index = index + 1 if ts == last_ts else 0
+            last_ts = ts
+            if self.after is not None and (ts, index) <= self.after:
+                continue
+            cursor = format_cursor(ts, index)
+            rows = list(probe_rows(result, cursor, self.tables))
+            if rows:
+                if self.limit and self.probes >= self.limit:
+                    return
+                self.probes += 1
+                self.rows += len(rows)
+                yield from rows
+            self.cursor = cursor
+        self.complete = True
+
+    def summary(self):
+        return {"cursor": self.cursor, "complete": self.complete, "probes": self.probes, "rows": self.rows}
+
+
+def buffered(pieces):
+    """Kleine Stücke (str/bytes) zu Blöcken von etwa CHUNK_BYTES zusammenfassen"""
+    parts, size = [], 0
+    for piece in pieces:
+        if isinstance(piece, str):
+            piece = piece.encode()
+        parts.append(piece)
+        size += len(piece)
+        if size >= CHUNK_BYTES:
+            yield b"".join(parts)
+            parts, size = [], 0
+    if parts:
+        yield b"".join(parts)
+
+
+def ndjson_pieces(export):
+    """Eine Zeile pro Datensatz mit "table", am Ende eine Zeile "end" mit Cursor und Vollständigkeit"""
+    for table, row in export:
+        row["table"] = table
+        yield json.dumps(row, separators=(",", ":")) + "\n"
+    yield json.dumps(dict(table="end", **export.summary()), separators=(",", ":")) + "\n"
+
+
+def csv_pieces(export):
+    table = single_table(export, "CSV")
+    columns = [name for name, _ in TABLES[table]]
+    buf = io.StringIO()
+    writer = csv.DictWriter(buf, columns, extrasaction="ignore", lineterminator="\n")
+    writer.writeheader()
+    for _, row in export:
+        writer.writerow(row)
+        if buf.tell() >= CHUNK_BYTES:
+            yield buf.getvalue()
+            buf.seek(0)
+            buf.truncate()
+    yield buf.getvalue()
+
+
+class ChunkSink:
+    """Dateiähnliches Ziel für pyarrow, das nach jeder Row-Group geleert wird"""
+
+    def __init__(self):
+        self.parts = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data):
+        data = bytes(data)
+        self.parts.append(data)
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self):
+        data = b"".join(self.parts)
+        self.parts = []
+        return data
+
+
+def parquet_pieces(export):
+    """Parquet mit festem Schema, eine Row-Group pro ROW_GROUP_ROWS Zeilen"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    types = {"f": pa.float64(), "i": pa.int64(), "s": pa.string(), "b": pa.bool_()}
+    table = single_table(export, "Parquet")
+    columns = TABLES[table]
+    schema = pa.schema([(name, types[kind]) for name, kind in columns])
+    sink = ChunkSink()
+    writer = pq.ParquetWriter(sink, schema, compression="zstd")
+
+    def write(rows):
+        writer.write_table(pa.Table.from_pydict(
+            {name: [coerce(row.get(name), kind) for row in rows] for name, kind in columns}, schema=schema))
+        return sink.drain()
+
+    rows = []
+    for _, row in export:
+        rows.append(row)
+        if len(rows) >= ROW_GROUP_ROWS:
+            yield write(rows)
+            rows = []
+    if rows:
+        yield write(rows)
+    writer.close()
+    yield sink.drain()
+
+
+def single_table(export, label):
+    if len(export.tables) != 1:
+        raise ValueError(f"{label} braucht genau eine Tabelle (tables=), erlaubt: {', '.join(TABLES)}")
+    return export.tables[0]
+
+
+WRITERS = {"ndjson": ndjson_pieces, "csv": csv_pieces, "parquet": parquet_pieces}
+
+
+def check_format(fmt, export):
+    """Vor dem Streamen prüfen, was sonst erst mitten in der Antwort scheitern würde"""
+    if fmt not in FORMATS:
+        raise ValueError(f"Unbekanntes Format {fmt}, erlaubt: {', '.join(FORMATS)}")
+    if fmt != "ndjson":
+        single_table(export, fmt.upper())
+    if fmt == "parquet":
+        try:
+            import pyarrow.parquet  # noqa: F401
+        except ImportError:
+            raise ValueError("Parquet braucht pyarrow (pip3 install pyarrow)")
+
+
+def export_chunks(export, fmt):
+    """Der Export als Byte-Blöcke im gewünschten Format"""
+    check_format(fmt, export)
+    pieces = WRITERS[fmt](export)
+    # Parquet liefert schon Row-Groups, alles andere wird zu Blöcken gebündelt
+    return pieces if fmt == "parquet" else buffered(pieces)
+
+
+def gzip_chunks(chunks, level=6):
+    """Blöcke fortlaufend gzip-komprimieren, ohne die ganze Ausgabe zu puffern"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_filename(fmt, start=None, end=None, table=None):
+    def label(ts):
+        return datetime.fromtimestamp(ts).strftime("%Y%m%d-%H%M%S") if ts is not None else "alle"
+    name = "_".join(p for p in ("wifi_export", table, label(start), label(end)) if p)
+    return f"{name}.{FORMATS[fmt][1]}"
+
+
+def main():
+    import argparse
+    from probe_config import load_config
+    from result_store import open_store
+    parser = argparse.ArgumentParser(description="Probe-Historie aus dem lokalen Store exportieren "
+                                                 "(gleiches Format wie /api/export)")
+    parser.add_argument("--from", dest="start", help="Beginn (ISO-Zeitstempel oder Epoch)")
+    parser.add_argument("--to", dest="end", help="Ende, exklusiv (ISO-Zeitstempel oder Epoch)")
+    parser.add_argument("--format", default="ndjson", choices=sorted(FORMATS))
+    parser.add_argument("--tables", help=f"Komma-getrennt aus {', '.join(TABLES)} (CSV/Parquet: genau eine)")
+    parser.add_argument("--cursor", help="Hinter diesem Cursor fortsetzen")
+    parser.add_argument("--limit", type=int, help="Höchstens so viele Probes (mit Zeilen in den Tabellen)")
+    parser.add_argument("--gzip", action="store_true", help="Ausgabe gzip-komprimieren")
+    parser.add_argument("-o", "--output", help="Zieldatei (Standard: stdout)")
+    args = parser.parse_args()
+
+    store = open_store(load_config())
+    try:
+        export = Export(store, parse_time(args.start), parse_time(args.end), args.cursor,
+                        args.tables.split(",") if args.tables else None, args.limit)
+        chunks = export_chunks(export, args.format)
+    except ValueError as e:
+        parser.error(str(e))
+    if args.gzip:
+        chunks = gzip_chunks(chunks)
+    out = open(args.output, "wb") if args.output else sys.stdout.buffer
+    try:
+        for chunk in chunks:
+            out.write(chunk)
+    finally:
+        if args.output:
+            out.close()
+        store.close()
+    print(json.dumps(export.summary()), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,613 @@
+#!/usr/bin/env python3
+import gzip
+import hmac
+import http.server
+import json
+import os
+import random
+import socket
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+import zlib
+from pathlib import Path
+
+from result_store import parse_timestamp, network_band, network_channel, bufferbloat_values
+from sqlite_store import ThreadConnections
+
+SPOOL_FILE = "spool.jsonl"
+STATE_FILE = "spool.state"
+INGEST_PATH = "/api/fleet/ingest"
+# Grenzen pro Push beim Collector, komprimiert und entpackt
+MAX_BODY_BYTES = 8 * 1024 * 1024
+MAX_RECORDS_BYTES = 64 * 1024 * 1024
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS stations (
+    name TEXT PRIMARY KEY, address TEXT, first_seen REAL, last_seen REAL, last_record REAL,
+    records INTEGER NOT NULL DEFAULT 0, batches INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS probes (
+    station TEXT NOT NULL, timestamp TEXT NOT NULL, ts REAL NOT NULL, up INTEGER,
+    PRIMARY KEY (station, timestamp)
+);
+CREATE INDEX IF NOT EXISTS probes_station_ts ON probes (station, ts);
+CREATE TABLE IF NOT EXISTS pings (
+    station TEXT NOT NULL, ts REAL NOT NULL, target TEXT NOT NULL, success INTEGER NOT NULL,
+    avg_ms REAL, p95_ms REAL, jitter_ms REAL, loss_pct REAL
+);
+CREATE INDEX IF NOT EXISTS pings_station_ts ON pings (station, ts);
+CREATE TABLE IF NOT EXISTS speedtests (
+    station TEXT NOT NULL, ts REAL NOT NULL, failed INTEGER NOT NULL,
+    download_mbps REAL, upload_mbps REAL, ping_ms REAL, bufferbloat_ms REAL
+);
+CREATE INDEX IF NOT EXISTS speedtests_station_ts ON speedtests (station, ts);
+CREATE TABLE IF NOT EXISTS channels (
+    station TEXT NOT NULL, ts REAL NOT NULL, band TEXT, channel INTEGER, bssids INTEGER NOT NULL, max_signal INTEGER
+);
+CREATE INDEX IF NOT EXISTS channels_station_ts ON channels (station, ts);
+"""
+
+
+# --- Station: Spool und Push ---
+
+class RejectedBatch(Exception):
+    """Der Collector lehnt den Batch inhaltlich ab (HTTP 400), ein neuer Versuch hilft nicht"""
+
+
+class FleetSpool:
+    """Lokale Warteschlange für den Collector: append-only JSONL plus bestätigter Offset
+
+    Jedes Ergebnis wird als eine Zeile angehängt, der Pusher liest ab dem
+    bestätigten Offset und setzt ihn erst nach der Antwort des Collectors
+    weiter. Vollständig bestätigte Dateien werden geleert, ist der Spool über
+    `max_bytes`, fallen die ältesten Zeilen weg.
+    """
+
+    def __init__(self, directory, max_bytes=64 * 1024 * 1024):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.path = self.directory / SPOOL_FILE
+        self.state_path = self.directory / STATE_FILE
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.dropped = 0
+        try:
+            self.offset = json.loads(self.state_path.read_text())["offset"]
+        except (FileNotFoundError, ValueError, KeyError):
+            self.offset = 0
+        self.path.touch()
+        if self.offset > self.path.stat().st_size:
+            self.offset = 0
+
+    def add(self, record):
+        line = (json.dumps(record, separators=(",", ":")) + "\n").encode()
+        with self.lock:
+            with open(self.path, "ab") as f:
+                f.write(line)
+            if self.pending_bytes() > self.max_bytes:
+                self._drop_oldest()
+
+    def pending_bytes(self):
+        return self.path.stat().st_size - self.offset
+
+    def _drop_oldest(self):
+        """Ältestes Viertel verwerfen, damit nicht bei jedem add() gekürzt wird"""
+        target = self.path.stat().st_size - self.max_bytes * 3 // 4
+        with open(self.path, "rb") as f:
+            f.seek(self.offset)
+            while self.offset < target:
+                line = f.readline()
+                if not line:
+                    break
+                self.offset += len(line)
+                self.dropped += 1
+        self._save_offset()
+
+    def peek(self, max_records, max_bytes=MAX_RECORDS_BYTES // 2):
+        """(ergebnisse, end_offset) ab dem bestätigten Offset, nur vollständige Zeilen"""
+        records = []
+        with self.lock:
+            end = self.offset
+            with open(self.path, "rb") as f:
+                f.seek(end)
+                for raw in f:
+                    if not raw.endswith(b"\n") or len(records) >= max_records or end - self.offset >= max_bytes:
+                        break
+                    end += len(raw)
+                    try:
+                        records.append(json.loads(raw))
+                    except ValueError:
+                        continue
+        return records, end
+
+    def ack(self, end):
+        with self.lock:
+            self.offset = max(self.offset, end)
+            size = self.path.stat().st_size
+            if self.offset >= size:
+                # Alles bestätigt: Datei leeren statt endlos wachsen lassen
+                os.truncate(self.path, 0)
+                self.offset = 0
+            elif self.offset > size // 2 and self.offset > 1024 * 1024:
+                self._compact()
+            self._save_offset()
+
+    def _compact(self):
+        tmp = self.path.with_suffix(".tmp")
+        with open(self.path, "rb") as src, open(tmp, "wb") as dst:
+            src.seek(self.offset)
+            while True:
+                chunk = src.read(1024 * 1024)
+                if not chunk:
+                    break
+                dst.write(chunk)
+        os.replace(tmp, self.path)
+        self.offset = 0
+
+    def _save_offset(self):
+        tmp = self.state_path.with_suffix(".tmp")
+        tmp.write_text(json.dumps({"offset": self.offset}))
+        os.replace(tmp, self.state_path)
+
+
+class FleetPusher:
+    """Schickt die gespoolten Ergebnisse gebündelt und gzip-komprimiert an den Collector
+
+    Alle `push_seconds` oder sobald `batch_size` Ergebnisse warten. Ist der
+    Collector nicht erreichbar, bleibt alles im Spool und der nächste Versuch
+    kommt mit exponentiell wachsender Pause (mit Jitter) bis
+    `max_backoff_seconds`. Der Collector verwirft doppelt gelieferte
+    Ergebnisse, ein Push ohne Antwort darf also einfach wiederholt werden.
+    """
+
+    def __init__(self, url, station, spool, token=None, batch_size=500, push_seconds=30,
+                 max_backoff_seconds=600, timeout=30, logger=None):
+        self.url = url.rstrip("/") + INGEST_PATH
+        self.station = station
+        self.spool = spool
+        self.token = token
+        self.batch_size = batch_size
+        self.push_seconds = push_seconds
+        self.max_backoff_seconds = max_backoff_seconds
+        self.timeout = timeout
+        self.logger = logger
+        self.backoff = 0
+        self.pending = 0
+        self.pushed = 0
+        self.failures = 0
+        self.last_error = None
+        self.last_push = None
+        self.wake = threading.Event()
+        self.stopped = threading.Event()
+        self.thread = None
+
+    def add(self, result):
+        self.spool.add(result)
+        self.pending += 1
+        if self.pending >= self.batch_size and not self.backoff:
+            self.wake.set()
+
+    def start(self):
+        self.thread = threading.Thread(target=self._run, name="fleet-push", daemon=True)
+        self.thread.start()
+        return self
+
+    def close(self):
+        """Letzter Push-Versuch, was dann nicht durch ist, bleibt im Spool"""
+        self.stopped.set()
+        self.wake.set()
+        if self.thread is not None:
+            self.thread.join(self.timeout + 5)
+
+    def _run(self):
+        while not self.stopped.is_set():
+            self.wake.wait(self.backoff or self.push_seconds)
+            self.wake.clear()
+            try:
+                self.flush()
+                self.backoff = 0
+            except (OSError, ValueError) as e:
+                self.failures += 1
+                self.last_error = str(e)
+                base = min(max(self.backoff * 2, self.push_seconds), self.max_backoff_seconds)
+                self.backoff = base * random.uniform(0.75, 1.0)
+                if self.logger:
+                    self.logger.warning(f"Fleet: Collector nicht erreichbar ({e}), "
+                                        f"{self.spool.pending_bytes()} Bytes im Spool, nächster Versuch in "
+                                        f"{self.backoff:.0f}s")
+            if self.stopped.is_set():
+                break
+
+    def flush(self):
+        """Alles Gespoolte schicken, Batch für Batch; wirft OSError beim ersten Fehlschlag"""
+        while True:
+            records, end = self.spool.peek(self.batch_size)
+            if not records:
+                self.pending = 0
+                return
+            try:
+                self.send(records)
+            except RejectedBatch as e:
+                if self.logger:
+                    self.logger.error(f"Fleet: Collector lehnt {len(records)} Ergebnisse ab, verworfen: {e}")
+                self.spool.dropped += len(records)
+                self.spool.ack(end)
+                continue
+            self.spool.ack(end)
+            self.pushed += len(records)
+            self.pending = max(self.pending - len(records), 0)
+            self.last_push = time.time()
+
+    def send(self, records):
+        batch = []
+        for r in records:
+            try:
+                # Epoch auf der Station berechnen, ihre Zeitzone kennt der Collector nicht
+                batch.append({"ts": parse_timestamp(r["timestamp"]), "result": r})
+            except (KeyError, TypeError, ValueError):
+                continue
+        body = gzip.compress(json.dumps({"station": self.station, "records": batch},
+                                        separators=(",", ":")).encode(), compresslevel=6)
+        headers = {"Content-Type": "application/json", "Content-Encoding": "gzip"}
+        if self.token:
+            headers["Authorization"] = f"Bearer {self.token}"
+        request = urllib.request.Request(self.url, data=body, headers=headers, method="POST")
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                return json.loads(response.read())
+        except urllib.error.HTTPError as e:
+            message = f"HTTP {e.code}: {e.read()[:200].decode(errors='replace')}"
+            if e.code == 413 and self.batch_size > 1:
+                # Zu groß für den Collector: kleinere Batches, gleich nochmal
+                self.batch_size = max(self.batch_size // 2, 1)
+                self.wake.set()
+            elif e.code == 400:
+                raise RejectedBatch(message)
+            raise OSError(message)
+
+    def stats(self):
+        return {"url": self.url, "station": self.station, "pushed": self.pushed, "failures": self.failures,
+                "spool_bytes": self.spool.pending_bytes(), "dropped": self.spool.dropped,
+                "backoff_seconds": round(self.backoff, 1), "last_push": self.last_push, "last_error": self.last_error}
+
+
+# --- Collector ---
+
+class FleetStore:
+    """Ergebnisse aller Stationen in einer SQLite-Datenbank, indiziert nach (station, ts)
+
+    Gespeichert werden die Werte, die die Flotten-Abfragen brauchen: Pings
+    pro Ziel, Speedtests und pro Scan die BSSIDs je Kanal. Eine Probe zählt
+    pro (station, timestamp) nur einmal, wiederholte Pushes sind harmlos.
+    """
+
+    def __init__(self, path, stale_seconds=300):
+        self.path = str(path)
+        self.stale_seconds = stale_seconds
+        self._connections = ThreadConnections(self.path, timeout=30)
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        self.conn.executescript(SCHEMA)
+
+    @property
+    def conn(self):
+        return self._connections.get()
+
+    def ingest(self, station, records, address=None):
+        """Ein Batch einer Station in einer Transaktion, gibt {"inserted", "duplicates"} zurück"""
+        conn = self.conn
+        inserted = duplicates = 0
+        last_record = None
+        now = time.time()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            for entry in records:
+                ts, result = entry["ts"], entry["result"]
+                if self._insert(conn, station, float(ts), result):
+                    inserted += 1
+                    last_record = max(last_record or ts, ts)
+                else:
+                    duplicates += 1
+            conn.execute(
+                "INSERT INTO stations (name, address, first_seen, last_seen, last_record, records, batches) "
+                "VALUES (?, ?, ?, ?, ?, ?, 1) ON CONFLICT (name) DO UPDATE SET address = excluded.address, "
+                "last_seen = excluded.last_seen, last_record = MAX(COALESCE(last_record, 0), "
+                "COALESCE(excluded.last_record, 0)), records = records + excluded.records, batches = batches + 1",
+                (station, address, now, now, last_record, inserted)
+            )
+        return {"inserted": inserted, "duplicates": duplicates}
+
+    def _insert(self, conn, station, ts, result):
+        pings = result.get("ping") or {}
+        up = int(any(p.get("success") for p in pings.values())) if pings else None
+        cur = conn.execute("INSERT OR IGNORE INTO probes (station, timestamp, ts, up) VALUES (?, ?, ?, ?)",
+                           (station, result["timestamp"], ts, up))
+        if cur.rowcount == 0:
+            return False
+        conn.executemany(
+            "INSERT INTO pings (station, ts, target, success, avg_ms, p95_ms, jitter_ms, loss_pct) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            [(station, ts, target, int(bool(p.get("success"))), p.get("avg_ms") if p.get("success") else None,
+              p.get("p95_ms"), p.get("jitter_ms"), p.get("loss_pct")) for target, p in pings.items()]
+        )
+        speedtest = result.get("speedtest")
+        if speedtest:
+            failed = "error" in speedtest or not speedtest.get("download_mbps")
+            conn.execute(
+                "INSERT INTO speedtests (station, ts, failed, download_mbps, upload_mbps, ping_ms, bufferbloat_ms) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (station, ts, int(failed), speedtest.get("download_mbps"), speedtest.get("upload_mbps"),
+                 speedtest.get("ping_ms"), bufferbloat_values(speedtest).get("added_ms"))
+            )
+        networks = (result.get("wifi_scan") or {}).get("networks")
+        if networks is not None:
+            channels = {}
+            for net in networks:
+                key = (network_band(net), network_channel(net))
+                count, strongest = channels.get(key, (0, None))
+                signal = net.get("signal")
+                channels[key] = (count + 1, signal if strongest is None or (signal or -999) > strongest else strongest)
+            # Leerer Scan als eigene Zeile, damit er im Mittel pro Scan mitzählt
+            rows = [(station, ts, band, channel, count, strongest)
+                    for (band, channel), (count, strongest) in channels.items()] or [(station, ts, None, None, 0, None)]
+            conn.executemany(
+                "INSERT INTO channels (station, ts, band, channel, bssids, max_signal) VALUES (?, ?, ?, ?, ?, ?)", rows
+            )
+        return True
+
+    def stations(self, now=None):
+        now = now or time.time()
+        rows = self.conn.execute(
+            "SELECT name, address, first_seen, last_seen, last_record, records, batches FROM stations ORDER BY name"
+        ).fetchall()
+        return [{"station": name, "address": address, "first_seen": first_seen, "last_seen": last_seen,
+                 "last_record": last_record, "records": records, "batches": batches,
+                 "online": last_seen is not None and now - last_seen <= self.stale_seconds}
+                for name, address, first_seen, last_seen, last_record, records, batches in rows]
+
+    def _quantile(self, table, column, where, params, count, pct):
+        """Perzentil (nearest-rank) direkt in SQL, ohne die Werte zu laden"""
+        if not count:
+            return None
+        rank = max(1, -(-pct * count // 100))
+        row = self.conn.execute(
+            f"SELECT {column} FROM {table} WHERE {where} AND {column} IS NOT NULL ORDER BY {column} "
+            f"LIMIT 1 OFFSET ?", params + (rank - 1,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def latency(self, since, target=None):
+        """RTT und Verlust pro Station (optional nur ein Ziel), beste zuerst"""
+        out = []
+        for (station,) in self.conn.execute("SELECT name FROM stations ORDER BY name").fetchall():
+            where, params = "station = ? AND ts >= ?", (station, since)
+            if target:
+                where, params = where + " AND target = ?", params + (target,)
+            samples, ok, avg, jitter, loss = self.conn.execute(
+                f"SELECT COUNT(*), COUNT(avg_ms), AVG(avg_ms), AVG(jitter_ms), AVG(loss_pct) FROM pings WHERE {where}",
+                params
+            ).fetchone()
+            if not samples:
+                continue
+            out.append({
+                "station": station, "samples": samples, "avg_ms": round_or_none(avg),
+                "p50_ms": round_or_none(self._quantile("pings", "avg_ms", where, params, ok, 50)),
+                "p95_ms": round_or_none(self._quantile("pings", "avg_ms", where, params, ok, 95)),
+                "jitter_ms": round_or_none(jitter), "loss_pct": round_or_none(loss),
+                "failed_pct": round(100 * (samples - ok) / samples, 2)
+            })
+        return sorted(out, key=lambda s: (s["avg_ms"] is None, s["avg_ms"]))
+
+    def throughput(self, since):
+        """Speedtest-Durchsatz und Bufferbloat pro Station, schnellste zuerst"""
+        out = []
+        for (station,) in self.conn.execute("SELECT name FROM stations ORDER BY name").fetchall():
+            where, params = "station = ? AND ts >= ? AND failed = 0", (station, since)
+            tests, failed = self.conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(failed), 0) FROM speedtests WHERE station = ? AND ts >= ?",
+                (station, since)
+            ).fetchone()
+            if not tests:
+                continue
+            ok, down, up, ping, bloat = self.conn.execute(
+                f"SELECT COUNT(*), AVG(download_mbps), AVG(upload_mbps), AVG(ping_ms), AVG(bufferbloat_ms) "
+                f"FROM speedtests WHERE {where}", params
+            ).fetchone()
+            out.append({
+                "station": station, "tests": tests, "failed": failed, "avg_download_mbps": round_or_none(down),
+                "p10_download_mbps": round_or_none(self._quantile("speedtests", "download_mbps", where, params, ok, 10)),
+                "avg_upload_mbps": round_or_none(up), "avg_ping_ms": round_or_none(ping),
+                "avg_bufferbloat_ms": round_or_none(bloat)
+            })
+        return sorted(out, key=lambda s: -(s["avg_download_mbps"] or 0))
+
+    def availability(self, since):
+        """Anteil der Ping-Probes mit mindestens einem erreichbaren Ziel, pro Station"""
+        out = []
+        rows = self.conn.execute(
+            "SELECT station, COUNT(up), SUM(up), MAX(CASE WHEN up = 0 THEN ts END) FROM probes "
+            "WHERE ts >= ? AND up IS NOT NULL GROUP BY station ORDER BY station", (since,)
+        ).fetchall()
+        seen = {s["station"]: s for s in self.stations()}
+        for station, probes, up, last_down in rows:
+            out.append({
+                "station": station, "probes": probes, "down": probes - up,
+                "availability_percent": round(100 * up / probes, 3), "last_down": last_down,
+                "online": seen.get(station, {}).get("online", False)
+            })
+        return sorted(out, key=lambda s: s["availability_percent"])
+
+    def channels(self, since, band=None):
+        """Kanal-Belegung: BSSIDs pro Scan je Kanal und Station, plus das Mittel über die Flotte"""
+        where, params = "ts >= ? AND channel IS NOT NULL", (since,)
+        if band:
+            where, params = where + " AND band = ?", params + (band,)
+        scans = dict(self.conn.execute(
+            "SELECT station, COUNT(DISTINCT ts) FROM channels WHERE ts >= ? GROUP BY station", (since,)
+        ).fetchall())
+        stations = {}
+        fleet = {}
+        for station, b, channel, bssids, signal in self.conn.execute(
+                f"SELECT station, band, channel, SUM(bssids), AVG(max_signal) FROM channels WHERE {where} "
+                f"GROUP BY station, band, channel", params):
+            per_scan = bssids / scans[station]
+            stations.setdefault(station, []).append({
+                "band": b, "channel": channel, "avg_bssids": round(per_scan, 2),
+                "avg_strongest_signal": round_or_none(signal)
+            })
+            entry = fleet.setdefault((b, channel), {"band": b, "channel": channel, "stations": 0, "avg_bssids": 0})
+            entry["stations"] += 1
+            entry["avg_bssids"] += per_scan
+        for entry in fleet.values():
+            entry["avg_bssids"] = round(entry["avg_bssids"] / len(scans), 2)
+        for rows in stations.values():
+            rows.sort(key=lambda r: -r["avg_bssids"])
+        return {"scans": scans, "stations": stations,
+                "fleet": sorted(fleet.values(), key=lambda r: -r["avg_bssids"])}
+
+    def close(self):
+        self._connections.close()
+
+
+def round_or_none(value, digits=2):
+    return round(value, digits) if value is not None else None
+
+
+def inflate(body, limit):
+    """gzip entpacken, höchstens `limit` Bytes (Schutz vor Kompressionsbomben)"""
+    decompressor = zlib.decompressobj(wbits=47)
+    data = decompressor.decompress(body, limit)
+    if decompressor.unconsumed_tail:
+        raise ValueError(f"Batch entpackt größer als {limit} Bytes")
+    return data
+
+
+class CollectorHandler(http.server.BaseHTTPRequestHandler):
+    store = None
+    token = None
+
+    def do_POST(self):
+        if self.path.split("?")[0] != INGEST_PATH:
+            return self.send_json({"error": "Nicht gefunden"}, 404)
+        if not self.authorized():
+            return self.send_json({"error": "Token fehlt oder falsch"}, 401)
+        length = int(self.headers.get("Content-Length") or 0)
+        if length > MAX_BODY_BYTES:
+            return self.send_json({"error": f"Batch größer als {MAX_BODY_BYTES} Bytes"}, 413)
+        body = self.rfile.read(length)
+        try:
+            if self.headers.get("Content-Encoding") == "gzip":
+                body = inflate(body, MAX_RECORDS_BYTES)
+            batch = json.loads(body)
+            station = str(batch["station"])
+            records = batch["records"]
+            if not station or not isinstance(records, list):
+                raise ValueError("station und records erwartet")
+            result = self.store.ingest(station, records, address=self.client_address[0])
+        except (ValueError, KeyError, TypeError, zlib.error) as e:
+            return self.send_json({"error": f"Ungültiger Batch: {e}"}, 400)
+        self.send_json(dict(result, ok=True))
+
+    def do_GET(self):
+        url = urllib.parse.urlsplit(self.path)
+        query = urllib.parse.parse_qs(url.query)
+
+        def arg(name, default=None):
+            return query.get(name, [default])[0]
+
+        if not self.authorized():
+            return self.send_json({"error": "Token fehlt oder falsch"}, 401)
+        try:
+            since = time.time() - float(arg("hours", 24)) * 3600
+        except ValueError:
+            return self.send_json({"error": "hours muss eine Zahl sein"}, 400)
+        routes = {
+            "/api/fleet/stations": lambda: {"stations": self.store.stations()},
+            "/api/fleet/latency": lambda: {"stations": self.store.latency(since, arg("target"))},
+            "/api/fleet/throughput": lambda: {"stations": self.store.throughput(since)},
+            "/api/fleet/availability": lambda: {"stations": self.store.availability(since)},
+            "/api/fleet/channels": lambda: self.store.channels(since, arg("band")),
+            "/api/health": lambda: {"status": "ok", "message": "Collector online"}
+        }
+        if url.path not in routes:
+            return self.send_json({"error": "Nicht gefunden"}, 404)
+        self.send_json(routes[url.path]())
+
+    def authorized(self):
+        if not self.token:
+            return True
+        given = self.headers.get("Authorization", "").removeprefix("Bearer ")
+        return hmac.compare_digest(given.encode(), self.token.encode())
+
+    def send_json(self, data, status=200):
+        body = json.dumps(data).encode()
+        gzipped = len(body) >= 1024 and "gzip" in self.headers.get("Accept-Encoding", "")
+        if gzipped:
+            body = gzip.compress(body, compresslevel=6)
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        if gzipped:
+            self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve_collector(store, host="0.0.0.0", port=5050, token=None):
+    """Ingest und Flotten-Endpoints in einem Hintergrund-Thread, gibt den Server zurück"""
+    handler = type("BoundCollectorHandler", (CollectorHandler,), {"store": store, "token": token})
+    server = http.server.ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="collector", daemon=True).start()
+    return server
+
+
+def pusher_from_config(config, logger=None):
+    """FleetPusher für diese Station, None wenn kein Collector konfiguriert ist"""
+    fleet = config.get("fleet", {})
+    if not fleet.get("enabled") or not fleet.get("collector_url"):
+        return None
+    return FleetPusher(
+        fleet["collector_url"],
+        fleet.get("station") or socket.gethostname(),
+        FleetSpool(fleet.get("spool_dir", "/home/azubi/wifi_fleet_spool"), fleet.get("max_spool_bytes",
+                                                                                     64 * 1024 * 1024)),
+        token=fleet.get("token"),
+        batch_size=fleet.get("batch_size", 500),
+        push_seconds=fleet.get("push_seconds", 30),
+        max_backoff_seconds=fleet.get("max_backoff_seconds", 600),
+        logger=logger
+    ).start()
+
+
+def collector_from_config(config):
+    collector = config.get("collector", {})
+    return FleetStore(collector.get("path", "/home/azubi/wifi_fleet.sqlite"),
+                      stale_seconds=collector.get("stale_seconds", 300))
+
+
+def main():
+    import argparse
+    from probe_config import load_config
+    config = load_config()
+    collector = config.get("collector", {})
+    parser = argparse.ArgumentParser(description="Collector für die Ergebnisse mehrerer Prober-Stationen")
+    parser.add_argument("--host", default=collector.get("host", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=collector.get("port", 5050))
+    args = parser.parse_args()
+    store = collector_from_config(config)
+    server = serve_collector(store, args.host, args.port, collector.get("token"))
+    print(f"Collector auf {args.host}:{args.port}, Datenbank {store.path}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
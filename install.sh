@@ -14,7 +14,7 @@ sudo apt-get install -y python3-pip python3-venv wireless-tools iw speedtest-cli
 echo ">>> Installiere Python Libraries..."
 # Hinweis: Auf neueren Pis (Bookworm) muss man oft --break-system-packages nutzen oder venv
 # Wir nutzen hier die globale Installation der Einfachheit halber
-sudo pip3 install flask flask-cors psutil --break-system-packages
+sudo pip3 install flask flask-cors psutil gunicorn --break-system-packages
 
 # 3. Ordnerstruktur erstellen
 echo ">>> Erstelle Ordner..."
@@ -27,12 +27,33 @@ cp wifi_prober_v2.py "$INSTALL_DIR/"
 cp dashboard_server.py "$INSTALL_DIR/"
 cp wifi_scanner.py "$INSTALL_DIR/"
 cp speedtest_runner.py "$INSTALL_DIR/"
+cp probe_config.py "$INSTALL_DIR/"
+cp result_store.py "$INSTALL_DIR/"
+cp sqlite_store.py "$INSTALL_DIR/"
+cp rollups.py "$INSTALL_DIR/"
+cp latency_engine.py "$INSTALL_DIR/"
+cp nl80211.py "$INSTALL_DIR/"
+cp live_stream.py "$INSTALL_DIR/"
+cp scheduler.py "$INSTALL_DIR/"
+cp interface_state.py "$INSTALL_DIR/"
+cp metrics.py "$INSTALL_DIR/"
+cp alerting.py "$INSTALL_DIR/"
+cp outages.py "$INSTALL_DIR/"
+cp control.py "$INSTALL_DIR/"
+cp live_history.py "$INSTALL_DIR/"
+cp live_state.py "$INSTALL_DIR/"
+cp export.py "$INSTALL_DIR/"
+cp fleet.py "$INSTALL_DIR/"
 cp templates/dashboard.html "$INSTALL_DIR/templates/"
 
 # Rechte setzen
 chmod +x "$INSTALL_DIR/"*.py
 chown -R azubi:azubi "$INSTALL_DIR"
 
+# Unprivilegierte ICMP-Sockets für die LatencyEngine erlauben (kein ping-Prozess mehr nötig)
+echo "net.ipv4.ping_group_range = 0 2147483647" | sudo tee /etc/sysctl.d/60-wifi-prober-ping.conf
+sudo sysctl -p /etc/sysctl.d/60-wifi-prober-ping.conf
+
 # 5. Systemd Services erstellen
 echo ">>> Richte Autostart ein..."
 
@@ -46,6 +67,8 @@ After=network.target
 User=azubi
 WorkingDirectory=$INSTALL_DIR
 ExecStart=/usr/bin/python3 $INSTALL_DIR/wifi_prober_v2.py
+# CAP_NET_RAW für SO_BINDTODEVICE auf wlan0, CAP_NET_ADMIN zum Auslösen von nl80211-Scans
+AmbientCapabilities=CAP_NET_RAW CAP_NET_ADMIN
 Restart=always
 RestartSec=10
 
@@ -53,16 +76,37 @@ RestartSec=10
 WantedBy=multi-user.target
 EOF
 
-# Dashboard Service
+# Dashboard Sampler: Live-Pings, System-Werte und Ausfälle, schreibt den Live-Zustand nach /dev/shm
+cat << EOF | sudo tee /etc/systemd/system/wifi-dashboard-sampler.service
+[Unit]
+Description=WiFi Dashboard Sampler
+After=network.target
+
+[Service]
+User=azubi
+WorkingDirectory=$INSTALL_DIR
+ExecStart=/usr/bin/python3 $INSTALL_DIR/dashboard_server.py --sampler
+AmbientCapabilities=CAP_NET_RAW
+Restart=always
+RestartSec=10
+
+[Install]
+WantedBy=multi-user.target
+EOF
+
+# Dashboard Service: gunicorn mit mehreren Workern, die nur den Live-Zustand des Samplers lesen.
+# gthread, weil jeder Live-Stream einen Thread belegt
 cat << EOF | sudo tee /etc/systemd/system/wifi-dashboard.service
 [Unit]
 Description=WiFi Dashboard Server
-After=network.target
+After=network.target wifi-dashboard-sampler.service
+Wants=wifi-dashboard-sampler.service
 
 [Service]
 User=azubi
 WorkingDirectory=$INSTALL_DIR
-ExecStart=/usr/bin/python3 $INSTALL_DIR/dashboard_server.py
+Environment=WIFI_DASHBOARD_ROLE=web
+ExecStart=/usr/bin/python3 -m gunicorn -w 2 -k gthread --threads 24 -b 0.0.0.0:5000 dashboard_server:app
 Restart=always
 RestartSec=10
 
@@ -74,8 +118,10 @@ EOF
 echo ">>> Starte Services..."
 sudo systemctl daemon-reload
 sudo systemctl enable wifi-prober.service
+sudo systemctl enable wifi-dashboard-sampler.service
 sudo systemctl enable wifi-dashboard.service
 sudo systemctl restart wifi-prober.service
+sudo systemctl restart wifi-dashboard-sampler.service
 sudo systemctl restart wifi-dashboard.service
 
 echo ">>> Installation abgeschlossen! Dashboard unter http://$(hostname -I | awk '{print $1}'):5000"
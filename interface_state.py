@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+import select
+import socket
+import struct
+import threading
+import time
+from datetime import datetime
+from latency_engine import interface_address
+from nl80211 import (Nl80211, NetlinkError, NETLINK_GENERIC, SOL_NETLINK, NETLINK_ADD_MEMBERSHIP,
+                     NL80211_CMD_CONNECT, NL80211_CMD_ROAM, NL80211_CMD_DISCONNECT)
+
+# rtnetlink (include/uapi/linux/rtnetlink.h)
+NETLINK_ROUTE = 0
+RTMGRP_LINK = 0x1
+RTMGRP_IPV4_IFADDR = 0x10
+RTM_NEWLINK = 16
+RTM_DELLINK = 17
+RTM_NEWADDR = 20
+RTM_DELADDR = 21
+IFF_UP = 0x1
+MLME_EVENTS = (NL80211_CMD_CONNECT, NL80211_CMD_ROAM, NL80211_CMD_DISCONNECT)
+
+
+def read_sysfs(interface, name):
+    try:
+        with open(f"/sys/class/net/{interface}/{name}", "r") as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def proc_wireless_signal(interface):
+    """Signal (dBm) aus /proc/net/wireless, falls nl80211 nicht verfügbar ist"""
+    try:
+        with open("/proc/net/wireless", "r") as f:
+            for line in f:
+                fields = line.split()
+                if fields and fields[0].rstrip(":") == interface:
+                    return int(float(fields[3].rstrip(".")))
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
+
+
+def status_label(snapshot):
+    """Verbindungsstatus im bisherigen get_wifi_status Format"""
+    if not snapshot.get("exists"):
+        return "Unbekannt"
+    if not snapshot.get("admin_up"):
+        return "Interface down"
+    if snapshot.get("ssid"):
+        return "Verbunden mit IP" if snapshot.get("ip") else "Verbunden ohne IP"
+    if snapshot.get("ssid_known", True):
+        return "Nicht verbunden"
+    # Ohne nl80211 entscheidet der Link
+    if snapshot.get("carrier") and snapshot.get("operstate") in ("up", "unknown"):
+        return "Verbunden (SSID unbekannt)"
+    return "Nicht verbunden"
+
+
+class InterfaceState:
+    """Schnappschuss des WLAN-Interfaces im Speicher (Link, IP, SSID, Signal, Bitrate)
+
+    Ein Hintergrund-Thread abonniert rtnetlink (Link- und IPv4-Adressänderungen)
+    und die nl80211 mlme-Events (Connect/Roam/Disconnect) und liest den Zustand
+    bei jedem Event neu. Signal und Bitrate ändern sich ohne Event, deshalb wird
+    zusätzlich alle `poll_seconds` aufgefrischt. Ohne Netlink bleibt nur dieses
+    Polling über /sys/class/net. Leser bekommen mit get() den letzten
+    Schnappschuss, ohne Prozess und ohne Syscall.
+    """
+
+    def __init__(self, interface="wlan0", poll_seconds=5):
+        self.interface = interface
+        self.poll_seconds = poll_seconds
+        self.snapshot = {"interface": interface, "exists": False, "updated_at": None, "source": None}
+        self.stopped = threading.Event()
+        self.thread = None
+        self.nl80211 = None
+        self.events = 0
+        self.refreshes = 0
+
+    def get(self):
+        # Der Schnappschuss wird als Ganzes ersetzt, nie verändert - kein Lock nötig
+        return self.snapshot
+
+    def start(self):
+        self.refresh()
+        self.thread = threading.Thread(target=self._run, name=f"iface-{self.interface}", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stopped.set()
+        if self.thread is not None:
+            self.thread.join(self.poll_seconds + 1)
+
+    def _wireless(self, ifindex):
+        """SSID/Frequenz/Signal/Bitrate über nl80211, None wenn nicht möglich"""
+        try:
+            if self.nl80211 is None:
+                self.nl80211 = Nl80211()
+            info = self.nl80211.get_interface(ifindex)
+            station = self.nl80211.get_station(ifindex) if info["ssid"] else None
+            info.update(station or {"bssid": None, "signal": None, "tx_bitrate_mbps": None, "rx_bitrate_mbps": None})
+            return info
+        except (OSError, NetlinkError):
+            if self.nl80211 is not None:
+                self.nl80211.close()
+                self.nl80211 = None
+            return None
+
+    def refresh(self, source="poll"):
+        """Zustand neu lesen und den Schnappschuss austauschen"""
+        interface = self.interface
+        ifindex = read_sysfs(interface, "ifindex")
+        snapshot = {
+            "interface": interface,
+            "exists": ifindex is not None,
+            "updated_at": datetime.now().isoformat(),
+            "source": source
+        }
+        if ifindex is not None:
+            flags = read_sysfs(interface, "flags")
+            snapshot.update({
+                "admin_up": bool(int(flags, 16) & IFF_UP) if flags else False,
+                "operstate": read_sysfs(interface, "operstate"),
+                "carrier": read_sysfs(interface, "carrier") == "1",
+                "mac": read_sysfs(interface, "address"),
+                "ip": interface_address(interface)
+            })
+            wireless = self._wireless(int(ifindex))
+            if wireless is None:
+                # Ohne nl80211: verbunden heißt Link oben, SSID unbekannt
+                wireless = {"ssid": None, "ssid_known": False, "frequency": None, "bssid": None,
+                            "signal": proc_wireless_signal(interface),
+                            "tx_bitrate_mbps": None, "rx_bitrate_mbps": None}
+            snapshot.update(wireless)
+        self.snapshot = snapshot
+        self.refreshes += 1
+        return snapshot
+
+    def _subscribe(self):
+        """rtnetlink- und nl80211-Event-Sockets, leere Liste wenn Netlink nicht verfügbar ist"""
+        sockets = []
+        try:
+            route = socket.socket(socket.AF_NETLINK, socket.SOCK_RAW, NETLINK_ROUTE)
+            route.bind((0, RTMGRP_LINK | RTMGRP_IPV4_IFADDR))
+            sockets.append(route)
+        except OSError:
+            return []
+        try:
+            client = Nl80211()
+            group = client.mcast_groups.get("mlme")
+            client.close()
+            if group is not None:
+                mlme = socket.socket(socket.AF_NETLINK, socket.SOCK_RAW, NETLINK_GENERIC)
+                mlme.bind((0, 0))
+                mlme.setsockopt(SOL_NETLINK, NETLINK_ADD_MEMBERSHIP, group)
+                sockets.append(mlme)
+        except (OSError, NetlinkError):
+            pass
+        return sockets
+
+    def _relevant(self, sock, data):
+        """Betrifft eine der Nachrichten unser Interface?"""
+        try:
+            ifindex = socket.if_nametoindex(self.interface)
+        except OSError:
+            # Interface weg (oder wieder da, unter neuem Index) - immer neu lesen
+            return True
+        offset = 0
+        while offset + 16 <= len(data):
+            length, msg_type = struct.unpack_from("IH", data, offset)
+            if length < 16:
+                break
+            body = data[offset + 16:offset + length]
+            offset += (length + 3) & ~3
+            if sock.proto == NETLINK_ROUTE:
+                if msg_type in (RTM_NEWLINK, RTM_DELLINK) and len(body) >= 8:
+                    if struct.unpack_from("i", body, 4)[0] == ifindex:
+                        return True
+                elif msg_type in (RTM_NEWADDR, RTM_DELADDR) and len(body) >= 8:
+                    if struct.unpack_from("I", body, 4)[0] == ifindex:
+                        return True
+            elif body and body[0] in MLME_EVENTS:
+                return True
+        return False
+
+    def _run(self):
+        sockets = self._subscribe()
+        try:
+            next_poll = time.monotonic() + self.poll_seconds
+            while not self.stopped.is_set():
+                remaining = max(next_poll - time.monotonic(), 0)
+                if not sockets:
+                    self.stopped.wait(remaining)
+                    ready = []
+                else:
+                    ready, _, _ = select.select(sockets, [], [], min(remaining, 1.0))
+                changed = False
+                for sock in ready:
+                    try:
+                        data = sock.recv(65536)
+                    except OSError:
+                        continue
+                    self.events += 1
+                    changed = changed or self._relevant(sock, data)
+                if changed or time.monotonic() >= next_poll:
+                    try:
+                        self.refresh("netlink" if changed else "poll")
+                    except Exception:
+                        # Alter Schnappschuss bleibt stehen, nächster Versuch beim nächsten Event/Poll
+                        pass
+                    next_poll = time.monotonic() + self.poll_seconds
+        finally:
+            for sock in sockets:
+                sock.close()
+            if self.nl80211 is not None:
+                self.nl80211.close()
+                self.nl80211 = None
+
+    def stats(self):
+        return {"interface": self.interface, "events": self.events, "refreshes": self.refreshes,
+                "running": self.thread is not None and self.thread.is_alive()}
+
+
+def state_from_config(config):
+    """Startet den InterfaceState für das konfigurierte WLAN-Interface"""
+    wifi = config.get("wifi", {})
+    return InterfaceState(
+        interface=wifi.get("interface", "wlan0"),
+        poll_seconds=wifi.get("state_poll_seconds", 5)
+    ).start()
+
+
+if __name__ == "__main__":
+    import json
+    import sys
+    state = InterfaceState(sys.argv[1] if len(sys.argv) > 1 else "wlan0").start()
+    try:
+        while True:
+            print(json.dumps(state.get()))
+            time.sleep(state.poll_seconds)
+    except KeyboardInterrupt:
+        state.stop()
@@ -0,0 +1,411 @@
+#!/usr/bin/env python3
+import asyncio
+import itertools
+import math
+import os
+import socket
+import struct
+import threading
+import time
+
+ICMP_ECHO_REQUEST = 8
+ICMP_ECHO_REPLY = 0
+SO_BINDTODEVICE = getattr(socket, "SO_BINDTODEVICE", 25)
+SIOCGIFADDR = 0x8915
+
+
+def percentile(values, pct):
+    """Perzentil (nearest-rank) einer Liste"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def icmp_checksum(data):
+    """Internet-Prüfsumme (RFC 1071)"""
+    if len(data) % 2:
+        data += b"\x00"
+    total = sum(struct.unpack(f"!{len(data) // 2}H", data))
+    total = (total >> 16) + (total & 0xFFFF)
+    total += total >> 16
+    return ~total & 0xFFFF
+
+
+def build_echo_request(ident, seq, payload_size=56):
+    payload = struct.pack("!d", time.time()).ljust(payload_size, b"\x00")
+    header = struct.pack("!BBHHH", ICMP_ECHO_REQUEST, 0, 0, ident, seq)
+    checksum = icmp_checksum(header + payload)
+    return struct.pack("!BBHHH", ICMP_ECHO_REQUEST, 0, checksum, ident, seq) + payload
+
+
+def summarize_samples(rtts):
+    """Statistik über eine Messreihe (None = verloren)
+
+    Jitter nach RFC 3550 (J += (|D| - J) / 16) über die Differenzen
+    aufeinanderfolgender RTTs in Sendereihenfolge.
+    """
+    received = [r for r in rtts if r is not None]
+    sent = len(rtts)
+    loss_pct = round((sent - len(received)) / sent * 100, 1) if sent else 100.0
+    if not received:
+        return {"avg_ms": 0, "success": False, "sent": sent, "received": 0, "loss_pct": loss_pct}
+
+    avg = sum(received) / len(received)
+    stddev = (sum((r - avg) ** 2 for r in received) / len(received)) ** 0.5
+    jitter = 0.0
+    for prev, cur in zip(received, received[1:]):
+        jitter += (abs(cur - prev) - jitter) / 16
+
+    return {
+        "avg_ms": round(avg, 3),
+        "success": True,
+        "sent": sent,
+        "received": len(received),
+        "loss_pct": loss_pct,
+        "min_ms": round(min(received), 3),
+        "max_ms": round(max(received), 3),
+        "stddev_ms": round(stddev, 3),
+        "p50_ms": round(percentile(received, 50), 3),
+        "p95_ms": round(percentile(received, 95), 3),
+        "p99_ms": round(percentile(received, 99), 3),
+        "jitter_ms": round(jitter, 3)
+    }
+
+
+class LatencyEngine:
+    """Asynchrone Latenzmessung ohne ping-Prozesse
+
+    Bevorzugt unprivilegierte ICMP-Datagram-Sockets (net.ipv4.ping_group_range),
+    als root alternativ Raw-Sockets, sonst TCP-Connect auf `tcp_port`. Alle
+    Sockets werden per SO_BINDTODEVICE an das konfigurierte Interface gebunden,
+    sofern das erlaubt ist. Mehrere Ziele werden parallel gemessen. Jeder
+    Aufruf der synchronen Wrapper bekommt einen Event-Loop für sich, die
+    Engine darf also aus mehreren Jobs gleichzeitig benutzt werden.
+    """
+
+    def __init__(self, interface=None, timeout=2.0, tcp_port=443, methods=("icmp", "tcp")):
+        self.interface = interface
+        self.timeout = timeout
+        self.tcp_port = tcp_port
+        self.methods = tuple(methods)
+        self._icmp_mode = None  # "dgram", "raw" oder False wenn ICMP nicht möglich
+        self._seq = itertools.count(1)
+        self._ident = os.getpid() & 0xFFFF
+        self._loops = []  # freie Event-Loops, je gleichzeitigem Aufrufer höchstens einer
+        self._loops_lock = threading.Lock()
+        # Optionaler Hook observer(ziel, rtts_ms) pro Burst, z.B. für Metrik-Histogramme
+        self.observer = None
+
+    # --- Sockets ---
+
+    def _bind_device(self, sock):
+        if not self.interface:
+            return
+        try:
+            sock.setsockopt(socket.SOL_SOCKET, SO_BINDTODEVICE, self.interface.encode())
+        except OSError:
+            # Ohne CAP_NET_RAW nicht erlaubt - dann über die Routing-Tabelle wie bisher `ping` ohne -I
+            pass
+
+    def _icmp_socket(self):
+        modes = [self._icmp_mode] if self._icmp_mode else ["dgram", "raw"]
+        for mode in modes:
+            sock_type = socket.SOCK_DGRAM if mode == "dgram" else socket.SOCK_RAW
+            try:
+                sock = socket.socket(socket.AF_INET, sock_type, socket.IPPROTO_ICMP)
+            except (PermissionError, OSError):
+                continue
+            self._icmp_mode = mode
+            sock.setblocking(False)
+            self._bind_device(sock)
+            return sock, mode
+        self._icmp_mode = False
+        return None, None
+
+    async def _resolve(self, target):
+        loop = asyncio.get_running_loop()
+        infos = await loop.getaddrinfo(target, None, family=socket.AF_INET, type=socket.SOCK_DGRAM)
+        return infos[0][4][0]
+
+    # --- Messmethoden ---
+
+    async def _icmp_probe(self, address):
+        sock, mode = self._icmp_socket()
+        if sock is None:
+            return None
+        loop = asyncio.get_running_loop()
+        seq = next(self._seq) & 0xFFFF
+        try:
+            sock.connect((address, 0))
+            packet = build_echo_request(self._ident, seq)
+            sent_at = time.time()
+            start = time.perf_counter_ns()
+            await loop.sock_sendall(sock, packet)
+            while True:
+                data = await loop.sock_recv(sock, 2048)
+                end = time.perf_counter_ns()
+                if mode == "raw":
+                    data = data[(data[0] & 0x0F) * 4:]
+                if len(data) < 8:
+                    continue
+                icmp_type, _, _, ident, reply_seq = struct.unpack("!BBHHH", data[:8])
+                # Beim Datagram-Socket setzt der Kernel die ID selbst und filtert danach
+                if icmp_type != ICMP_ECHO_REPLY or reply_seq != seq:
+                    continue
+                if mode == "raw" and ident != self._ident:
+                    continue
+                return {"rtt_ms": (end - start) / 1e6, "sent_at": sent_at, "method": f"icmp-{mode}"}
+        finally:
+            sock.close()
+
+    async def _tcp_probe(self, address, port, refused_ok=True):
+        loop = asyncio.get_running_loop()
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setblocking(False)
+        self._bind_device(sock)
+        try:
+            sent_at = time.time()
+            start = time.perf_counter_ns()
+            try:
+                await loop.sock_connect(sock, (address, port))
+            except ConnectionRefusedError:
+                # RST ist auch eine Antwort - der Host ist erreichbar, ein ausdrücklich genannter Dienst aber nicht
+                if not refused_ok:
+                    return {"error": "refused"}
+            end = time.perf_counter_ns()
+            return {"rtt_ms": (end - start) / 1e6, "sent_at": sent_at, "method": "tcp"}
+        finally:
+            sock.close()
+
+    async def probe(self, target):
+        """Einzelne Messung zu `target`, Ergebnis im bisherigen avg_ms/success Format
+
+        `target` ist ein Host, "host:port" oder {"host": ..., "port": ...}. Mit
+        Port wird nur per TCP-Connect gemessen (interne Dienste), ein RST
+        heißt dann "Dienst down" (error "refused").
+        """
+        host, port = split_target(target)
+        try:
+            address = await asyncio.wait_for(self._resolve(host), self.timeout)
+        except Exception:
+            return {"avg_ms": 0, "success": False, "error": "resolve"}
+
+        methods = ("tcp",) if port else self.methods
+        for method in methods:
+            if method == "icmp" and self._icmp_mode is False:
+                continue
+            if method == "icmp":
+                probe = self._icmp_probe(address)
+            else:
+                probe = self._tcp_probe(address, port or self.tcp_port, refused_ok=port is None)
+            try:
+                result = await asyncio.wait_for(probe, self.timeout)
+            except (asyncio.TimeoutError, OSError):
+                # ICMP-Timeout heißt wirklich keine Antwort, TCP nur als Ersatz für fehlendes ICMP
+                if method == "icmp" and self._icmp_mode:
+                    break
+                continue
+            if result is None:
+                continue
+            if "error" in result:
+                return {"avg_ms": 0, "success": False, "error": result["error"]}
+            return {
+                "avg_ms": round(result["rtt_ms"], 3),
+                "success": True,
+                "method": result["method"],
+                "sent_at": result["sent_at"]
+            }
+        return {"avg_ms": 0, "success": False}
+
+    async def _gather_budget(self, coros, budget):
+        """Führt {name: coroutine} parallel aus, nach `budget` Sekunden zählt der Rest als Fehler"""
+        tasks = {name: asyncio.ensure_future(coro) for name, coro in coros.items()}
+        if tasks:
+            await asyncio.wait(tasks.values(), timeout=budget)
+        results = {}
+        for name, task in tasks.items():
+            if task.done() and not task.cancelled() and task.exception() is None:
+                results[name] = task.result()
+            else:
+                task.cancel()
+                results[name] = {"avg_ms": 0, "success": False, "error": "budget"}
+        return results
+
+    async def probe_many(self, targets, budget=None):
+        """Misst alle Ziele ({name: host}) gleichzeitig, optional mit Zeitbudget"""
+        return await self._gather_budget({n: self.probe(t) for n, t in targets.items()}, budget)
+
+    async def probe_burst(self, target, count=10, interval=0.1, name=None):
+        """Sendet `count` Messungen im festen Abstand `interval` und fasst sie zusammen
+
+        Jede Messung startet zu ihrem festen Sendezeitpunkt, eine langsame
+        Antwort verschiebt die folgenden Pakete also nicht.
+        """
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+
+        async def scheduled(i):
+            await asyncio.sleep(max(0, start + i * interval - loop.time()))
+            return await self.probe(target)
+
+        results = await asyncio.gather(*(scheduled(i) for i in range(count)))
+        rtts = [r["avg_ms"] if r.get("success") else None for r in results]
+        if self.observer is not None:
+            self.observer(name or target, rtts)
+        summary = summarize_samples(rtts)
+        methods = {r["method"] for r in results if r.get("method")}
+        if methods:
+            summary["method"] = "/".join(sorted(methods))
+        return summary
+
+    async def probe_many_burst(self, targets, count=10, interval=0.1, budget=None):
+        """Burst-Messung für alle Ziele gleichzeitig, optional mit Zeitbudget"""
+        return await self._gather_budget(
+            {n: self.probe_burst(t, count, interval, name=n) for n, t in targets.items()}, budget
+        )
+
+    # --- Synchrone Wrapper für Threads ohne eigenen Event-Loop ---
+
+    def run(self, coro):
+        """Führt `coro` auf einem freien Loop aus - run_until_complete ist nicht thread-sicher
+
+        Der Scheduler startet pro Lauf einen neuen Thread, deshalb gehören
+        die Loops nicht zum Thread, sondern werden nach dem Lauf
+        zurückgelegt und wiederverwendet.
+        """
+        with self._loops_lock:
+            loop = self._loops.pop() if self._loops else None
+        if loop is None:
+            loop = asyncio.new_event_loop()
+        try:
+            return loop.run_until_complete(coro)
+        finally:
+            with self._loops_lock:
+                self._loops.append(loop)
+
+    def ping(self, target):
+        return self.run(self.probe(target))
+
+    def ping_many(self, targets, budget=None):
+        return self.run(self.probe_many(targets, budget))
+
+    def ping_burst(self, target, count=10, interval=0.1):
+        return self.run(self.probe_burst(target, count, interval))
+
+    def ping_many_burst(self, targets, count=10, interval=0.1, budget=None):
+        return self.run(self.probe_many_burst(targets, count, interval, budget))
+
+    def close(self):
+        """Schließt die freien Loops, ein gerade laufender kommt danach neu in den Vorrat"""
+        with self._loops_lock:
+            loops, self._loops = self._loops, []
+        for loop in loops:
+            loop.close()
+
+
+def split_target(target):
+    """Zerlegt ein Ziel in (host, port) - port ist None für ICMP-Ziele"""
+    if isinstance(target, dict):
+        return target["host"], target.get("port")
+    if target.count(":") == 1:
+        host, port = target.split(":")
+        return host, int(port)
+    return target, None
+
+
+def default_gateway(interface=None):
+    """Default-Gateway aus /proc/net/route (optional nur für ein Interface)"""
+    try:
+        with open("/proc/net/route", "r") as f:
+            next(f)
+            for line in f:
+                fields = line.split()
+                if fields[1] != "00000000" or not int(fields[3], 16) & 0x2:
+                    continue
+                if interface and fields[0] != interface:
+                    continue
+                return socket.inet_ntoa(struct.pack("<L", int(fields[2], 16)))
+    except (OSError, StopIteration, ValueError, IndexError):
+        pass
+    return None
+
+
+def interface_address(interface):
+    """IPv4-Adresse eines Interfaces per ioctl (SIOCGIFADDR), None wenn keine"""
+    import fcntl
+    try:
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+            packed = fcntl.ioctl(sock.fileno(), SIOCGIFADDR, struct.pack("256s", interface.encode()[:15]))
+        return socket.inet_ntoa(packed[20:24])
+    except OSError:
+        return None
+
+
+def system_nameserver():
+    """Erster Nameserver aus /etc/resolv.conf"""
+    try:
+        with open("/etc/resolv.conf", "r") as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) >= 2 and parts[0] == "nameserver":
+                    return parts[1]
+    except OSError:
+        pass
+    return None
+
+
+def targets_from_config(config):
+    """Liest die Ziele aus dem `targets`-Abschnitt
+
+    Werte sind Hosts, "host:port", {"host": ..., "port": ...} oder die
+    Platzhalter "gateway" / "dns", die beim Aufruf aufgelöst werden.
+    Nicht auflösbare Platzhalter werden übersprungen.
+    """
+    interface = config.get("wifi", {}).get("interface", "wlan0")
+    targets = {}
+    for name, target in config.get("targets", {}).items():
+        if target == "gateway":
+            target = default_gateway(interface) or default_gateway()
+        elif target == "dns":
+            target = system_nameserver()
+        if target:
+            targets[name] = target
+    return targets
+
+
+def engine_from_config(config):
+    """Erzeugt die LatencyEngine aus wifi_config.json"""
+    ping = config.get("ping", {})
+    return LatencyEngine(
+        interface=config.get("wifi", {}).get("interface", "wlan0"),
+        timeout=ping.get("timeout_seconds", 2),
+        tcp_port=ping.get("tcp_port", 443),
+        methods=ping.get("methods", ["icmp", "tcp"])
+    )
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description="Latenz zu einem oder mehreren Zielen messen")
+    parser.add_argument("targets", nargs="*", default=["127.0.0.1"], metavar="ZIEL",
+                        help="Host oder IP, optional mit :port für TCP (Standard: 127.0.0.1)")
+    parser.add_argument("--interface", default=None, help="An dieses Interface binden (Standard: keins)")
+    parser.add_argument("--timeout", type=float, default=2.0, help="Timeout pro Probe in Sekunden")
+    parser.add_argument("--count", type=int, default=1, help="Proben pro Ziel (Burst)")
+    parser.add_argument("--interval", type=float, default=0.1, help="Abstand der Proben im Burst")
+    args = parser.parse_args()
+
+    engine = LatencyEngine(interface=args.interface, timeout=args.timeout)
+    targets = {t: t for t in args.targets}
+    if args.count > 1:
+        results = engine.ping_many_burst(targets, count=args.count, interval=args.interval)
+    else:
+        results = engine.ping_many(targets)
+    for name, result in results.items():
+        print(f"{name:<20} {result}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+import math
+import mmap
+import os
+import struct
+import threading
+import time
+from array import array
+from pathlib import Path
+
+MAGIC = b"WPLH"
+VERSION = 1
+NAME_BYTES = 32
+# magic, version, slots, spalten
+HEADER = struct.Struct("<4sIII")
+AGGREGATES = {
+    "avg": lambda values: sum(values) / len(values),
+    "min": min,
+    "max": max
+}
+
+
+class LiveHistory:
+    """Ringpuffer der 1 Hz Live-Samples (24 h), direkt in einer mmap-Datei
+
+    Layout: Header, Spaltennamen, dann ein uint32-Array mit dem Zeitstempel
+    jedes Slots und pro Spalte ein float32-Array. Der Slot eines Samples ist
+    `sekunde % slots`, ein Slot gilt nur, wenn sein Zeitstempel passt - so
+    braucht es keinen Kopfzeiger und alte Werte verfallen von selbst. Fehlende
+    Werte (Ping ohne Antwort) sind NaN. Geschrieben wird direkt in die
+    Arrays, pro Sample entstehen keine Python-Objekte; der Kernel schreibt die
+    Seiten zurück, flush() erzwingt es. Ändern sich die Spalten (andere
+    Ping-Ziele), wird die Datei neu angelegt - als neue Datei per rename,
+    damit Web-Worker (create=False, nur lesend) mit der alten Abbildung
+    keinen SIGBUS bekommen; sie öffnen neu, sobald stale() es meldet.
+    """
+
+    def __init__(self, path, columns, slots=86400, flush_seconds=60, create=True):
+        self.path = Path(path)
+        self.columns = list(columns)
+        self.index = {name: i for i, name in enumerate(self.columns)}
+        self.slots = slots
+        self.flush_seconds = flush_seconds
+        self.last_flush = time.monotonic()
+        self.writable = create
+        self.lock = threading.Lock()
+        names_size = NAME_BYTES * len(self.columns)
+        self.data_offset = (HEADER.size + names_size + 7) // 8 * 8
+        size = self.data_offset + 4 * slots * (1 + len(self.columns))
+        try:
+            fd = os.open(self.path, os.O_RDWR if create else os.O_RDONLY)
+        except FileNotFoundError:
+            fd = None
+        if fd is not None and not self._matches(fd, size):
+            os.close(fd)
+            fd = None
+        if fd is None and not create:
+            raise FileNotFoundError(f"Keine passende Live-Historie unter {self.path}")
+        fresh = fd is None
+        if fresh:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_name(self.path.name + ".tmp")
+            fd = os.open(tmp, os.O_RDWR | os.O_CREAT | os.O_TRUNC, 0o644)
+            os.ftruncate(fd, size)
+        try:
+            self.inode = os.fstat(fd).st_ino
+            self.mm = mmap.mmap(fd, size, prot=mmap.PROT_READ | (mmap.PROT_WRITE if create else 0))
+        finally:
+            os.close(fd)
+        if fresh:
+            HEADER.pack_into(self.mm, 0, MAGIC, VERSION, slots, len(self.columns))
+            for i, name in enumerate(self.columns):
+                struct.pack_into(f"{NAME_BYTES}s", self.mm, HEADER.size + i * NAME_BYTES, name.encode()[:NAME_BYTES])
+        view = memoryview(self.mm)
+        stride = 4 * slots
+        self.timestamps = view[self.data_offset:self.data_offset + stride].cast("I")
+        self.values = [
+            view[self.data_offset + stride * (i + 1):self.data_offset + stride * (i + 2)].cast("f")
+            for i in range(len(self.columns))
+        ]
+        if fresh:
+            empty = array("f", [math.nan]) * slots
+            for values in self.values:
+                values[:] = empty
+            # Erst vollständig initialisiert sichtbar machen
+            os.replace(tmp, self.path)
+
+    def _matches(self, fd, size):
+        """Vorhandene Datei mit gleichem Layout (Slots und Spalten)?"""
+        if os.fstat(fd).st_size != size:
+            return False
+        header = os.pread(fd, self.data_offset, 0)
+        magic, version, slots, count = HEADER.unpack_from(header)
+        if (magic, version, slots, count) != (MAGIC, VERSION, self.slots, len(self.columns)):
+            return False
+        names = [header[HEADER.size + i * NAME_BYTES:HEADER.size + (i + 1) * NAME_BYTES].rstrip(b"\0").decode()
+                 for i in range(count)]
+        return names == [n[:NAME_BYTES] for n in self.columns]
+
+    def stale(self):
+        """Hat der Schreiber die Datei inzwischen neu angelegt?"""
+        try:
+            return os.stat(self.path).st_ino != self.inode
+        except FileNotFoundError:
+            return True
+
+    def record(self, ts, samples):
+        """Ein Sample pro Spalte ({spalte: wert}, None = fehlt) für die Sekunde `ts`"""
+        second = int(ts)
+        slot = second % self.slots
+        with self.lock:
+            # Zeitstempel zuletzt: ein Leser sieht den Slot erst, wenn die Werte stehen
+            self.timestamps[slot] = 0
+            for name, i in self.index.items():
+                value = samples.get(name)
+                self.values[i][slot] = math.nan if value is None else value
+            self.timestamps[slot] = second
+        if time.monotonic() - self.last_flush >= self.flush_seconds:
+            self.flush()
+
+    def flush(self):
+        self.last_flush = time.monotonic()
+        self.mm.flush()
+
+    def close(self):
+        if self.writable:
+            self.flush()
+        self.timestamps.release()
+        for values in self.values:
+            values.release()
+        self.mm.close()
+
+    def _read(self, first, last, columns):
+        """Zeitstempel und Werte der Sekunden first..last, Slot-Überlauf in zwei Stücken"""
+        a, b = first % self.slots, last % self.slots
+        pieces = [(a, b + 1)] if a <= b else [(a, self.slots), (0, b + 1)]
+        stamps = []
+        series = {name: [] for name in columns}
+        for start, end in pieces:
+            stamps += self.timestamps[start:end].tolist()
+            for name in columns:
+                series[name] += self.values[self.index[name]][start:end].tolist()
+        return stamps, series
+
+    def history(self, seconds, step=1, columns=None, aggregate="avg", now=None):
+        """Die letzten `seconds` Sekunden, optional auf `step`-Sekunden-Buckets verdichtet
+
+        {"start": epoch, "step": s, "timestamps": [...], "series": {spalte: [...]}}, fehlende
+        Werte als None. Ein Bucket ohne gültige Werte ist None.
+        """
+        columns = [c for c in (columns or self.columns) if c in self.index]
+        seconds = max(1, min(int(seconds), self.slots))
+        step = max(1, int(step))
+        last = int(now or time.time())
+        first = last - seconds + 1
+        stamps, raw = self._read(first, last, columns)
+        valid = [stamps[i] == first + i for i in range(len(stamps))]
+        reduce = AGGREGATES[aggregate]
+        series = {}
+        for name, values in raw.items():
+            out = []
+            for offset in range(0, len(values), step):
+                bucket = [v for v, ok in zip(values[offset:offset + step], valid[offset:offset + step])
+                          if ok and v == v]
+                out.append(round(reduce(bucket), 3) if bucket else None)
+            series[name] = out
+        return {
+            "start": first,
+            "step": step,
+            "aggregate": aggregate,
+            "timestamps": list(range(first, last + 1, step)),
+            "series": series,
+            "samples": sum(valid)
+        }
+
+
+def live_columns(targets):
+    """Spalten der Live-Historie: System-Werte plus ein Ping-RTT pro Ziel"""
+    return ["cpu", "ram", "disk", "temp"] + [f"ping.{name}" for name in targets]
+
+
+def history_from_config(config, targets, create=True):
+    storage = config.get("storage", {})
+    dashboard = config.get("dashboard", {})
+    return LiveHistory(
+        storage.get("live_history_path", "/home/azubi/wifi_live_history.bin"),
+        live_columns(targets),
+        slots=dashboard.get("live_history_seconds", 86400),
+        flush_seconds=dashboard.get("live_history_flush_seconds", 60),
+        create=create
+    )
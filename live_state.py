@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+from pathlib import Path
+
+MAGIC = b"WPLS"
+# magic, sequenz, länge der Nutzdaten
+HEADER = struct.Struct("<4sQI")
+SEQ = struct.Struct("<Q")
+SEQ_OFFSET = 4
+READ_RETRIES = 100
+# So lange ohne neue Sequenz, dann prüfen Leser, ob der Sampler das Segment neu angelegt hat
+STALE_SECONDS = 5
+
+
+class SharedState:
+    """Live-Zustand des Samplers für alle Web-Worker, als JSON in einem mmap-Segment
+
+    Genau ein Schreiber (der Sampler-Prozess), beliebig viele Leser ohne
+    Lock. Geschützt durch ein Seqlock: der Schreiber setzt die Sequenz auf
+    ungerade, schreibt Länge und Nutzdaten und setzt sie dann auf die nächste
+    gerade Zahl. Ein Leser kopiert die Daten und prüft danach, ob die Sequenz
+    gerade und unverändert ist, sonst liest er erneut. Geparst wird nur bei
+    neuer Sequenz, sonst liefert read() den zwischengespeicherten Stand.
+    Standardpfad liegt in /dev/shm, also nur im RAM.
+    """
+
+    def __init__(self, path, size=256 * 1024, writer=False):
+        self.path = Path(path)
+        self.size = size
+        self.writer = writer
+        self.mm = None
+        self.inode = None
+        self.checked = time.monotonic()
+        self.seq = 0
+        self.cached_seq = None
+        self.cached = None
+        self.lock = threading.Lock()
+        self.retries = 0
+        if writer:
+            self._open_writer()
+
+    def _open_writer(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        if self.path.exists() and self.path.stat().st_size != self.size:
+            # Nicht kürzen: Leser mit der alten Abbildung bekämen SIGBUS, so behalten sie die alte Datei
+            self.path.unlink()
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if os.fstat(fd).st_size != self.size:
+                os.ftruncate(fd, self.size)
+            self.mm = mmap.mmap(fd, self.size)
+        finally:
+            os.close(fd)
+        magic, seq, _ = HEADER.unpack_from(self.mm, 0)
+        # Nach einem Neustart weiterzählen, damit Leser den neuen Stand sicher erkennen
+        self.seq = (seq + 1) // 2 * 2 if magic == MAGIC else 0
+        HEADER.pack_into(self.mm, 0, MAGIC, self.seq, 0)
+
+    def _open_reader(self):
+        """Leser warten, bis der Sampler das Segment angelegt hat"""
+        try:
+            fd = os.open(self.path, os.O_RDONLY)
+        except FileNotFoundError:
+            return False
+        try:
+            stat = os.fstat(fd)
+            if stat.st_size < HEADER.size:
+                return False
+            self.mm = mmap.mmap(fd, stat.st_size, prot=mmap.PROT_READ)
+            self.inode = stat.st_ino
+        finally:
+            os.close(fd)
+        return True
+
+    def publish(self, data):
+        """Neuen Zustand veröffentlichen (nur im Schreiber-Prozess)"""
+        payload = json.dumps(data, separators=(",", ":")).encode()
+        if HEADER.size + len(payload) > self.size:
+            raise ValueError(f"Live-Zustand zu groß ({len(payload)} Bytes, Segment {self.size})")
+        SEQ.pack_into(self.mm, SEQ_OFFSET, self.seq + 1)
+        self.mm[HEADER.size:HEADER.size + len(payload)] = payload
+        struct.pack_into("<I", self.mm, SEQ_OFFSET + SEQ.size, len(payload))
+        self.seq += 2
+        SEQ.pack_into(self.mm, SEQ_OFFSET, self.seq)
+
+    def _reopen_if_replaced(self):
+        if self.writer or self.mm is None or self.cached_seq is None:
+            return
+        if self.cached_seq != SEQ.unpack_from(self.mm, SEQ_OFFSET)[0]:
+            self.checked = time.monotonic()
+        elif time.monotonic() - self.checked >= STALE_SECONDS:
+            self.checked = time.monotonic()
+            try:
+                replaced = os.stat(self.path).st_ino != self.inode
+            except FileNotFoundError:
+                replaced = False
+            if replaced:
+                # Nicht schließen, andere Threads lesen evtl. noch; die alte Abbildung räumt der GC ab
+                self.mm = None
+                self.cached_seq = None
+
+    def _mapping(self):
+        self._reopen_if_replaced()
+        if self.mm is None:
+            self._open_reader()
+        return self.mm
+
+    def sequence(self):
+        """Aktuelle Sequenz, billig genug zum Pollen; None, solange es kein Segment gibt"""
+        mm = self._mapping()
+        return None if mm is None else SEQ.unpack_from(mm, SEQ_OFFSET)[0]
+
+    def read(self):
+        """(sequenz, zustand) - der zuletzt vollständig geschriebene Stand, None ohne Sampler"""
+        mm = self._mapping()
+        if mm is None:
+            return None, None
+        for _ in range(READ_RETRIES):
+            magic, seq, length = HEADER.unpack_from(mm, 0)
+            if magic != MAGIC or seq == 0:
+                return None, None
+            if seq == self.cached_seq:
+                return seq, self.cached
+            if seq % 2 == 0 and HEADER.size + length <= len(mm):
+                payload = mm[HEADER.size:HEADER.size + length]
+                if SEQ.unpack_from(mm, SEQ_OFFSET)[0] == seq:
+                    data = json.loads(payload)
+                    with self.lock:
+                        self.cached_seq, self.cached = seq, data
+                    return seq, data
+            # Schreiber ist gerade dabei, kurz abgeben
+            self.retries += 1
+            time.sleep(0)
+        return self.cached_seq, self.cached
+
+    def stats(self):
+        return {"path": str(self.path), "writer": self.writer, "sequence": self.sequence(),
+                "size_bytes": self.size, "read_retries": self.retries}
+
+    def close(self):
+        if self.mm is not None:
+            self.mm.close()
+            self.mm = None
+
+
+def shared_state_from_config(config, writer=False):
+    dashboard = config.get("dashboard", {})
+    return SharedState(
+        dashboard.get("shared_state_path", "/dev/shm/wifi_dashboard_live"),
+        size=dashboard.get("shared_state_bytes", 256 * 1024),
+        writer=writer
+    )
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+import json
+import queue
+import threading
+import time
+
+
+class LiveClient:
+    """Ein verbundener Stream-Client mit eigener, begrenzter Queue"""
+
+    def __init__(self, maxsize):
+        self.queue = queue.Queue(maxsize=maxsize)
+        self.dropped = threading.Event()
+        self.connected_at = time.time()
+
+
+class LiveBroadcaster:
+    """Verteilt Live-Samples an alle Server-Sent-Events Clients
+
+    Jedes Sample wird einmal serialisiert und in die Queue jedes Clients
+    gelegt. Läuft die Queue eines Clients voll (Tab im Hintergrund, langsame
+    Verbindung), wird der Client getrennt statt den Worker zu blockieren;
+    EventSource verbindet sich im Browser von selbst neu.
+    """
+
+    def __init__(self, queue_size=10, max_clients=20, keepalive_seconds=15, retry_ms=3000):
+        self.queue_size = queue_size
+        self.max_clients = max_clients
+        self.keepalive_seconds = keepalive_seconds
+        self.retry_ms = retry_ms
+        self.lock = threading.Lock()
+        self.clients = set()
+        self.last_event = None
+        self.seq = 0
+        self.published = 0
+        self.dropped = 0
+        self.rejected = 0
+
+    def subscribe(self):
+        """Neuen Client anmelden, None wenn das Limit erreicht ist"""
+        with self.lock:
+            if len(self.clients) >= self.max_clients:
+                self.rejected += 1
+                return None
+            client = LiveClient(self.queue_size)
+            self.clients.add(client)
+            # Neue Clients bekommen sofort den letzten Stand statt bis zum nächsten Sample zu warten
+            if self.last_event is not None:
+                client.queue.put_nowait(self.last_event)
+            return client
+
+    def unsubscribe(self, client):
+        with self.lock:
+            self.clients.discard(client)
+
+    def publish(self, event, data):
+        payload = json.dumps(data)
+        with self.lock:
+            self.seq += 1
+            message = f"id: {self.seq}\nevent: {event}\ndata: {payload}\n\n"
+            self.last_event = message
+            self.published += 1
+            for client in list(self.clients):
+                try:
+                    client.queue.put_nowait(message)
+                except queue.Full:
+                    client.dropped.set()
+                    self.clients.discard(client)
+                    self.dropped += 1
+
+    def stream(self, client):
+        """Generator für die Flask-Response eines Clients"""
+        try:
+            yield f"retry: {self.retry_ms}\n\n"
+            while not client.dropped.is_set():
+                try:
+                    yield client.queue.get(timeout=self.keepalive_seconds)
+                except queue.Empty:
+                    # Kommentarzeile hält Proxies und die Verbindung offen
+                    yield ": keepalive\n\n"
+        finally:
+            self.unsubscribe(client)
+
+    def stats(self):
+        with self.lock:
+            return {
+                "clients": len(self.clients),
+                "max_clients": self.max_clients,
+                "published": self.published,
+                "dropped_clients": self.dropped,
+                "rejected_clients": self.rejected
+            }
+
+
+def broadcaster_from_config(config):
+    dashboard = config.get("dashboard", {})
+    return LiveBroadcaster(
+        queue_size=dashboard.get("live_queue_size", 10),
+        max_clients=dashboard.get("live_max_clients", 20)
+    )
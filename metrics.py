@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+import http.server
+import math
+import threading
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+# RTT-Buckets in Sekunden: LAN (<5 ms) bis Bufferbloat/Timeout-Nähe
+RTT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.02, 0.035, 0.05, 0.075, 0.1, 0.15, 0.25, 0.5, 1.0, 2.0)
+
+
+def escape_label(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def format_value(value):
+    if value == math.inf:
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer() and abs(value) < 1e15:
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+def format_labels(names, values, extra=""):
+    pairs = [f'{n}="{escape_label(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Metric:
+    """Metrik-Familie mit festen Label-Namen, Werte pro Label-Tupel"""
+
+    kind = None
+
+    def __init__(self, registry, name, help_text, labels=()):
+        self.registry = registry
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labels)
+        self.values = {}
+
+    def _key(self, labels):
+        return tuple(labels.get(n, "") for n in self.labelnames)
+
+    def remove(self, **labels):
+        with self.registry.lock:
+            if self.values.pop(self._key(labels), None) is not None:
+                self.registry.version += 1
+
+    def clear(self):
+        with self.registry.lock:
+            self.values.clear()
+            self.registry.version += 1
+
+    def render(self, lines):
+        lines.append(f"# HELP {self.name} {self.help}")
+        lines.append(f"# TYPE {self.name} {self.kind}")
+        for key, value in self.values.items():
+            lines.append(f"{self.name}{format_labels(self.labelnames, key)} {format_value(value)}")
+
+
+class Counter(Metric):
+    """Zähler, registriert mit Suffix _total - HELP/TYPE und Samples tragen denselben Namen"""
+
+    kind = "counter"
+
+    def __init__(self, registry, name, help_text, labels=()):
+        if not name.endswith("_total"):
+            raise ValueError(f"Counter {name} muss auf _total enden")
+        super().__init__(registry, name, help_text, labels)
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self.registry.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+            self.registry.version += 1
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        if value is None:
+            self.remove(**labels)
+            return
+        with self.registry.lock:
+            self.values[self._key(labels)] = value
+            self.registry.version += 1
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, registry, name, help_text, labels=(), buckets=RTT_BUCKETS):
+        super().__init__(registry, name, help_text, labels)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self.registry.lock:
+            state = self.values.get(key)
+            if state is None:
+                # [Zähler pro Bucket (nicht kumuliert), Summe, Anzahl]
+                state = self.values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[0][i] += 1
+                    break
+            state[1] += value
+            state[2] += 1
+            self.registry.version += 1
+
+    def render(self, lines):
+        lines.append(f"# HELP {self.name} {self.help}")
+        lines.append(f"# TYPE {self.name} histogram")
+        for key, (counts, total, count) in self.values.items():
+            cumulative = 0
+            for bound, n in zip(self.buckets, counts):
+                cumulative += n
+                le = f'le="{format_value(float(bound))}"'
+                lines.append(f"{self.name}_bucket{format_labels(self.labelnames, key, le)} {cumulative}")
+            labels = format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {format_value(round(total, 6))}")
+            lines.append(f"{self.name}_count{labels} {count}")
+
+
+class Registry:
+    """Metriken im Speicher, werden beim Messen fortgeschrieben statt beim Scrape berechnet
+
+    Die Text-Exposition wird zwischengespeichert und nur neu erzeugt, wenn sich
+    seit dem letzten Scrape ein Wert geändert hat.
+    """
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.metrics = {}
+        self.version = 0
+        self._rendered = (None, b"")
+
+    def _add(self, cls, name, *args, **kwargs):
+        with self.lock:
+            if name not in self.metrics:
+                self.metrics[name] = cls(self, name, *args, **kwargs)
+            return self.metrics[name]
+
+    def counter(self, name, help_text, labels=()):
+        return self._add(Counter, name, help_text, labels)
+
+    def gauge(self, name, help_text, labels=()):
+        return self._add(Gauge, name, help_text, labels)
+
+    def histogram(self, name, help_text, labels=(), buckets=RTT_BUCKETS):
+        return self._add(Histogram, name, help_text, labels, buckets)
+
+    def render(self):
+        """Prometheus-Textformat (0.0.4) als Bytes"""
+        with self.lock:
+            version, text = self._rendered
+            if version == self.version:
+                return text
+            lines = []
+            for metric in self.metrics.values():
+                metric.render(lines)
+            text = ("\n".join(lines) + "\n").encode()
+            self._rendered = (self.version, text)
+            return text
+
+
+class ProbeMetrics:
+    """Metrik-Familien des Probers, fortgeschrieben aus den Job-Ergebnissen"""
+
+    def __init__(self, registry=None):
+        r = self.registry = registry or Registry()
+        self.rtt = r.histogram("wifi_prober_ping_rtt_seconds", "RTT einzelner Pings im Burst", ("target",))
+        self.ping_lost = r.counter("wifi_prober_ping_lost_total", "Verlorene Pings", ("target",))
+        self.ping_up = r.gauge("wifi_prober_ping_up", "1 wenn der letzte Burst Antworten hatte", ("target",))
+        self.ping_loss = r.gauge("wifi_prober_ping_loss_ratio", "Paketverlust des letzten Bursts", ("target",))
+        self.ping_jitter = r.gauge("wifi_prober_ping_jitter_seconds", "Jitter (RFC 3550) des letzten Bursts",
+                                   ("target",))
+        self.download = r.gauge("wifi_prober_speedtest_download_bits_per_second", "Download des letzten Speedtests")
+        self.upload = r.gauge("wifi_prober_speedtest_upload_bits_per_second", "Upload des letzten Speedtests")
+        self.speedtests = r.counter("wifi_prober_speedtests_total", "Speedtests nach Ergebnis", ("result",))
+        self.bufferbloat = r.gauge("wifi_prober_bufferbloat_seconds",
+                                   "Zusätzliche Median-Latenz unter Last (letzter Speedtest)")
+        self.networks = r.gauge("wifi_prober_scan_networks", "Unterschiedliche SSIDs im letzten Scan")
+        self.bssids = r.gauge("wifi_prober_scan_bssids", "Access Points (BSSIDs) im letzten Scan")
+        self.bssid_signal = r.gauge("wifi_prober_bssid_signal_dbm", "Signal pro BSSID im letzten Scan",
+                                    ("bssid", "ssid", "band", "channel"))
+        self.link_signal = r.gauge("wifi_prober_link_signal_dbm", "Signal der eigenen Verbindung")
+        self.link_bitrate = r.gauge("wifi_prober_link_tx_bitrate_bits_per_second", "TX-Bitrate der eigenen Verbindung")
+        self.uptime = r.gauge("wifi_prober_system_uptime_seconds", "Uptime des Systems")
+        self.memory = r.gauge("wifi_prober_system_memory_used_ratio", "RAM-Auslastung")
+        self.job_runs = r.counter("wifi_prober_job_runs_total", "Durchläufe pro Scheduler-Job", ("job", "result"))
+        self.job_duration = r.gauge("wifi_prober_job_duration_seconds", "Dauer des letzten Durchlaufs", ("job",))
+
+    def observe_rtts(self, target, rtts):
+        """Einzelne RTTs eines Bursts (ms, None = verloren) - Hook der LatencyEngine"""
+        lost = 0
+        for rtt in rtts:
+            if rtt is None:
+                lost += 1
+            else:
+                self.rtt.observe(rtt / 1000, target=target)
+        if lost:
+            self.ping_lost.inc(lost, target=target)
+
+    def record(self, result):
+        """Schreibt die Gauges aus einem (Teil-)Ergebnis des Probers fort"""
+        for name, p in result.get("ping", {}).items():
+            if not isinstance(p, dict):
+                continue
+            self.ping_up.set(1 if p.get("success") else 0, target=name)
+            if "loss_pct" in p:
+                self.ping_loss.set(p["loss_pct"] / 100, target=name)
+            self.ping_jitter.set(p["jitter_ms"] / 1000 if "jitter_ms" in p else None, target=name)
+
+        st = result.get("speedtest")
+        if st is not None:
+            if "download_mbps" in st:
+                self.speedtests.inc(result="ok")
+                self.download.set(st["download_mbps"] * 1_000_000)
+                self.upload.set(st.get("upload_mbps", 0) * 1_000_000)
+                loaded = st.get("loaded_latency") or {}
+                self.bufferbloat.set(loaded["bufferbloat_ms"] / 1000 if "bufferbloat_ms" in loaded else None)
+            else:
+                self.speedtests.inc(result="error")
+
+        scan = result.get("wifi_scan")
+        if scan is not None:
+            self.networks.set(scan.get("networks_found", 0))
+            self.bssids.set(scan.get("bssids_found", len(scan.get("networks", []))))
+            # Verschwundene APs sollen nicht mit altem Wert stehen bleiben
+            with self.registry.lock:
+                self.bssid_signal.clear()
+                for net in scan.get("networks", []):
+                    if net.get("bssid") and net.get("signal") is not None:
+                        self.bssid_signal.set(net["signal"], bssid=net["bssid"], ssid=net.get("essid", ""),
+                                              band=net.get("band") or "", channel=net.get("channel") or "")
+
+    def record_system(self, info, uptime_seconds=None):
+        self.uptime.set(uptime_seconds)
+        memory = info.get("memory_usage", "")
+        if isinstance(memory, str) and memory.endswith("%"):
+            self.memory.set(float(memory[:-1]) / 100)
+        link = info.get("wifi_link") or {}
+        self.link_signal.set(link.get("signal"))
+        bitrate = link.get("tx_bitrate_mbps")
+        self.link_bitrate.set(bitrate * 1_000_000 if bitrate is not None else None)
+
+    def record_job(self, name, duration, error):
+        self.job_runs.inc(job=name, result="error" if error else "ok")
+        self.job_duration.set(round(duration, 3), job=name)
+
+
+class MetricsHandler(http.server.BaseHTTPRequestHandler):
+    registry = None
+
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = self.registry.render()
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve_metrics(registry, host="0.0.0.0", port=9101):
+    """/metrics in einem Hintergrund-Thread ausliefern, gibt den Server zurück"""
+    handler = type("BoundMetricsHandler", (MetricsHandler,), {"registry": registry})
+    server = http.server.ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+    return server
@@ -0,0 +1,477 @@
+#!/usr/bin/env python3
+import errno
+import os
+import select
+import socket
+import struct
+import time
+from datetime import datetime
+
+# Netlink / Generic Netlink
+NETLINK_GENERIC = 16
+SOL_NETLINK = 270
+NETLINK_ADD_MEMBERSHIP = 1
+NLM_F_REQUEST = 0x1
+NLM_F_MULTI = 0x2
+NLM_F_ACK = 0x4
+NLM_F_DUMP = 0x300
+NLMSG_ERROR = 0x2
+NLMSG_DONE = 0x3
+NLA_F_NESTED = 0x8000
+NLA_TYPE_MASK = 0x3FFF
+
+GENL_ID_CTRL = 0x10
+CTRL_CMD_GETFAMILY = 3
+CTRL_ATTR_FAMILY_ID = 1
+CTRL_ATTR_FAMILY_NAME = 2
+CTRL_ATTR_MCAST_GROUPS = 7
+CTRL_ATTR_MCAST_GRP_NAME = 1
+CTRL_ATTR_MCAST_GRP_ID = 2
+
+# nl80211 (include/uapi/linux/nl80211.h)
+NL80211_CMD_GET_INTERFACE = 5
+NL80211_CMD_GET_STATION = 17
+NL80211_CMD_GET_SCAN = 32
+NL80211_CMD_TRIGGER_SCAN = 33
+NL80211_CMD_NEW_SCAN_RESULTS = 34
+NL80211_CMD_SCAN_ABORTED = 35
+NL80211_CMD_CONNECT = 46
+NL80211_CMD_ROAM = 47
+NL80211_CMD_DISCONNECT = 48
+NL80211_ATTR_IFINDEX = 3
+NL80211_ATTR_MAC = 6
+NL80211_ATTR_STA_INFO = 21
+NL80211_ATTR_WIPHY_FREQ = 38
+NL80211_ATTR_BSS = 47
+NL80211_ATTR_SSID = 52
+
+NL80211_STA_INFO_SIGNAL = 7
+NL80211_STA_INFO_TX_BITRATE = 8
+NL80211_STA_INFO_RX_BITRATE = 14
+NL80211_RATE_INFO_BITRATE = 1
+NL80211_RATE_INFO_BITRATE32 = 5
+
+NL80211_BSS_BSSID = 1
+NL80211_BSS_FREQUENCY = 2
+NL80211_BSS_TSF = 3
+NL80211_BSS_BEACON_INTERVAL = 4
+NL80211_BSS_CAPABILITY = 5
+NL80211_BSS_INFORMATION_ELEMENTS = 6
+NL80211_BSS_SIGNAL_MBM = 7
+NL80211_BSS_SIGNAL_UNSPEC = 8
+NL80211_BSS_STATUS = 9
+NL80211_BSS_SEEN_MS_AGO = 10
+NL80211_BSS_BEACON_IES = 11
+
+# Information Elements (IEEE 802.11)
+IE_SSID = 0
+IE_DS_PARAMS = 3
+IE_HT_CAPABILITIES = 45
+IE_RSN = 48
+IE_HT_OPERATION = 61
+IE_VHT_CAPABILITIES = 191
+IE_VHT_OPERATION = 192
+IE_VENDOR = 221
+IE_EXTENSION = 255
+IE_EXT_HE_OPERATION = 36
+IE_EXT_EHT_OPERATION = 106
+
+CIPHER_SUITES = {
+    1: "WEP-40", 2: "TKIP", 4: "CCMP", 5: "WEP-104", 6: "BIP-CMAC-128", 7: "NO-GROUP",
+    8: "GCMP-128", 9: "GCMP-256", 10: "CCMP-256", 11: "BIP-GMAC-128", 12: "BIP-GMAC-256", 13: "BIP-CMAC-256"
+}
+AKM_SUITES = {
+    1: "802.1X", 2: "PSK", 3: "FT-802.1X", 4: "FT-PSK", 5: "802.1X-SHA256", 6: "PSK-SHA256",
+    8: "SAE", 9: "FT-SAE", 11: "802.1X-SuiteB", 12: "802.1X-SuiteB-192", 18: "OWE",
+    24: "SAE-EXT-KEY", 25: "FT-SAE-EXT-KEY"
+}
+BSS_STATUS = {0: "authenticated", 1: "associated", 2: "ibss_joined"}
+
+
+class NetlinkError(Exception):
+    def __init__(self, code, message=""):
+        self.code = code
+        super().__init__(message or os.strerror(code))
+
+
+# --- Attribute kodieren/dekodieren ---
+
+def pack_attr(attr_type, payload):
+    length = 4 + len(payload)
+    return struct.pack("HH", length, attr_type) + payload + b"\x00" * ((4 - length % 4) % 4)
+
+
+def parse_attrs(data):
+    """{typ: rohdaten} aus einer Netlink-Attributliste"""
+    attrs = {}
+    offset = 0
+    while offset + 4 <= len(data):
+        length, attr_type = struct.unpack_from("HH", data, offset)
+        if length < 4:
+            break
+        attrs[attr_type & NLA_TYPE_MASK] = data[offset + 4:offset + length]
+        offset += (length + 3) & ~3
+    return attrs
+
+
+def parse_attr_list(data):
+    """Verschachtelte Liste (z.B. Multicast-Gruppen) als Liste von Attribut-Dicts"""
+    return [parse_attrs(v) for v in parse_attrs(data).values()]
+
+
+def u16(data):
+    return struct.unpack("H", data[:2])[0]
+
+
+def u32(data):
+    return struct.unpack("I", data[:4])[0]
+
+
+def s32(data):
+    return struct.unpack("i", data[:4])[0]
+
+
+def format_mac(data):
+    return ":".join(f"{b:02X}" for b in data[:6])
+
+
+def parse_bitrate(data):
+    """Bitrate in Mbit/s aus einem verschachtelten NL80211_RATE_INFO Attribut"""
+    rate = parse_attrs(data)
+    if NL80211_RATE_INFO_BITRATE32 in rate:
+        return u32(rate[NL80211_RATE_INFO_BITRATE32]) / 10
+    if NL80211_RATE_INFO_BITRATE in rate:
+        return u16(rate[NL80211_RATE_INFO_BITRATE]) / 10
+    return None
+
+
+# --- Information Elements ---
+
+def iter_ies(data):
+    offset = 0
+    while offset + 2 <= len(data):
+        ie_id, length = data[offset], data[offset + 1]
+        yield ie_id, data[offset + 2:offset + 2 + length]
+        offset += 2 + length
+
+
+def parse_suite_list(data, offset, names):
+    count = struct.unpack_from("<H", data, offset)[0]
+    offset += 2
+    suites = []
+    for _ in range(count):
+        if offset + 4 > len(data):
+            break
+        oui, suite_type = data[offset:offset + 3], data[offset + 3]
+        if oui in (b"\x00\x0f\xac", b"\x00\x50\xf2"):
+            suites.append(names.get(suite_type, f"unknown-{suite_type}"))
+        else:
+            suites.append(f"vendor-{oui.hex()}-{suite_type}")
+        offset += 4
+    return suites, offset
+
+
+def parse_rsn(data, wpa1=False):
+    """RSN-IE (bzw. WPA1 Vendor-IE ab der Versionsnummer)"""
+    info = {"group_cipher": None, "pairwise_ciphers": [], "akm_suites": []}
+    try:
+        offset = 2  # Version
+        if offset + 4 <= len(data):
+            info["group_cipher"] = CIPHER_SUITES.get(data[offset + 3], f"unknown-{data[offset + 3]}")
+            offset += 4
+        if offset + 2 <= len(data):
+            info["pairwise_ciphers"], offset = parse_suite_list(data, offset, CIPHER_SUITES)
+        if offset + 2 <= len(data):
+            info["akm_suites"], offset = parse_suite_list(data, offset, AKM_SUITES)
+        if not wpa1 and offset + 2 <= len(data):
+            caps = struct.unpack_from("<H", data, offset)[0]
+            info["mfp_capable"] = bool(caps & 0x80)
+            info["mfp_required"] = bool(caps & 0x40)
+    except struct.error:
+        pass
+    return info
+
+
+def encryption_label(rsn, wpa, privacy):
+    """Lesbare Verschlüsselung aus RSN/WPA-IE und Privacy-Bit"""
+    if rsn:
+        akms = set(rsn["akm_suites"])
+        if "802.1X-SuiteB-192" in akms:
+            return "WPA3-Enterprise-192"
+        if akms & {"SAE", "FT-SAE", "SAE-EXT-KEY", "FT-SAE-EXT-KEY"}:
+            return "WPA2/WPA3-Personal" if akms & {"PSK", "FT-PSK", "PSK-SHA256"} else "WPA3-Personal"
+        if "OWE" in akms:
+            return "OWE"
+        if akms & {"802.1X", "FT-802.1X", "802.1X-SHA256", "802.1X-SuiteB"}:
+            return "WPA/WPA2-Enterprise" if wpa else "WPA2-Enterprise"
+        return "WPA/WPA2-Personal" if wpa else "WPA2-Personal"
+    if wpa:
+        return "WPA"
+    return "WEP" if privacy else "Open"
+
+
+def freq_to_channel(freq):
+    if freq == 2484:
+        return 14
+    if 2412 <= freq <= 2472:
+        return (freq - 2407) // 5
+    if 5955 <= freq <= 7115:
+        return (freq - 5950) // 5
+    if 5000 <= freq <= 5900:
+        return (freq - 5000) // 5
+    return None
+
+
+def freq_to_band(freq):
+    if freq < 3000:
+        return "2.4 GHz"
+    if freq < 5925:
+        return "5 GHz"
+    return "6 GHz"
+
+
+def parse_ies(data):
+    """Wertet die für das Monitoring relevanten IEs aus"""
+    info = {"essid": "", "ie_ids": [], "rsn": None, "wpa": None, "channel": None,
+            "width_mhz": 20, "standards": []}
+    for ie_id, body in iter_ies(data):
+        info["ie_ids"].append(ie_id)
+        if ie_id == IE_SSID:
+            info["essid"] = body.decode("utf-8", errors="replace").rstrip("\x00")
+        elif ie_id == IE_DS_PARAMS and body:
+            info["channel"] = body[0]
+        elif ie_id == IE_RSN:
+            info["rsn"] = parse_rsn(body)
+        elif ie_id == IE_VENDOR and body[:4] == b"\x00\x50\xf2\x01":
+            info["wpa"] = parse_rsn(body[4:], wpa1=True)
+        elif ie_id == IE_HT_OPERATION and len(body) >= 2:
+            info["standards"].append("n")
+            info["channel"] = info["channel"] or body[0]
+            if body[1] & 0x04 and body[1] & 0x03 in (1, 3):
+                info["width_mhz"] = 40
+        elif ie_id == IE_VHT_OPERATION and len(body) >= 3:
+            info["standards"].append("ac")
+            width, seg0, seg1 = body[0], body[1], body[2]
+            if width == 1:
+                info["width_mhz"] = 160 if seg1 and abs(seg1 - seg0) == 8 else 80
+                if seg1 and abs(seg1 - seg0) > 8:
+                    info["width_mhz"] = "80+80"
+            elif width in (2, 3):
+                info["width_mhz"] = 160 if width == 2 else "80+80"
+        elif ie_id == IE_EXTENSION and body:
+            if body[0] == IE_EXT_HE_OPERATION:
+                info["standards"].append("ax")
+            elif body[0] == IE_EXT_EHT_OPERATION:
+                info["standards"].append("be")
+    return info
+
+
+def parse_bss(attrs, timestamp, include_raw_ies=False):
+    """Ein NL80211_ATTR_BSS in das Netzwerk-Format des Scanners übersetzen"""
+    bss = parse_attrs(attrs)
+    freq = u32(bss[NL80211_BSS_FREQUENCY]) if NL80211_BSS_FREQUENCY in bss else 0
+    ies_raw = bss.get(NL80211_BSS_INFORMATION_ELEMENTS) or bss.get(NL80211_BSS_BEACON_IES, b"")
+    ies = parse_ies(ies_raw)
+    capability = u16(bss[NL80211_BSS_CAPABILITY]) if NL80211_BSS_CAPABILITY in bss else 0
+
+    if NL80211_BSS_SIGNAL_MBM in bss:
+        signal = round(s32(bss[NL80211_BSS_SIGNAL_MBM]) / 100)
+    elif NL80211_BSS_SIGNAL_UNSPEC in bss:
+        signal = bss[NL80211_BSS_SIGNAL_UNSPEC][0]
+    else:
+        signal = 0
+
+    network = {
+        "timestamp": timestamp,
+        "bssid": format_mac(bss.get(NL80211_BSS_BSSID, b"")),
+        "essid": ies["essid"],
+        "signal": signal,
+        "frequency": f"{freq / 1000:g} GHz" if freq else "",
+        "encryption": encryption_label(ies["rsn"], ies["wpa"], capability & 0x10),
+        "channel": freq_to_channel(freq) or ies["channel"],
+        "band": freq_to_band(freq) if freq else None,
+        "channel_width_mhz": ies["width_mhz"],
+        "standards": ies["standards"],
+        "rsn": ies["rsn"],
+        "wpa": ies["wpa"],
+        "ie_ids": ies["ie_ids"],
+        "last_seen_ms": u32(bss[NL80211_BSS_SEEN_MS_AGO]) if NL80211_BSS_SEEN_MS_AGO in bss else None,
+        "beacon_interval": u16(bss[NL80211_BSS_BEACON_INTERVAL]) if NL80211_BSS_BEACON_INTERVAL in bss else None,
+        "status": BSS_STATUS.get(u32(bss[NL80211_BSS_STATUS])) if NL80211_BSS_STATUS in bss else None
+    }
+    if include_raw_ies:
+        network["ies"] = ies_raw.hex()
+    return network
+
+
+class Nl80211:
+    """Minimaler nl80211-Client über einen Generic-Netlink-Socket"""
+
+    def __init__(self):
+        self.sock = socket.socket(socket.AF_NETLINK, socket.SOCK_RAW, NETLINK_GENERIC)
+        self.sock.bind((0, 0))
+        self.seq = int(time.time())
+        self.family_id, self.mcast_groups = self._resolve_family("nl80211")
+
+    def close(self):
+        self.sock.close()
+
+    # --- Nachrichten ---
+
+    def _send(self, sock, msg_type, cmd, attrs=b"", flags=NLM_F_REQUEST | NLM_F_ACK):
+        self.seq += 1
+        payload = struct.pack("BBH", cmd, 1, 0) + attrs
+        header = struct.pack("IHHII", 16 + len(payload), msg_type, flags, self.seq, 0)
+        sock.send(header + payload)
+        return self.seq
+
+    def _recv(self, sock, seq):
+        """Liest Antworten zu `seq` bis ACK/DONE, liefert (cmd, attrs) Paare"""
+        messages = []
+        while True:
+            data = sock.recv(65536)
+            offset = 0
+            while offset + 16 <= len(data):
+                length, msg_type, flags, msg_seq, _ = struct.unpack_from("IHHII", data, offset)
+                if length < 16:
+                    return messages
+                body = data[offset + 16:offset + length]
+                offset += (length + 3) & ~3
+                if msg_seq != seq:
+                    continue
+                if msg_type == NLMSG_DONE:
+                    return messages
+                if msg_type == NLMSG_ERROR:
+                    code = -struct.unpack_from("i", body)[0]
+                    if code:
+                        raise NetlinkError(code)
+                    return messages  # ACK
+                # Bei Einzelantworten folgt noch das ACK, daher weiterlesen
+                messages.append((body[0], parse_attrs(body[4:])))
+
+    def _resolve_family(self, name):
+        seq = self._send(self.sock, GENL_ID_CTRL, CTRL_CMD_GETFAMILY,
+                         pack_attr(CTRL_ATTR_FAMILY_NAME, name.encode() + b"\x00"))
+        messages = self._recv(self.sock, seq)
+        if not messages:
+            raise NetlinkError(errno.ENOENT, f"Generic-Netlink-Familie {name} nicht gefunden")
+        attrs = messages[0][1]
+        groups = {}
+        for group in parse_attr_list(attrs.get(CTRL_ATTR_MCAST_GROUPS, b"")):
+            if CTRL_ATTR_MCAST_GRP_NAME in group and CTRL_ATTR_MCAST_GRP_ID in group:
+                groups[group[CTRL_ATTR_MCAST_GRP_NAME].rstrip(b"\x00").decode()] = u32(group[CTRL_ATTR_MCAST_GRP_ID])
+        return u16(attrs[CTRL_ATTR_FAMILY_ID]), groups
+
+    # --- Verbindung ---
+
+    def get_interface(self, ifindex):
+        """SSID und Frequenz der aktuellen Verbindung (leer wenn nicht verbunden)"""
+        seq = self._send(self.sock, self.family_id, NL80211_CMD_GET_INTERFACE,
+                         pack_attr(NL80211_ATTR_IFINDEX, struct.pack("I", ifindex)))
+        messages = self._recv(self.sock, seq)
+        attrs = messages[0][1] if messages else {}
+        return {
+            "ssid": attrs[NL80211_ATTR_SSID].decode("utf-8", errors="replace") if NL80211_ATTR_SSID in attrs else None,
+            "frequency": u32(attrs[NL80211_ATTR_WIPHY_FREQ]) if NL80211_ATTR_WIPHY_FREQ in attrs else None
+        }
+
+    def get_station(self, ifindex):
+        """BSSID, Signal und TX/RX-Bitrate zum verbundenen AP, None wenn nicht verbunden"""
+        seq = self._send(self.sock, self.family_id, NL80211_CMD_GET_STATION,
+                         pack_attr(NL80211_ATTR_IFINDEX, struct.pack("I", ifindex)),
+                         flags=NLM_F_REQUEST | NLM_F_DUMP)
+        for _, attrs in self._recv(self.sock, seq):
+            if NL80211_ATTR_STA_INFO not in attrs:
+                continue
+            info = parse_attrs(attrs[NL80211_ATTR_STA_INFO])
+            return {
+                "bssid": format_mac(attrs[NL80211_ATTR_MAC]) if NL80211_ATTR_MAC in attrs else None,
+                "signal": struct.unpack("b", info[NL80211_STA_INFO_SIGNAL][:1])[0]
+                if NL80211_STA_INFO_SIGNAL in info else None,
+                "tx_bitrate_mbps": parse_bitrate(info[NL80211_STA_INFO_TX_BITRATE])
+                if NL80211_STA_INFO_TX_BITRATE in info else None,
+                "rx_bitrate_mbps": parse_bitrate(info[NL80211_STA_INFO_RX_BITRATE])
+                if NL80211_STA_INFO_RX_BITRATE in info else None
+            }
+        return None
+
+    # --- Scan ---
+
+    def trigger_scan(self, ifindex):
+        seq = self._send(self.sock, self.family_id, NL80211_CMD_TRIGGER_SCAN,
+                         pack_attr(NL80211_ATTR_IFINDEX, struct.pack("I", ifindex)))
+        self._recv(self.sock, seq)
+
+    def dump_scan(self, ifindex, include_raw_ies=False):
+        seq = self._send(self.sock, self.family_id, NL80211_CMD_GET_SCAN,
+                         pack_attr(NL80211_ATTR_IFINDEX, struct.pack("I", ifindex)),
+                         flags=NLM_F_REQUEST | NLM_F_DUMP)
+        timestamp = datetime.now().isoformat()
+        return [parse_bss(attrs[NL80211_ATTR_BSS], timestamp, include_raw_ies)
+                for _, attrs in self._recv(self.sock, seq) if NL80211_ATTR_BSS in attrs]
+
+    def scan(self, interface, timeout=30, trigger=True, include_raw_ies=False):
+        """Scan auslösen, auf das scan-done Event warten und die BSS-Liste abholen
+
+        Ohne CAP_NET_ADMIN (EPERM) oder bei laufendem Scan (EBUSY) werden die
+        zuletzt vom Kernel gecachten Ergebnisse geliefert - `last_seen_ms` zeigt
+        deren Alter.
+        """
+        ifindex = socket.if_nametoindex(interface)
+        if trigger and "scan" in self.mcast_groups:
+            # Event-Socket vor dem Auslösen abonnieren, sonst kann das Event verloren gehen
+            events = socket.socket(socket.AF_NETLINK, socket.SOCK_RAW, NETLINK_GENERIC)
+            try:
+                events.bind((0, 0))
+                events.setsockopt(SOL_NETLINK, NETLINK_ADD_MEMBERSHIP, self.mcast_groups["scan"])
+                try:
+                    self.trigger_scan(ifindex)
+                    self._wait_scan_done(events, ifindex, timeout)
+                except NetlinkError as e:
+                    if e.code == errno.EBUSY:
+                        self._wait_scan_done(events, ifindex, timeout)
+                    elif e.code != errno.EPERM:
+                        raise
+            finally:
+                events.close()
+        return self.dump_scan(ifindex, include_raw_ies)
+
+    def _wait_scan_done(self, events, ifindex, timeout):
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise NetlinkError(errno.ETIMEDOUT, "Kein scan-done Event erhalten")
+            ready, _, _ = select.select([events], [], [], remaining)
+            if not ready:
+                continue
+            data = events.recv(65536)
+            offset = 0
+            while offset + 20 <= len(data):
+                length = struct.unpack_from("I", data, offset)[0]
+                if length < 20:
+                    break
+                cmd = data[offset + 16]
+                attrs = parse_attrs(data[offset + 20:offset + length])
+                offset += (length + 3) & ~3
+                if NL80211_ATTR_IFINDEX in attrs and u32(attrs[NL80211_ATTR_IFINDEX]) != ifindex:
+                    continue
+                if cmd == NL80211_CMD_NEW_SCAN_RESULTS:
+                    return
+                if cmd == NL80211_CMD_SCAN_ABORTED:
+                    raise NetlinkError(errno.ECANCELED, "Scan abgebrochen")
+
+
+def scan(interface="wlan0", timeout=30, trigger=True, include_raw_ies=False):
+    client = Nl80211()
+    try:
+        return client.scan(interface, timeout, trigger, include_raw_ies)
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    import sys
+    for net in scan(sys.argv[1] if len(sys.argv) > 1 else "wlan0"):
+        print(f"{net['bssid']} {net['signal']:4} dBm ch{net['channel']:<4} {net['channel_width_mhz']:>5} MHz "
+              f"{net['encryption']:<20} {net['essid']}")
@@ -0,0 +1,352 @@
+#!/usr/bin/env python3
+import threading
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from result_store import parse_timestamp
+from sqlite_store import ThreadConnections
+from scheduler import schedule_from_config
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS intervals (
+    id INTEGER PRIMARY KEY,
+    source TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    start REAL NOT NULL,
+    end REAL NOT NULL,
+    open INTEGER NOT NULL DEFAULT 1,
+    reason TEXT
+);
+CREATE INDEX IF NOT EXISTS intervals_end ON intervals (end);
+CREATE TABLE IF NOT EXISTS sla (
+    period TEXT NOT NULL,
+    start INTEGER NOT NULL,
+    end INTEGER NOT NULL,
+    observed REAL NOT NULL,
+    down REAL NOT NULL,
+    outages INTEGER NOT NULL,
+    longest REAL,
+    PRIMARY KEY (period, start)
+);
+"""
+
+PERIODS = ("day", "week", "month")
+LIVE_REASON = "Kein Live-Ping"
+
+
+def period_start(ts, period):
+    """Beginn des Tages/der Woche (Montag)/des Monats in lokaler Zeit"""
+    day = datetime.fromtimestamp(ts).replace(hour=0, minute=0, second=0, microsecond=0)
+    if period == "week":
+        day -= timedelta(days=day.weekday())
+    elif period == "month":
+        day = day.replace(day=1)
+    return int(day.timestamp())
+
+
+def period_end(start, period):
+    begin = datetime.fromtimestamp(start)
+    if period == "day":
+        end = begin + timedelta(days=1)
+    elif period == "week":
+        end = begin + timedelta(days=7)
+    else:
+        end = (begin.replace(day=28) + timedelta(days=4)).replace(day=1)
+    # Über die Sommerzeit-Umstellung wieder auf Mitternacht
+    return period_start(end.timestamp() + 7200, "day")
+
+
+def merge_spans(spans):
+    """Überlappende (start, end) Paare zusammenfassen, sortiert"""
+    merged = []
+    for start, end in sorted(spans):
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return merged
+
+
+def subtract_spans(start, end, spans):
+    """Teile von [start, end], die in keinem der (sortierten, disjunkten) spans liegen"""
+    pieces = []
+    for s, e in spans:
+        if e < start or s > end:
+            continue
+        if s > start:
+            pieces.append((start, s))
+        if e >= end:
+            return pieces
+        start = e
+    pieces.append((start, end))
+    return pieces
+
+
+class IntervalTracker:
+    """Fasst Beobachtungen (ts, ok) einer Quelle zu Ausfall- und Abdeckungsintervallen zusammen
+
+    Ein Ausfall beginnt bei der ersten fehlgeschlagenen Beobachtung und endet
+    bei der ersten erfolgreichen. Liegen mehr als `max_gap` Sekunden zwischen
+    zwei Beobachtungen, gilt die Zeit dazwischen als nicht beobachtet: offene
+    Intervalle werden bei der letzten Beobachtung geschlossen. Die offenen
+    Intervalle werden höchstens alle `flush_seconds` (und bei jedem
+    Zustandswechsel) geschrieben und nach einem Neustart fortgesetzt.
+    """
+
+    def __init__(self, store, source, max_gap, flush_seconds=0):
+        self.store = store
+        self.source = source
+        self.max_gap = max_gap
+        self.flush_seconds = flush_seconds
+        self.coverage = None    # [id, start, end]
+        self.outage = None      # [id, start, end, reason]
+        self.last = None
+        self.flushed = 0
+        self.lock = threading.Lock()
+        for row_id, kind, start, end, reason in store.conn.execute(
+            "SELECT id, kind, start, end, reason FROM intervals WHERE source = ? AND open = 1", (source,)
+        ):
+            if kind == "coverage":
+                self.coverage = [row_id, start, end]
+                self.last = end
+            else:
+                self.outage = [row_id, start, end, reason]
+        if self.coverage is None:
+            self.outage = None
+            self.last = store.conn.execute("SELECT MAX(end) FROM intervals WHERE source = ?", (source,)).fetchone()[0]
+
+    def observe(self, ts, ok, reason=None):
+        """Neue Beobachtung, gibt True bei Beginn oder Ende eines Ausfalls zurück"""
+        with self.lock:
+            if self.last is not None and ts <= self.last:
+                return False
+            self.store.mark_dirty(self.last if self.last is not None else ts)
+            if self.last is None or ts - self.last > self.max_gap:
+                self._close()
+                self.coverage = [None, ts, ts]
+            else:
+                self.coverage[2] = ts
+            changed = False
+            if self.outage is not None:
+                self.outage[2] = ts
+                if ok:
+                    self.store.write(self.source, "outage", self.outage, closed=True)
+                    self.outage = None
+                    changed = True
+            elif not ok:
+                self.outage = [None, ts, ts, reason]
+                changed = True
+            self.last = ts
+            if changed or ts - self.flushed >= self.flush_seconds:
+                self._flush()
+            return changed
+
+    def _flush(self):
+        self.store.write(self.source, "coverage", self.coverage)
+        if self.outage is not None:
+            self.store.write(self.source, "outage", self.outage)
+        self.flushed = self.last
+
+    def _close(self):
+        if self.coverage is not None:
+            self.store.write(self.source, "coverage", self.coverage, closed=True)
+        if self.outage is not None:
+            self.store.write(self.source, "outage", self.outage, closed=True)
+        self.coverage = self.outage = None
+
+
+class OutageStore:
+    """Ausfall-Intervalle aus den Probes und dem Live-Ping, plus vorberechnete SLA-Perioden
+
+    Die Probes (Ping-Job, Speedtest) liefern lückenlose, aber grobe
+    Beobachtungen, der Live-Ping des Dashboards (1 Hz) genaue Anfangs- und
+    Endzeiten. Wo der Live-Ping lief, gelten seine Intervalle, sonst die der
+    Probes. Verfügbarkeit, MTTR und MTBF werden über die beobachtete Zeit
+    gewichtet, nicht über die Anzahl der Probes. Tages-, Wochen- und
+    Monatswerte liegen in der Tabelle `sla` und werden nur für Perioden neu
+    berechnet, in die seit dem letzten refresh_sla() neue Beobachtungen fielen.
+    """
+
+    def __init__(self, path, probe_max_gap=180, live_max_gap=5, live_flush_seconds=30):
+        self.path = str(path)
+        self._connections = ThreadConnections(self.path)
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        self.conn.executescript(SCHEMA)
+        self.dirty_lock = threading.Lock()
+        # Nach einem Neustart die jeweils jüngste Periode neu rechnen, ohne Einträge alles
+        row = self.conn.execute("SELECT MIN(start) FROM (SELECT MAX(start) AS start FROM sla GROUP BY period)").fetchone()
+        self.dirty = row[0] if row[0] is not None else 0
+        self.probes = IntervalTracker(self, "probe", probe_max_gap)
+        self.live = IntervalTracker(self, "live", live_max_gap, live_flush_seconds)
+
+    @property
+    def conn(self):
+        return self._connections.get()
+
+    def close(self):
+        self._connections.close()
+
+    def mark_dirty(self, ts):
+        with self.dirty_lock:
+            self.dirty = ts if self.dirty is None else min(self.dirty, ts)
+
+    def write(self, source, kind, interval, closed=False):
+        """Intervall einfügen oder fortschreiben, interval[0] ist die Zeilen-ID"""
+        row_id, start, end = interval[:3]
+        reason = interval[3] if kind == "outage" else None
+        with self.conn as conn:
+            if row_id is None:
+                interval[0] = conn.execute(
+                    "INSERT INTO intervals (source, kind, start, end, open, reason) VALUES (?, ?, ?, ?, ?, ?)",
+                    (source, kind, start, end, 0 if closed else 1, reason)
+                ).lastrowid
+            else:
+                conn.execute("UPDATE intervals SET end = ?, open = ? WHERE id = ?", (end, 0 if closed else 1, row_id))
+
+    # --- Beobachtungen ---
+
+    def observe_live(self, ts, pings):
+        """Ergebnis eines Live-Ping Durchlaufs ({name: {"success": ...}}), verbunden = ein Ziel antwortet"""
+        if pings:
+            self.live.observe(ts, any(p.get("success") for p in pings.values()), LIVE_REASON)
+
+    def sync_probes(self, store):
+        """Neue Probe-Ergebnisse aus dem ResultStore übernehmen"""
+        for timestamp, ping_ok, speedtest_failed in store.probe_health(self.probes.last or 0):
+            if ping_ok is False:
+                self.probes.observe(parse_timestamp(timestamp), False, "Kein Ping")
+            else:
+                self.probes.observe(parse_timestamp(timestamp), not speedtest_failed,
+                                    "Speedtest fehlgeschlagen" if speedtest_failed else None)
+
+    # --- Auswertung ---
+
+    def resolve(self, since, until=None):
+        """(Ausfälle, beobachtete Spannen) im Fenster, Live-Ping hat Vorrang vor den Probes"""
+        until = until or time.time()
+        rows = self.conn.execute(
+            "SELECT source, kind, start, end, open, reason FROM intervals WHERE end >= ? AND start < ?",
+            (since, until)
+        ).fetchall()
+        live_coverage = merge_spans([(s, e) for source, kind, s, e, _, _ in rows
+                                     if source == "live" and kind == "coverage"])
+        candidates = []
+        for source, kind, start, end, is_open, reason in rows:
+            if kind != "outage":
+                continue
+            pieces = [(start, end)] if source == "live" else subtract_spans(start, end, live_coverage)
+            candidates.extend((s, e, source, reason, bool(is_open) and e == end) for s, e in pieces)
+
+        outages = []
+        for start, end, source, reason, ongoing in sorted(candidates):
+            if outages and start <= outages[-1]["end"]:
+                last = outages[-1]
+                if end >= last["end"]:
+                    last["end"], last["ongoing"] = end, ongoing
+                if source not in last["sources"]:
+                    last["sources"].append(source)
+                continue
+            outages.append({"start": start, "end": end, "reason": reason, "sources": [source], "ongoing": ongoing})
+        for o in outages:
+            o["start"], o["end"] = max(o["start"], since), min(o["end"], until)
+        coverage = [(max(s, since), min(e, until)) for s, e in merge_spans(
+            [(s, e) for _, kind, s, e, _, _ in rows if kind == "coverage"])]
+        return [o for o in outages if o["start"] <= o["end"]], [(s, e) for s, e in coverage if s <= e]
+
+    def summarize(self, since, until=None):
+        """Zeitgewichtete Verfügbarkeit, MTTR und MTBF im Fenster"""
+        outages, coverage = self.resolve(since, until)
+        observed = sum(e - s for s, e in coverage)
+        down = min(sum(o["end"] - o["start"] for o in outages), observed)
+        return self._report(observed, down, len(outages), max((o["end"] - o["start"] for o in outages), default=None),
+                            outages=outages)
+
+    @staticmethod
+    def _report(observed, down, count, longest, **extra):
+        report = {
+            "observed_seconds": round(observed, 1),
+            "down_seconds": round(down, 1),
+            "outage_count": count,
+            "availability_percent": round((observed - down) / observed * 100, 3) if observed else None,
+            # MTTR: mittlere Ausfalldauer, MTBF: mittlere Verfügbarkeitsdauer zwischen zwei Ausfällen
+            "mttr_seconds": round(down / count, 1) if count else None,
+            "mtbf_seconds": round((observed - down) / count, 1) if count else None,
+            "longest_seconds": round(longest, 1) if longest is not None else None
+        }
+        report.update(extra)
+        return report
+
+    def refresh_sla(self, now=None):
+        """SLA-Perioden ab der ältesten Änderung neu berechnen"""
+        now = now or time.time()
+        with self.dirty_lock:
+            dirty, self.dirty = self.dirty, None
+        if dirty is None:
+            return 0
+        if not dirty:
+            first = self.conn.execute("SELECT MIN(start) FROM intervals").fetchone()[0]
+            if first is None:
+                return 0
+            dirty = first
+        rows = []
+        for period in PERIODS:
+            start = period_start(dirty, period)
+            while start < now:
+                end = period_end(start, period)
+                outages, coverage = self.resolve(start, min(end, now))
+                observed = sum(e - s for s, e in coverage)
+                durations = [o["end"] - o["start"] for o in outages]
+                rows.append((period, start, end, observed, min(sum(durations), observed), len(durations),
+                             max(durations, default=None)))
+                start = end
+        with self.conn as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO sla (period, start, end, observed, down, outages, longest) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                rows
+            )
+        return len(rows)
+
+    def sla(self, period, limit=12):
+        """Die letzten `limit` Perioden aus der vorberechneten Tabelle, neueste zuerst"""
+        return [
+            self._report(observed, down, count, longest, period=period,
+                         start=datetime.fromtimestamp(start).isoformat(), end=datetime.fromtimestamp(end).isoformat())
+            for start, end, observed, down, count, longest in self.conn.execute(
+                "SELECT start, end, observed, down, outages, longest FROM sla WHERE period = ? "
+                "ORDER BY start DESC LIMIT ?",
+                (period, limit)
+            )
+        ]
+
+
+def format_outage(outage):
+    return {
+        "timestamp": datetime.fromtimestamp(outage["start"]).isoformat(),
+        "end": datetime.fromtimestamp(outage["end"]).isoformat(),
+        "duration_seconds": round(outage["end"] - outage["start"], 1),
+        "reason": outage["reason"],
+        "sources": outage["sources"],
+        "ongoing": outage["ongoing"]
+    }
+
+
+def probe_max_gap(config):
+    """Größte Lücke zwischen zwei Probes, die noch als beobachtet gilt (3 Ping-Intervalle)"""
+    outages = config.get("outages", {})
+    if outages.get("probe_max_gap_seconds"):
+        return outages["probe_max_gap_seconds"]
+    jobs, _ = schedule_from_config(config)
+    intervals = [interval for name, interval, _, _ in jobs if name in ("ping", "speedtest")]
+    return 3 * min(intervals) if intervals else 900
+
+
+def open_outages(config):
+    storage = config.get("storage", {})
+    outages = config.get("outages", {})
+    return OutageStore(
+        storage.get("outage_path", "/home/azubi/wifi_outages.sqlite"),
+        probe_max_gap=probe_max_gap(config),
+        live_max_gap=outages.get("live_max_gap_seconds", 5),
+        live_flush_seconds=outages.get("live_flush_seconds", 30)
+    )
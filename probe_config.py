@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+import json
+import os
+
+CONFIG_FILE = os.environ.get("WIFI_PROBER_CONFIG", "wifi_config.json")
+
+# Abschnitte, die aus der Datei komplett übernommen statt mit den Defaults gemischt werden
+REPLACE_SECTIONS = ("targets",)
+
+
+def get_default_config():
+    """Standard Konfiguration"""
+    return {
+        "general": {"probe_interval_seconds": 300, "max_stored_results": 10000, "log_level": "INFO"},
+        "wifi": {
+            "interface": "wlan0", "scan_backend": "auto", "scan_timeout_seconds": 30, "known_networks": [],
+            "state_poll_seconds": 5
+        },
+        "targets": {"google": "8.8.8.8", "cloudflare": "1.1.1.1"},
+        "ping": {
+            "timeout_seconds": 2, "tcp_port": 443, "methods": ["icmp", "tcp"],
+            "burst_count": 10, "burst_interval_ms": 100,
+            "cycle_budget_seconds": 10, "live_budget_seconds": 1.5
+        },
+        "schedule": {
+            # Intervall None = general.probe_interval_seconds; first_delay staffelt den Start
+            "ping": {"interval_seconds": 60, "jitter_seconds": 2, "first_delay_seconds": 0},
+            "scan": {"interval_seconds": None, "jitter_seconds": 10, "first_delay_seconds": 15},
+            "speedtest": {"interval_seconds": None, "jitter_seconds": 30, "first_delay_seconds": 45},
+            "system_info": {"interval_seconds": None, "jitter_seconds": 0, "first_delay_seconds": 0},
+            # Jobs einer Gruppe laufen nie gleichzeitig: Ping und Scan nicht unter Speedtest-Last,
+            # Ping nicht während des Off-Channel-Scans
+            "exclusive": [["speedtest", "ping"], ["speedtest", "scan"], ["scan", "ping"]]
+        },
+        "speedtest": {
+            "enabled": True, "timeout_seconds": 60, "server_id": None, "check_targets": ["google", "cloudflare"],
+            # "cli" = speedtest-cli, "http" = Bulk-Transfer gegen http_url (z.B. speedtest_runner.py --serve 8080)
+            "backend": "cli", "http_url": None, "http_streams": 4, "phase_seconds": 10, "sample_interval_ms": 250,
+            # Latenz während Download/Upload messen (Bufferbloat), Ziel = Name aus targets oder Host
+            "loaded_latency": False, "loaded_latency_target": None, "loaded_latency_interval_ms": 100
+        },
+        "monitoring": {
+            "nagios_enabled": False, "checkmk_enabled": False, "alert_on_no_internet": True, "alert_on_low_speed_mbps": 10,
+            # Prometheus /metrics des Probers (das Dashboard liefert seine Live-Metriken unter :5000/metrics)
+            "metrics_enabled": True, "metrics_host": "0.0.0.0", "metrics_port": 9101
+        },
+        "alerts": {
+            # Regeln zusätzlich zu alert_on_no_internet/alert_on_low_speed_mbps, siehe alerting.Rule
+            "rules": [],
+            # Sinks: file, webhook (url), syslog, nagios (command_file, host)
+            "sinks": [{"type": "file", "path": "/home/azubi/alerts.json"}],
+            "state_file": "/home/azubi/alert_state.json",
+            "batch_seconds": 30
+        },
+        "storage": {
+            "backend": "segmented",
+            "path": "/home/azubi/wifi_probe_results",
+            "legacy_file": "/home/azubi/wifi_probe_results.json",
+            "sqlite_path": "/home/azubi/wifi_probe_results.sqlite",
+            "rollup_path": "/home/azubi/wifi_rollups.sqlite",
+            "outage_path": "/home/azubi/wifi_outages.sqlite",
+            "live_history_path": "/home/azubi/wifi_live_history.bin",
+            # general.max_stored_results zählt auch das aktive Segment; gelöscht werden nur ganze
+            # Segmente, es bleiben also bis zu einem Segment mehr als das Limit stehen
+            "segment_max_bytes": 4 * 1024 * 1024,
+            "segment_max_seconds": 86400,
+            "retention_days": None,
+            "fsync": True
+        },
+        # Unix-Socket für Aufträge an den laufenden Prober (Dashboard, python3 control.py scan --wait 60)
+        "control": {"enabled": True, "socket": "/home/azubi/wifi_prober.sock"},
+        "outages": {
+            # None = 3 Ping-Intervalle; längere Lücken zwischen Probes gelten als nicht beobachtet
+            "probe_max_gap_seconds": None, "live_max_gap_seconds": 5, "live_flush_seconds": 30, "refresh_seconds": 60
+        },
+        # Mehrere Stationen: Ergebnisse gebündelt an einen Collector schicken, bei Ausfall lokal spoolen;
+        # station None = Hostname
+        "fleet": {
+            "enabled": False, "collector_url": None, "station": None, "token": None,
+            "spool_dir": "/home/azubi/wifi_fleet_spool", "max_spool_bytes": 64 * 1024 * 1024,
+            "batch_size": 500, "push_seconds": 30, "max_backoff_seconds": 600
+        },
+        # Der Collector selbst (python3 fleet.py auf dem zentralen Rechner)
+        "collector": {
+            "host": "0.0.0.0", "port": 5050, "path": "/home/azubi/wifi_fleet.sqlite", "token": None,
+            "stale_seconds": 300
+        },
+        "dashboard": {
+            "chart_point_budget": 500, "live_max_clients": 20, "live_queue_size": 10,
+            # 1 Hz Live-Samples: Länge des Ringpuffers und wie oft er auf die Karte geschrieben wird
+            "live_history_seconds": 86400, "live_history_flush_seconds": 60,
+            # Live-Zustand des Samplers für die Web-Worker (WIFI_DASHBOARD_ROLE=web), liegt im RAM
+            "shared_state_path": "/dev/shm/wifi_dashboard_live", "shared_state_bytes": 256 * 1024
+        }
+    }
+
+
+def load_config(config_file=None):
+    """Lade Konfiguration, fehlende Einträge werden mit Defaults ergänzt"""
+    config_file = config_file or CONFIG_FILE
+    config = get_default_config()
+    try:
+        with open(config_file, 'r') as f:
+            loaded = json.load(f)
+    except FileNotFoundError:
+        print(f"Warnung: {config_file} nicht gefunden, verwende Defaults")
+        return config
+    except Exception as e:
+        print(f"Fehler beim Laden der Konfiguration: {e}")
+        return config
+
+    for section, values in loaded.items():
+        if section not in REPLACE_SECTIONS and isinstance(values, dict) and isinstance(config.get(section), dict):
+            config[section].update(values)
+        else:
+            config[section] = values
+    return config
@@ -0,0 +1,522 @@
+#!/usr/bin/env python3
+import json
+import os
+import time
+from datetime import datetime
+from pathlib import Path
+from nl80211 import freq_to_band, freq_to_channel
+
+# Kennzahlen pro Ping-Ziel, die als Chart-Feld abgefragt werden können
+PING_FIELDS = ("avg_ms", "min_ms", "max_ms", "stddev_ms", "p50_ms", "p95_ms", "p99_ms", "jitter_ms", "loss_pct")
+
+SEGMENT_PREFIX = "segment-"
+SEGMENT_SUFFIX = ".jsonl"
+
+
+def parse_timestamp(ts):
+    """Wandelt einen ISO-Zeitstempel in Epoch-Sekunden um"""
+    return datetime.fromisoformat(ts.replace("Z", "")).timestamp()
+
+
+def network_frequency_mhz(net):
+    """Frequenz eines Scan-Eintrags ("2.412 GHz") in MHz, None wenn unbekannt"""
+    try:
+        return round(float(str(net.get("frequency", "")).split()[0]) * 1000)
+    except (ValueError, IndexError):
+        return None
+
+
+def network_band(net):
+    """Band eines Scan-Eintrags, bei älteren Einträgen aus der Frequenz abgeleitet"""
+    if net.get("band"):
+        return net["band"]
+    freq = network_frequency_mhz(net)
+    return freq_to_band(freq) if freq else None
+
+
+def network_channel(net):
+    """Kanal eines Scan-Eintrags, bei älteren Einträgen aus der Frequenz abgeleitet"""
+    if net.get("channel"):
+        return net["channel"]
+    freq = network_frequency_mhz(net)
+    return freq_to_channel(freq) if freq else None
+
+
+def atomic_write_json(path, data, **dump_args):
+    """Schreibt JSON über Temp-Datei + rename, damit nie eine halbe Datei liegen bleibt"""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f, **dump_args)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def read_segment(path, offset=0):
+    """Liest vollständige Zeilen eines Segments ab Byte-Offset
+
+    Gibt (ergebnisse, neuer_offset) zurück. Eine unvollständige letzte Zeile
+    (Schreibvorgang läuft noch) wird nicht gelesen und beim nächsten Mal erneut versucht.
+    """
+    results = []
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        for raw in f:
+            if not raw.endswith(b"\n"):
+                break
+            offset += len(raw)
+            try:
+                results.append(json.loads(raw))
+            except ValueError:
+                continue
+    return results, offset
+
+
+def bufferbloat_values(speedtest):
+    """{"idle_ms", "download_ms", "upload_ms", "added_ms"} (Mediane) aus speedtest.loaded_latency"""
+    loaded = speedtest.get("loaded_latency") if isinstance(speedtest, dict) else None
+    if not loaded:
+        return {}
+    values = {}
+    for phase in ("idle", "download", "upload"):
+        summary = loaded.get(phase) or {}
+        if summary.get("success"):
+            values[f"{phase}_ms"] = summary.get("p50_ms")
+    if "bufferbloat_ms" in loaded:
+        values["added_ms"] = loaded["bufferbloat_ms"]
+    return values
+
+
+class ResultStore:
+    """Basisklasse für Speicher-Backends der Probe-Ergebnisse"""
+
+    def append(self, result):
+        raise NotImplementedError
+
+    def iter_results(self, since=None):
+        """Liefert Ergebnisse in zeitlicher Reihenfolge (optional ab Epoch `since`)"""
+        raise NotImplementedError
+
+    def load_all(self):
+        return list(self.iter_results())
+
+    def close(self):
+        pass
+
+    def iter_timed(self, since=None):
+        """Wie iter_results, liefert aber (epoch, ergebnis) Paare"""
+        for r in self.iter_results(since):
+            try:
+                yield parse_timestamp(r["timestamp"]), r
+            except Exception:
+                continue
+
+    # --- Abfragen für das Dashboard ---
+    # Die Basisklasse rechnet über die Historie, Backends mit Index überschreiben diese.
+
+    def summary(self, since):
+        """Kennzahlen für /api/stats"""
+        total, recent, last = 0, 0, ""
+        wifi_counts, speeds = [], []
+        for ts, r in self.iter_timed():
+            total += 1
+            last = r["timestamp"]
+            if ts <= since:
+                continue
+            recent += 1
+            if "wifi_scan" in r:
+                wifi_counts.append(r["wifi_scan"].get("networks_found", 0))
+            st = r.get("speedtest", {})
+            if "download_mbps" in st:
+                speeds.append(st["download_mbps"])
+        return {
+            "total_probes": total,
+            "probes_in_window": recent,
+            "avg_wifi_networks": sum(wifi_counts) / len(wifi_counts) if wifi_counts else 0,
+            "avg_download_speed": sum(speeds) / len(speeds) if speeds else 0,
+            "last_probe": last
+        }
+
+    def version(self):
+        """Kennung des Datenstands, ändert sich mit jedem neuen/entfernten Ergebnis (für ETags)"""
+        count, last = 0, None
+        for ts, _ in self.iter_timed():
+            count += 1
+            last = ts
+        return f"{count}-{last}"
+
+    def speedtest_series(self, since):
+        """[(timestamp, download_mbps, upload_mbps), ...]"""
+        rows = []
+        for ts, r in self.iter_timed(since):
+            st = r.get("speedtest", {})
+            if ts > since and "download_mbps" in st:
+                rows.append((r["timestamp"], st["download_mbps"], st.get("upload_mbps", 0)))
+        return rows
+
+    def bufferbloat_series(self, since):
+        """[(timestamp, {idle_ms, download_ms, upload_ms, added_ms}, note), ...] aus Speedtests mit Last-Latenz"""
+        rows = []
+        for ts, r in self.iter_timed(since):
+            st = r.get("speedtest", {})
+            if ts > since and st.get("loaded_latency"):
+                rows.append((r["timestamp"], bufferbloat_values(st), st["loaded_latency"].get("grade")))
+        return rows
+
+    def wifi_series(self, since):
+        """[(timestamp, networks_found), ...] - nur Ergebnisse mit Scan"""
+        return [(r["timestamp"], r["wifi_scan"].get("networks_found", 0))
+                for ts, r in self.iter_timed(since) if ts > since and "wifi_scan" in r]
+
+    def ping_series(self, since, field="avg_ms"):
+        """[(timestamp, {ziel: wert}), ...] - nur erfolgreiche Pings (Paketverlust auch bei Ausfall)"""
+        rows = []
+        for ts, r in self.iter_timed(since):
+            if ts <= since:
+                continue
+            values = {name: p[field] for name, p in r.get("ping", {}).items()
+                      if isinstance(p, dict) and (p.get("success") or field == "loss_pct")
+                      and p.get(field) is not None}
+            if values:
+                rows.append((r["timestamp"], values))
+        return rows
+
+    def probe_health(self, since):
+        """[(timestamp, ping_ok, speedtest_failed), ...] für die Ausfallerkennung
+
+        ping_ok ist None bei Ergebnissen ohne Ping (z.B. reiner Speedtest-Job),
+        Ergebnisse ohne Ping und Speedtest werden ausgelassen.
+        """
+        rows = []
+        for ts, r in self.iter_timed(since):
+            if ts <= since or ("ping" not in r and "speedtest" not in r):
+                continue
+            ping_ok = None
+            if "ping" in r:
+                ping_ok = any(p.get("success", False) for p in r["ping"].values() if isinstance(p, dict))
+            rows.append((r["timestamp"], ping_ok, "error" in r.get("speedtest", {})))
+        return rows
+
+    def network_summary(self, since):
+        """Aggregat pro SSID: first/last seen, max_signal, encryption, count, AP-Anzahl und Bänder"""
+        networks = {}
+        for ts, r in self.iter_timed(since):
+            if ts < since:
+                continue
+            seen = set()
+            for net in r.get("wifi_scan", {}).get("networks", []):
+                ssid = net.get("essid", "")
+                if not ssid:
+                    continue
+                if ssid not in networks:
+                    networks[ssid] = {
+                        "ssid": ssid,
+                        "first_seen": r["timestamp"],
+                        "last_seen": r["timestamp"],
+                        "max_signal": net.get("signal", -100),
+                        "encryption": net.get("encryption", "Unknown"),
+                        "count": 0,
+                        "_aps": {}
+                    }
+                entry = networks[ssid]
+                entry["last_seen"] = r["timestamp"]
+                if ssid not in seen:
+                    # count = Anzahl Scans, in denen die SSID auftauchte (nicht BSSID-Zeilen)
+                    entry["count"] += 1
+                    seen.add(ssid)
+                if net.get("signal", -100) > entry["max_signal"]:
+                    entry["max_signal"] = net.get("signal", -100)
+                if net.get("bssid"):
+                    entry["_aps"][net["bssid"]] = network_band(net)
+        return [finish_network_summary(entry) for entry in networks.values()]
+
+
+def finish_network_summary(entry):
+    """AP-Anzahl und Bandverteilung aus den gesammelten BSSIDs einer SSID"""
+    aps = entry.pop("_aps")
+    bands = {}
+    for band in aps.values():
+        band = band or "unbekannt"
+        bands[band] = bands.get(band, 0) + 1
+    entry["ap_count"] = len(aps)
+    entry["bands"] = bands
+    return entry
+
+
+class JsonFileStore(ResultStore):
+    """Bisheriges Format: ein JSON-Dokument mit `probe_results`"""
+
+    def __init__(self, path, max_results=1000):
+        self.path = path
+        self.max_results = max_results
+
+    def _load(self):
+        if not Path(self.path).exists():
+            return {"probe_results": []}
+        with open(self.path, 'r') as f:
+            return json.load(f)
+
+    def append(self, result):
+        data = self._load()
+        data["probe_results"].append(result)
+        if len(data["probe_results"]) > self.max_results:
+            data["probe_results"] = data["probe_results"][-self.max_results:]
+        atomic_write_json(self.path, data, indent=2)
+
+    def iter_results(self, since=None):
+        for r in self._load().get("probe_results", []):
+            if since is not None:
+                try:
+                    if parse_timestamp(r["timestamp"]) < since:
+                        continue
+                except Exception:
+                    continue
+            yield r
+
+
+class SegmentedStore(ResultStore):
+    """Append-only JSON-Lines Log, aufgeteilt in Segmente
+
+    Jedes Ergebnis wird als eine Zeile mit einem einzigen write() angehängt.
+    Segmente werden nach Größe oder Alter rotiert, für die Retention werden
+    nur ganze alte Segmente gelöscht - bestehende Daten werden nie neu geschrieben.
+    `max_results` zählt alle Zeilen einschließlich des aktiven Segments; das
+    älteste Segment fällt weg, sobald der Rest allein das Limit erreicht.
+    """
+
+    def __init__(self, directory, max_results=1000, segment_max_bytes=4 * 1024 * 1024,
+                 segment_max_seconds=86400, retention_days=None, fsync=True):
+        self.directory = Path(directory)
+        self.max_results = max_results
+        self.segment_max_bytes = segment_max_bytes
+        self.segment_max_seconds = segment_max_seconds
+        self.retention_days = retention_days
+        self.fsync = fsync
+        self._fd = None
+        self._active = None
+        self._line_counts = {}
+        self._active_lines = 0
+        self._closed_lines = 0
+        self._oldest_lines = None
+
+    # --- Segment-Verwaltung ---
+
+    def segment_files(self):
+        """Alle Segmente, ältestes zuerst"""
+        if not self.directory.exists():
+            return []
+        return sorted(self.directory.glob(f"{SEGMENT_PREFIX}*{SEGMENT_SUFFIX}"))
+
+    @staticmethod
+    def segment_start(path):
+        """Startzeit (Epoch) eines Segments aus dem Dateinamen"""
+        return int(path.name[len(SEGMENT_PREFIX):-len(SEGMENT_SUFFIX)].split("-")[0])
+
+    def _segment_path(self, start):
+        # Sequenz-Suffix verhindert Kollisionen bei mehreren Rotationen pro Sekunde
+        seq = 0
+        while True:
+            path = self.directory / f"{SEGMENT_PREFIX}{int(start):012d}-{seq:03d}{SEGMENT_SUFFIX}"
+            if not path.exists():
+                return path
+            seq += 1
+
+    def _open_active(self):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        segments = self.segment_files()
+        if segments:
+            self._active = segments[-1]
+            self._repair_tail(self._active)
+        else:
+            self._active = self._segment_path(time.time())
+        self._fd = os.open(self._active, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        with open(self._active, 'rb') as f:
+            self._active_lines = sum(1 for _ in f)
+        self._apply_retention()
+
+    @staticmethod
+    def _repair_tail(path):
+        """Schneidet eine durch Absturz abgebrochene letzte Zeile ab"""
+        size = path.stat().st_size
+        if size == 0:
+            return
+        with open(path, 'rb+') as f:
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) == b"\n":
+                return
+            # Rückwärts bis zum letzten vollständigen Zeilenende suchen
+            pos = size
+            while pos > 0:
+                step = min(4096, pos)
+                pos -= step
+                f.seek(pos)
+                chunk = f.read(step)
+                idx = chunk.rfind(b"\n")
+                if idx != -1:
+                    f.truncate(pos + idx + 1)
+                    return
+            f.truncate(0)
+
+    def _should_rotate(self):
+        st = os.fstat(self._fd)
+        if st.st_size == 0:
+            return False
+        if st.st_size >= self.segment_max_bytes:
+            return True
+        return time.time() - self.segment_start(self._active) >= self.segment_max_seconds
+
+    def _rotate(self):
+        os.close(self._fd)
+        self._active = self._segment_path(time.time())
+        self._fd = os.open(self._active, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        self._active_lines = 0
+        self._apply_retention()
+
+    def _count_lines(self, path):
+        # Abgeschlossene Segmente ändern sich nicht mehr, Zählung daher cachen
+        if path not in self._line_counts:
+            with open(path, 'rb') as f:
+                self._line_counts[path] = sum(1 for _ in f)
+        return self._line_counts[path]
+
+    def _apply_retention(self):
+        """Löscht alte Segmente, solange die Limits auch ohne sie erfüllt sind"""
+        closed = [p for p in self.segment_files() if p != self._active]
+        if self.retention_days:
+            cutoff = time.time() - self.retention_days * 86400
+            # Ein Segment ist komplett alt, wenn bereits das nächste vor dem Cutoff beginnt
+            segments = closed + [self._active]
+            for path, nxt in zip(segments, segments[1:]):
+                if self.segment_start(nxt) < cutoff and path in closed:
+                    path.unlink(missing_ok=True)
+                    self._line_counts.pop(path, None)
+                    closed.remove(path)
+
+        if self.max_results:
+            total = sum(self._count_lines(p) for p in closed) + self._active_lines
+            while closed and total - self._count_lines(closed[0]) >= self.max_results:
+                path = closed.pop(0)
+                total -= self._count_lines(path)
+                path.unlink(missing_ok=True)
+                self._line_counts.pop(path, None)
+            # append() prüft erst wieder, wenn das älteste Segment entfallen kann
+            self._closed_lines = total - self._active_lines
+            self._oldest_lines = self._count_lines(closed[0]) if closed else None
+
+    # --- ResultStore API ---
+
+    def append(self, result):
+        if self._fd is None:
+            self._open_active()
+        elif self._should_rotate():
+            self._rotate()
+        line = (json.dumps(result, separators=(",", ":")) + "\n").encode("utf-8")
+        os.write(self._fd, line)
+        if self.fsync:
+            os.fsync(self._fd)
+        self._active_lines += 1
+        if self._oldest_lines is not None and \
+                self._closed_lines + self._active_lines - self._oldest_lines >= self.max_results:
+            self._apply_retention()
+
+    def iter_results(self, since=None):
+        segments = self.segment_files()
+        for i, path in enumerate(segments):
+            # Segmente überspringen, die komplett vor `since` liegen
+            if since is not None and i + 1 < len(segments) and self.segment_start(segments[i + 1]) <= since:
+                continue
+            try:
+                with open(path, 'rb') as f:
+                    for raw in f:
+                        if not raw.endswith(b"\n"):
+                            break  # unvollständige Zeile eines laufenden Schreibvorgangs
+                        try:
+                            r = json.loads(raw)
+                        except ValueError:
+                            continue
+                        if since is not None:
+                            try:
+                                if parse_timestamp(r["timestamp"]) < since:
+                                    continue
+                            except Exception:
+                                continue
+                        yield r
+            except FileNotFoundError:
+                continue  # durch Retention gelöscht während wir lesen
+
+    def import_results(self, results):
+        """Schreibt eine Liste historischer Ergebnisse als neues Segment (atomar)"""
+        results = [r for r in results if "timestamp" in r]
+        if not results:
+            return 0
+        self.directory.mkdir(parents=True, exist_ok=True)
+        try:
+            start = parse_timestamp(results[0]["timestamp"])
+        except Exception:
+            start = 0
+        path = self._segment_path(start)
+        tmp_path = path.with_suffix(".tmp")
+        with open(tmp_path, 'w') as f:
+            for r in results:
+                f.write(json.dumps(r, separators=(",", ":")) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+        if self._fd is not None:
+            self._apply_retention()
+        return len(results)
+
+    def close(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+
+def migrate_legacy_file(legacy_file, store):
+    """Überführt das alte `probe_results` JSON-Dokument in den neuen Store
+
+    Die alte Datei wird danach in `<name>.migrated` umbenannt, damit die
+    Migration nur einmal läuft.
+    """
+    legacy = Path(legacy_file)
+    if not legacy.exists():
+        return 0
+    with open(legacy, 'r') as f:
+        data = json.load(f)
+    count = store.import_results(data.get("probe_results", []))
+    os.replace(legacy, legacy.with_name(legacy.name + ".migrated"))
+    return count
+
+
+def open_store(config, migrate=False):
+    """Erzeugt das in der Konfiguration gewählte Storage-Backend"""
+    storage = config.get("storage", {})
+    max_results = config.get("general", {}).get("max_stored_results", 1000)
+    backend = storage.get("backend", "segmented")
+
+    if backend == "json":
+        return JsonFileStore(storage.get("legacy_file", "/home/azubi/wifi_probe_results.json"), max_results)
+    if backend == "segmented":
+        store = SegmentedStore(
+            storage.get("path", "/home/azubi/wifi_probe_results"),
+            max_results=max_results,
+            segment_max_bytes=storage.get("segment_max_bytes", 4 * 1024 * 1024),
+            segment_max_seconds=storage.get("segment_max_seconds", 86400),
+            retention_days=storage.get("retention_days"),
+            fsync=storage.get("fsync", True)
+        )
+        if migrate and storage.get("legacy_file") and not store.segment_files():
+            migrate_legacy_file(storage["legacy_file"], store)
+        return store
+    if backend == "sqlite":
+        from sqlite_store import SQLiteStore
+        store = SQLiteStore(storage.get("sqlite_path", "/home/azubi/wifi_probe_results.sqlite"), max_results=max_results)
+        if migrate and store.is_empty():
+            # Bestehende Historie übernehmen: erst Segmente, sonst altes JSON-Dokument
+            segments = SegmentedStore(storage.get("path", "/home/azubi/wifi_probe_results"))
+            if segments.segment_files():
+                store.import_results(segments.iter_results())
+            elif storage.get("legacy_file"):
+                migrate_legacy_file(storage["legacy_file"], store)
+        return store
+    raise ValueError(f"Unbekanntes Storage-Backend: {backend}")
@@ -0,0 +1,331 @@
+#!/usr/bin/env python3
+import json
+import math
+import time
+from datetime import datetime
+from pathlib import Path
+from result_store import parse_timestamp, network_band, network_channel, bufferbloat_values, PING_FIELDS
+from latency_engine import percentile
+from sqlite_store import ThreadConnections
+
+# Auflösungen der Rollups, feinste zuerst
+RESOLUTIONS = [("1m", 60), ("5m", 300), ("1h", 3600), ("1d", 86400)]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS rollups (
+    metric TEXT NOT NULL,
+    res INTEGER NOT NULL,
+    bucket INTEGER NOT NULL,
+    count INTEGER NOT NULL,
+    total REAL NOT NULL,
+    min REAL NOT NULL,
+    max REAL NOT NULL,
+    p95 REAL NOT NULL,
+    samples TEXT,
+    PRIMARY KEY (metric, res, bucket)
+);
+-- Nur die offenen Buckets (mit Einzelwerten), damit das Abschließen keinen Bereich durchsucht
+CREATE INDEX IF NOT EXISTS rollups_open ON rollups (metric, res, bucket) WHERE samples IS NOT NULL;
+CREATE TABLE IF NOT EXISTS bssid_hourly (
+    bssid TEXT NOT NULL,
+    bucket INTEGER NOT NULL,
+    essid TEXT,
+    channel INTEGER,
+    band TEXT,
+    count INTEGER NOT NULL,
+    total REAL NOT NULL,
+    min REAL NOT NULL,
+    max REAL NOT NULL,
+    PRIMARY KEY (bssid, bucket)
+);
+CREATE TABLE IF NOT EXISTS scan_hourly (
+    bucket INTEGER PRIMARY KEY,
+    scans INTEGER NOT NULL
+);
+"""
+
+BSSID_RES = 3600
+
+
+def bucket_start(ts, res):
+    """Bucket-Beginn in lokaler Zeit, damit Tages-Buckets um Mitternacht beginnen"""
+    offset = time.localtime(ts).tm_gmtoff
+    return int((ts + offset) // res * res - offset)
+
+
+def extract_metrics(result):
+    """Zerlegt ein Probe-Ergebnis in (metrik, wert) Paare"""
+    metrics = []
+    st = result.get("speedtest", {})
+    if "download_mbps" in st:
+        metrics.append(("speedtest.download_mbps", st["download_mbps"]))
+        metrics.append(("speedtest.upload_mbps", st.get("upload_mbps", 0)))
+    for key, value in bufferbloat_values(st).items():
+        metrics.append((f"bufferbloat.{key}", value))
+    for name, p in result.get("ping", {}).items():
+        if not isinstance(p, dict):
+            continue
+        if p.get("success"):
+            metrics.append((f"ping.{name}", p.get("avg_ms", 0)))
+            for field in PING_FIELDS:
+                if field not in ("avg_ms", "loss_pct") and field in p:
+                    metrics.append((f"ping.{name}.{field}", p[field]))
+        if "loss_pct" in p:
+            metrics.append((f"ping.{name}.loss_pct", p["loss_pct"]))
+    if "wifi_scan" in result:
+        metrics.append(("wifi.networks_found", result["wifi_scan"].get("networks_found", 0)))
+        if "bssids_found" in result["wifi_scan"]:
+            metrics.append(("wifi.bssids_found", result["wifi_scan"]["bssids_found"]))
+    return metrics
+
+
+def extract_bssids(result):
+    """{bssid: (essid, kanal, band, signal)} eines Scans, pro BSSID das stärkste Signal"""
+    bssids = {}
+    for net in result.get("wifi_scan", {}).get("networks", []):
+        bssid = net.get("bssid")
+        signal = net.get("signal")
+        if not bssid or signal is None:
+            continue
+        if bssid not in bssids or signal > bssids[bssid][3]:
+            bssids[bssid] = (net.get("essid", ""), network_channel(net), network_band(net), float(signal))
+    return bssids
+
+
+class RollupStore:
+    """Vorab aggregierte min/avg/max/p95/count Buckets in mehreren Auflösungen
+
+    Wird beim Schreiben jedes Ergebnisses fortgeschrieben. Für den jeweils
+    offenen Bucket werden die Einzelwerte mitgeführt (in SQL angehängt, ohne
+    sie zu parsen), sein p95 rechnet series() beim Lesen. Sobald ein neuerer
+    Bucket beginnt, wird das p95 des alten einmal berechnet und die
+    Einzelwerte werden verworfen - ein Insert kostet so unabhängig von der
+    Bucket-Größe gleich viel.
+    """
+
+    def __init__(self, path):
+        self.path = str(path)
+        self._connections = ThreadConnections(self.path)
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        self.conn.executescript(SCHEMA)
+
+    @property
+    def conn(self):
+        return self._connections.get()
+
+    def close(self):
+        self._connections.close()
+
+    def is_empty(self):
+        return self.conn.execute("SELECT 1 FROM rollups LIMIT 1").fetchone() is None
+
+    def needs_rebuild(self):
+        """Leer, oder Scans vorhanden, aber die BSSID-Tabellen (neuer) noch nie befüllt"""
+        conn = self.conn
+        if self.is_empty():
+            return True
+        has_scans = conn.execute("SELECT 1 FROM rollups WHERE metric = 'wifi.networks_found' LIMIT 1").fetchone()
+        return has_scans is not None and conn.execute("SELECT 1 FROM scan_hourly LIMIT 1").fetchone() is None
+
+    def _add(self, conn, metric, ts, value):
+        for _, res in RESOLUTIONS:
+            bucket = bucket_start(ts, res)
+            # Einzelwert an das JSON-Array anhängen; Nachzügler in einen abgeschlossenen
+            # Bucket (samples NULL): p95 bleibt als Näherung stehen
+            updated = conn.execute(
+                "UPDATE rollups SET count = count + 1, total = total + ?, min = MIN(min, ?), max = MAX(max, ?), "
+                "samples = CASE WHEN samples IS NULL THEN NULL "
+                "ELSE substr(samples, 1, length(samples) - 1) || ',' || ? || ']' END "
+                "WHERE metric = ? AND res = ? AND bucket = ?",
+                (value, value, value, repr(value), metric, res, bucket)
+            ).rowcount
+            if updated:
+                continue
+            # Ältere Buckets sind abgeschlossen: p95 einmal festschreiben, Einzelwerte verwerfen
+            closed = conn.execute(
+                "SELECT bucket, samples FROM rollups WHERE metric = ? AND res = ? AND bucket < ? AND samples IS NOT NULL",
+                (metric, res, bucket)
+            ).fetchall()
+            conn.executemany(
+                "UPDATE rollups SET p95 = ?, samples = NULL WHERE metric = ? AND res = ? AND bucket = ?",
+                [(percentile(json.loads(samples), 95), metric, res, old) for old, samples in closed]
+            )
+            conn.execute(
+                "INSERT INTO rollups (metric, res, bucket, count, total, min, max, p95, samples) "
+                "VALUES (?, ?, ?, 1, ?, ?, ?, ?, ?)",
+                (metric, res, bucket, value, value, value, value, json.dumps([value]))
+            )
+
+    def _add_scan(self, conn, ts, result):
+        """Stunden-Aggregat pro BSSID fortschreiben, plus Anzahl Scans für die Präsenzquote"""
+        if "wifi_scan" not in result:
+            return
+        bucket = bucket_start(ts, BSSID_RES)
+        conn.execute(
+            "INSERT INTO scan_hourly (bucket, scans) VALUES (?, 1) "
+            "ON CONFLICT(bucket) DO UPDATE SET scans = scans + 1",
+            (bucket,)
+        )
+        conn.executemany(
+            "INSERT INTO bssid_hourly (bssid, bucket, essid, channel, band, count, total, min, max) "
+            "VALUES (?, ?, ?, ?, ?, 1, ?, ?, ?) "
+            "ON CONFLICT(bssid, bucket) DO UPDATE SET essid = excluded.essid, channel = excluded.channel, "
+            "band = excluded.band, count = count + 1, total = total + excluded.total, "
+            "min = MIN(min, excluded.min), max = MAX(max, excluded.max)",
+            [(bssid, bucket, essid, channel, band, signal, signal, signal)
+             for bssid, (essid, channel, band, signal) in extract_bssids(result).items()]
+        )
+
+    def add_result(self, result):
+        """Schreibt alle Metriken eines Probe-Ergebnisses in die Rollups"""
+        ts = parse_timestamp(result["timestamp"])
+        conn = self.conn
+        with conn:
+            for metric, value in extract_metrics(result):
+                # NaN/inf wären in den Einzelwerten kein gültiges JSON
+                if value is not None and math.isfinite(float(value)):
+                    self._add(conn, metric, ts, float(value))
+            self._add_scan(conn, ts, result)
+
+    def rebuild(self, results):
+        """Baut die Rollups aus einer bestehenden Historie neu auf"""
+        # Erst im Speicher sammeln, dann in einem Rutsch schreiben
+        buckets = {}
+        scans = {}
+        aps = {}
+        for r in results:
+            try:
+                ts = parse_timestamp(r["timestamp"])
+            except Exception:
+                continue
+            for metric, value in extract_metrics(r):
+                if value is None:
+                    continue
+                for _, res in RESOLUTIONS:
+                    buckets.setdefault((metric, res, bucket_start(ts, res)), []).append(float(value))
+            if "wifi_scan" in r:
+                bucket = bucket_start(ts, BSSID_RES)
+                scans[bucket] = scans.get(bucket, 0) + 1
+                for bssid, (essid, channel, band, signal) in extract_bssids(r).items():
+                    ap = aps.get((bssid, bucket))
+                    if ap is None:
+                        aps[(bssid, bucket)] = [essid, channel, band, 1, signal, signal, signal]
+                    else:
+                        ap[:3] = essid, channel, band
+                        ap[3] += 1
+                        ap[4] += signal
+                        ap[5] = min(ap[5], signal)
+                        ap[6] = max(ap[6], signal)
+
+        latest = {}
+        for metric, res, bucket in buckets:
+            latest[(metric, res)] = max(bucket, latest.get((metric, res), bucket))
+
+        rows = []
+        for (metric, res, bucket), values in buckets.items():
+            samples = json.dumps(values) if latest[(metric, res)] == bucket else None
+            rows.append((metric, res, bucket, len(values), sum(values), min(values), max(values),
+                         percentile(values, 95), samples))
+
+        conn = self.conn
+        with conn:
+            conn.execute("DELETE FROM rollups")
+            conn.executemany(
+                "INSERT INTO rollups (metric, res, bucket, count, total, min, max, p95, samples) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                rows
+            )
+            conn.execute("DELETE FROM scan_hourly")
+            conn.executemany("INSERT INTO scan_hourly (bucket, scans) VALUES (?, ?)", scans.items())
+            conn.execute("DELETE FROM bssid_hourly")
+            conn.executemany(
+                "INSERT INTO bssid_hourly (bssid, bucket, essid, channel, band, count, total, min, max) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [(bssid, bucket, *ap) for (bssid, bucket), ap in aps.items()]
+            )
+
+    def prune(self, keep_seconds=None, bssid_keep_seconds=90 * 86400):
+        """Entfernt feine Buckets, die für lange Fenster ohnehin nicht mehr abgefragt werden"""
+        keep_seconds = keep_seconds or {60: 7 * 86400, 300: 60 * 86400}
+        now = time.time()
+        with self.conn as conn:
+            for res, keep in keep_seconds.items():
+                conn.execute("DELETE FROM rollups WHERE res = ? AND bucket < ?", (res, now - keep))
+            # Pro BSSID und Stunde eine Zeile, das wächst mit der Zahl der APs
+            conn.execute("DELETE FROM bssid_hourly WHERE bucket < ?", (now - bssid_keep_seconds,))
+            conn.execute("DELETE FROM scan_hourly WHERE bucket < ?", (now - bssid_keep_seconds,))
+
+    # --- Abfragen ---
+
+    def count(self, metric, since):
+        """Anzahl Rohwerte im Fenster (über die Stunden-Buckets, daher billig)"""
+        row = self.conn.execute(
+            "SELECT SUM(count) FROM rollups WHERE metric = ? AND res = 3600 AND bucket >= ?",
+            (metric, bucket_start(since, 3600))
+        ).fetchone()
+        return row[0] or 0
+
+    def series(self, metric, res, since):
+        """{bucket: (avg, min, max, p95, count)} für eine Metrik, p95 des offenen Buckets aus den Einzelwerten"""
+        return {
+            bucket: (total / count, vmin, vmax, p95 if samples is None else percentile(json.loads(samples), 95), count)
+            for bucket, count, total, vmin, vmax, p95, samples in self.conn.execute(
+                "SELECT bucket, count, total, min, max, p95, samples FROM rollups "
+                "WHERE metric = ? AND res = ? AND bucket >= ? ORDER BY bucket",
+                (metric, res, bucket_start(since, res))
+            )
+        }
+
+    def bssids(self, since):
+        """Pro BSSID min/avg/max Signal, letzter Kanal/Band/SSID und Präsenzquote im Fenster
+
+        Präsenz = Anzahl Scans mit dieser BSSID / Anzahl Scans insgesamt, beides
+        auf volle Stunden gerundet, damit Zähler und Nenner dasselbe Fenster haben.
+        """
+        start = bucket_start(since, BSSID_RES)
+        conn = self.conn
+        scans = conn.execute("SELECT SUM(scans) FROM scan_hourly WHERE bucket >= ?", (start,)).fetchone()[0] or 0
+        rows = conn.execute(
+            "WITH agg AS (SELECT bssid, MAX(bucket) AS last, SUM(count) AS count, SUM(total) AS total, "
+            "MIN(min) AS min, MAX(max) AS max FROM bssid_hourly WHERE bucket >= ? GROUP BY bssid) "
+            "SELECT agg.bssid, h.essid, h.channel, h.band, agg.count, agg.total, agg.min, agg.max, agg.last "
+            "FROM agg JOIN bssid_hourly h ON h.bssid = agg.bssid AND h.bucket = agg.last",
+            (start,)
+        )
+        return [
+            {
+                "bssid": bssid,
+                "ssid": essid,
+                "channel": channel,
+                "band": band,
+                "min_signal": vmin,
+                "avg_signal": round(total / count, 1),
+                "max_signal": vmax,
+                "seen": count,
+                "presence": round(min(count / scans, 1.0), 3) if scans else 0,
+                "last_seen_hour": bucket_label(last)
+            }
+            for bssid, essid, channel, band, count, total, vmin, vmax, last in rows
+        ]
+
+    def metrics(self, prefix=""):
+        return [m for (m,) in self.conn.execute(
+            "SELECT DISTINCT metric FROM rollups WHERE metric LIKE ? AND res = 86400", (prefix + "%",)
+        )]
+
+
+def pick_resolution(window_seconds, budget):
+    """Feinste Auflösung, bei der das Fenster unter dem Punkte-Budget bleibt"""
+    for name, res in RESOLUTIONS:
+        if window_seconds / res <= budget:
+            return name, res
+    return RESOLUTIONS[-1]
+
+
+def bucket_label(bucket):
+    return datetime.fromtimestamp(bucket).isoformat()
+
+
+def open_rollups(config):
+    storage = config.get("storage", {})
+    return RollupStore(storage.get("rollup_path", "/home/azubi/wifi_rollups.sqlite"))
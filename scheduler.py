@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+import random
+import threading
+import time
+
+
+class Job:
+    """Ein periodischer Messauftrag mit eigenem Intervall und Jitter
+
+    Die Startzeiten liegen auf einem festen Raster (start + n * interval) auf der
+    monotonen Uhr; die Laufzeit eines Durchlaufs verschiebt das Raster nicht.
+    Der Jitter wird pro Durchlauf neu gewürfelt und nicht aufaddiert.
+    """
+
+    def __init__(self, name, func, interval, jitter=0, first_delay=0):
+        self.name = name
+        self.func = func
+        self.interval = max(float(interval), 1.0)
+        self.jitter = max(float(jitter), 0.0)
+        self.first_delay = max(float(first_delay), 0.0)
+        self.slot = None      # nominelle Startzeit des nächsten Durchlaufs
+        self.due = None       # slot + Jitter
+        self.waiting_since = None
+        self.running = False
+        self.runs = 0
+        self.failures = 0
+        self.skipped = 0      # ausgelassene Slots, weil ein Durchlauf länger als das Intervall dauerte
+        self.deferred = 0     # Starts, die wegen eines Ausschlusses warten mussten
+        self.last_duration = None
+        self.last_error = None
+        self.triggers = []    # Callbacks für den nächsten Start (trigger)
+        self.waiters = []     # Callbacks des laufenden Durchlaufs
+
+    def plan(self, slot):
+        self.slot = slot
+        self.due = slot + (random.uniform(0, self.jitter) if self.jitter else 0)
+
+    def advance(self, now):
+        """Nächsten Slot auf dem Raster wählen, verpasste Slots überspringen statt nachzuholen"""
+        slot = self.slot + self.interval
+        if slot <= now:
+            missed = int((now - slot) // self.interval) + 1
+            self.skipped += missed
+            slot += missed * self.interval
+        self.plan(slot)
+
+    def stats(self):
+        return {
+            "interval_seconds": self.interval,
+            "jitter_seconds": self.jitter,
+            "running": self.running,
+            "runs": self.runs,
+            "failures": self.failures,
+            "skipped_slots": self.skipped,
+            "deferred": self.deferred,
+            "last_duration_seconds": round(self.last_duration, 3) if self.last_duration is not None else None,
+            "last_error": self.last_error
+        }
+
+
+class Scheduler:
+    """Führt Jobs unabhängig voneinander in eigenen Threads aus
+
+    Ausschlussregeln (`exclude("speedtest", "ping")`) verhindern, dass zwei Jobs
+    gleichzeitig laufen, z.B. keine Latenzmessung während der Speedtest die
+    Leitung auslastet. Ein fälliger, blockierter Job wartet, bis die
+    Gegenseite fertig ist; später fällige Jobs derselben Regel dürfen ihn dabei
+    nicht überholen, damit ein häufiger Ping den Speedtest nicht aushungert.
+    """
+
+    def __init__(self, logger=None, clock=time.monotonic, on_finish=None):
+        self.logger = logger
+        self.clock = clock
+        # Optionaler Hook on_finish(name, dauer, fehler) nach jedem Durchlauf
+        self.on_finish = on_finish
+        self.jobs = {}
+        self.conflicts = {}
+        # RLock: stop() darf aus einem Signal-Handler im Dispatcher-Thread kommen
+        self.cond = threading.Condition(threading.RLock())
+        self.stopped = False
+        self.threads = set()
+
+    def add(self, job):
+        self.jobs[job.name] = job
+        self.conflicts.setdefault(job.name, set())
+        return job
+
+    def exclude(self, *names):
+        """Die genannten Jobs laufen nie gleichzeitig (paarweise Ausschlüsse)"""
+        for a in names:
+            for b in names:
+                if a != b:
+                    self.conflicts.setdefault(a, set()).add(b)
+
+    def _blocked(self, job, waiting):
+        for other in self.conflicts.get(job.name, ()):
+            other_job = self.jobs.get(other)
+            if other_job is None:
+                continue
+            if other_job.running:
+                return True
+            # Früher fälliger Konkurrent hat Vorrang
+            if other_job in waiting and (other_job.due, other_job.name) < (job.due, job.name):
+                return True
+        return False
+
+    def trigger(self, name, callback=None):
+        """Job sofort einplanen, die Ausschlussregeln gelten weiter
+
+        `callback(ergebnis, fehler, dauer)` wird nach dem nächsten Durchlauf
+        aufgerufen, der nach diesem Aufruf beginnt. Läuft der Job gerade, folgt
+        direkt danach ein weiterer Durchlauf. Das Raster bleibt unverändert.
+        """
+        with self.cond:
+            if self.stopped:
+                raise RuntimeError("Scheduler ist gestoppt")
+            job = self.jobs.get(name)
+            if job is None:
+                raise KeyError(name)
+            if callback is not None:
+                job.triggers.append(callback)
+            if not job.running and job.due is not None:
+                job.due = min(job.due, self.clock())
+            self.cond.notify_all()
+
+    def _start(self, job):
+        job.running = True
+        job.waiting_since = None
+        job.waiters, job.triggers = job.triggers, []
+        thread = threading.Thread(target=self._run_job, args=(job,), name=f"job-{job.name}", daemon=True)
+        self.threads.add(thread)
+        thread.start()
+
+    def _run_job(self, job):
+        start = self.clock()
+        error = None
+        result = None
+        try:
+            result = job.func()
+        except Exception as e:
+            error = str(e)
+            if self.logger:
+                self.logger.error(f"Job {job.name} fehlgeschlagen: {e}")
+        duration = self.clock() - start
+        if self.on_finish is not None:
+            self.on_finish(job.name, duration, error)
+        with self.cond:
+            now = self.clock()
+            job.running = False
+            job.runs += 1
+            job.last_duration = duration
+            job.last_error = error
+            if error is not None:
+                job.failures += 1
+            if job.slot > now:
+                # Vorgezogener Durchlauf (trigger): der geplante Slot bleibt bestehen
+                job.plan(job.slot)
+            else:
+                job.advance(now)
+            if job.triggers:
+                job.due = now
+            waiters, job.waiters = job.waiters, []
+            self.threads.discard(threading.current_thread())
+            self.cond.notify_all()
+        for callback in waiters:
+            try:
+                callback(result, error, duration)
+            except Exception as e:
+                if self.logger:
+                    self.logger.error(f"Callback für Job {job.name} fehlgeschlagen: {e}")
+
+    def run(self):
+        """Dispatcher-Schleife, blockiert bis stop() aufgerufen wird"""
+        with self.cond:
+            now = self.clock()
+            for job in self.jobs.values():
+                job.plan(now + job.first_delay)
+                if job.triggers:
+                    job.due = now
+            while not self.stopped:
+                now = self.clock()
+                waiting = [j for j in self.jobs.values() if not j.running and j.due <= now]
+                for job in sorted(waiting, key=lambda j: (j.due, j.name)):
+                    if self._blocked(job, waiting):
+                        if job.waiting_since is None:
+                            job.waiting_since = now
+                            job.deferred += 1
+                        continue
+                    waiting.remove(job)
+                    self._start(job)
+                upcoming = [j.due for j in self.jobs.values() if not j.running and j.due > now]
+                # Blockierte Jobs weckt das Ende des laufenden Jobs (notify_all in _run_job)
+                self.cond.wait(min(upcoming) - now if upcoming else None)
+
+    def stop(self):
+        """Keine neuen Starts mehr, laufende Jobs werden nicht abgebrochen"""
+        with self.cond:
+            self.stopped = True
+            self.cond.notify_all()
+
+    def join(self, timeout=None):
+        """Auf noch laufende Jobs warten"""
+        with self.cond:
+            threads = list(self.threads)
+        for thread in threads:
+            thread.join(timeout)
+
+    def stats(self):
+        with self.cond:
+            now = self.clock()
+            return {
+                name: dict(job.stats(), next_run_in_seconds=round(max(job.due - now, 0), 1) if job.due else None)
+                for name, job in self.jobs.items()
+            }
+
+
+def schedule_from_config(config):
+    """[(name, intervall, jitter, verzögerung), ...] und Ausschlussgruppen aus dem Abschnitt `schedule`
+
+    Ohne eigenes Intervall gilt general.probe_interval_seconds wie beim alten seriellen Zyklus.
+    """
+    default_interval = config.get("general", {}).get("probe_interval_seconds", 300)
+    schedule = config.get("schedule", {})
+    jobs = []
+    for name in ("ping", "scan", "speedtest", "system_info"):
+        entry = schedule.get(name) or {}
+        if not entry.get("enabled", True):
+            continue
+        jobs.append((
+            name,
+            entry.get("interval_seconds") or default_interval,
+            entry.get("jitter_seconds", 0),
+            entry.get("first_delay_seconds", 0)
+        ))
+    return jobs, [tuple(group) for group in schedule.get("exclusive", [])]
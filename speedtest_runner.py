@@ -1,56 +1,457 @@
+import asyncio
 import subprocess
 import json
+import os
+import signal
+import threading
 import time
+import http.client
+import http.server
 from datetime import datetime
+from urllib.parse import urlsplit, parse_qs
+from latency_engine import LatencyEngine, interface_address, summarize_samples
+
+CHUNK_SIZE = 64 * 1024
+BULK_CHUNK = b"\x00" * CHUNK_SIZE
+# Zusätzliche Latenz unter Last (Median, ms) -> Note, wie bei gängigen Bufferbloat-Tests
+BUFFERBLOAT_GRADES = ((5, "A+"), (30, "A"), (60, "B"), (200, "C"), (400, "D"))
+# Unterhalb dieses Durchsatzes gilt beim speedtest-cli keine Phase als aktiv (Serverauswahl, Latenztest)
+CLI_PHASE_MIN_MBPS = 1.0
+
+
+class SpeedtestCancelled(Exception):
+    pass
+
+
+class ThroughputMeter:
+    """Zählt übertragene Bytes und liefert Durchsatz-Samples über die Zeit"""
 
-class SpeedTest:
     def __init__(self):
-        self.results = {}
-    
-    def run_command(self, cmd):
-        """Führe Shell-Kommando aus"""
+        self.lock = threading.Lock()
+        self.total = 0
+        self.start = time.monotonic()
+        self.last_total = 0
+        self.last_time = self.start
+        self.samples = []  # [[sekunden seit start, mbps], ...]
+
+    def add(self, nbytes):
+        with self.lock:
+            self.total += nbytes
+
+    def sample(self):
+        """[sekunden, mbps] seit dem letzten Sample, wird an samples angehängt"""
+        now = time.monotonic()
+        with self.lock:
+            delta, self.last_total = self.total - self.last_total, self.total
+        elapsed, self.last_time = now - self.last_time, now
+        mbps = round(delta * 8 / elapsed / 1_000_000, 2) if elapsed > 0 else 0.0
+        self.samples.append([round(now - self.start, 2), mbps])
+        return self.samples[-1]
+
+    def mean_mbps(self):
+        elapsed = self.last_time - self.start
+        return round(self.total * 8 / elapsed / 1_000_000, 2) if elapsed > 0 else 0.0
+
+
+class InterfaceCounterMeter(ThroughputMeter):
+    """Meter auf Basis der Kernel-Zähler (/sys/class/net/<if>/statistics) für externe Programme"""
+
+    def __init__(self, interface, counter):
+        super().__init__()
+        self.path = f"/sys/class/net/{interface}/statistics/{counter}"
+        self.base = self._read()
+
+    def _read(self):
+        try:
+            with open(self.path, "r") as f:
+                return int(f.read())
+        except (OSError, ValueError):
+            return None
+
+    def sample(self):
+        value = self._read()
+        if value is not None and self.base is not None:
+            with self.lock:
+                self.total = value - self.base
+        return super().sample()
+
+
+class CliBackend:
+    """speedtest-cli als eigener Prozess (eigene Prozessgruppe, ohne Shell)
+
+    speedtest-cli meldet erst am Ende ein Ergebnis; die Samples über die Zeit
+    kommen aus den rx/tx-Zählern des Interfaces.
+    """
+
+    name = "speedtest-cli"
+
+    def __init__(self, command="speedtest-cli", server_id=None):
+        self.command = command
+        self.server_id = server_id
+
+    def run(self, test):
+        cmd = [self.command, "--json"]
+        source = test.source_address()
+        if source:
+            cmd += ["--source", source]
+        if self.server_id:
+            cmd += ["--server", str(self.server_id)]
+
+        download = InterfaceCounterMeter(test.interface, "rx_bytes")
+        upload = InterfaceCounterMeter(test.interface, "tx_bytes")
+        proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True,
+                                start_new_session=True)
+        try:
+            while True:
+                try:
+                    stdout, stderr = proc.communicate(timeout=test.sample_interval)
+                    break
+                except subprocess.TimeoutExpired:
+                    rx, tx = download.sample(), upload.sample()
+                    test.report("download", *rx)
+                    test.report("upload", *tx)
+                    # Aktive Phase aus der dominierenden Richtung ableiten (für die Latenz unter Last)
+                    if max(rx[1], tx[1]) < CLI_PHASE_MIN_MBPS:
+                        test.phase = None
+                    else:
+                        test.phase = "download" if rx[1] >= tx[1] else "upload"
+                    test.check()
+        finally:
+            terminate(proc)
+
+        if proc.returncode != 0:
+            raise RuntimeError(f"speedtest-cli Exit-Code {proc.returncode}: {stderr.strip()}")
+        data = json.loads(stdout)
+        return {
+            "download_mbps": round(data.get("download", 0) / 1_000_000, 2),
+            "upload_mbps": round(data.get("upload", 0) / 1_000_000, 2),
+            "ping_ms": data.get("ping", 0),
+            "server": data.get("server", {}).get("name", "Unbekannt"),
+            "isp": data.get("client", {}).get("isp", "Unbekannt"),
+            "download_samples": download.samples,
+            "upload_samples": upload.samples
+        }
+
+
+class HttpBackend:
+    """Bulk-Transfer gegen einen HTTP-Server (z.B. `speedtest_runner.py --serve`)
+
+    Download: GET <url>/download?bytes=N, Upload: chunked POST auf <url>/upload.
+    Jede Phase läuft `phase_seconds` mit `streams` parallelen Verbindungen.
+    """
+
+    name = "http"
+
+    def __init__(self, url, streams=4, phase_seconds=10):
+        parts = urlsplit(url)
+        self.url = url
+        self.scheme = parts.scheme or "http"
+        self.host = parts.hostname
+        self.port = parts.port or (443 if self.scheme == "https" else 80)
+        self.base_path = parts.path.rstrip("/")
+        self.streams = max(1, int(streams))
+        self.phase_seconds = phase_seconds
+
+    def _connection(self, test):
+        source = test.source_address()
+        cls = http.client.HTTPSConnection if self.scheme == "https" else http.client.HTTPConnection
+        return cls(self.host, self.port, timeout=test.sample_interval * 4,
+                   source_address=(source, 0) if source else None)
+
+    def _download(self, test, meter, deadline):
+        conn = self._connection(test)
+        try:
+            while time.monotonic() < deadline and not test.cancelled.is_set():
+                conn.request("GET", f"{self.base_path}/download?bytes={1 << 30}")
+                response = conn.getresponse()
+                while time.monotonic() < deadline and not test.cancelled.is_set():
+                    chunk = response.read1(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    meter.add(len(chunk))
+                else:
+                    # Abbruch mitten in der Antwort - Verbindung ist nicht wiederverwendbar
+                    return
+        finally:
+            conn.close()
+
+    def _upload(self, test, meter, deadline):
+        def body():
+            while time.monotonic() < deadline and not test.cancelled.is_set():
+                yield BULK_CHUNK
+                meter.add(CHUNK_SIZE)
+
+        conn = self._connection(test)
         try:
-            result = subprocess.run(cmd, shell=True, capture_output=True, text=True, timeout=60)
-            return result.stdout, result.stderr, result.returncode
+            conn.request("POST", f"{self.base_path}/upload", body=body(), encode_chunked=True,
+                         headers={"Content-Type": "application/octet-stream"})
+            conn.getresponse().read()
+        finally:
+            conn.close()
+
+    def _phase(self, test, phase, worker):
+        meter = ThroughputMeter()
+        deadline = min(time.monotonic() + self.phase_seconds, test.deadline)
+        errors = []
+
+        def run():
+            try:
+                worker(test, meter, deadline)
+            except (OSError, http.client.HTTPException) as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=run, name=f"speedtest-{phase}-{i}", daemon=True)
+                   for i in range(self.streams)]
+        test.phase = phase
+        for thread in threads:
+            thread.start()
+        while any(t.is_alive() for t in threads):
+            test.cancelled.wait(test.sample_interval)
+            test.report(phase, *meter.sample())
+            if test.cancelled.is_set():
+                break
+        for thread in threads:
+            thread.join(test.sample_interval * 4)
+        test.phase = None
+        test.check()
+        if errors and not meter.total:
+            raise RuntimeError(f"{phase} fehlgeschlagen: {errors[0]}")
+        return meter
+
+    def run(self, test):
+        ping_ms = None
+        if test.latency is not None:
+            rtt = test.latency.ping(f"{self.host}:{self.port}")
+            ping_ms = rtt["avg_ms"] if rtt.get("success") else None
+        download = self._phase(test, "download", self._download)
+        upload = self._phase(test, "upload", self._upload)
+        return {
+            "download_mbps": download.mean_mbps(),
+            "upload_mbps": upload.mean_mbps(),
+            "ping_ms": ping_ms,
+            "server": self.url,
+            "isp": None,
+            "download_samples": download.samples,
+            "upload_samples": upload.samples
+        }
+
+
+def bufferbloat_grade(added_ms):
+    for limit, grade in BUFFERBLOAT_GRADES:
+        if added_ms < limit:
+            return grade
+    return "F"
+
+
+class LoadedLatency:
+    """Latenz während des Speedtests (Bufferbloat)
+
+    Misst vorab eine Leerlauf-Serie und pingt danach im festen Abstand
+    `interval`, solange der Speedtest läuft. Jede Messung wird der beim
+    Senden aktiven Phase (test.phase) zugeordnet. Läuft in einem eigenen
+    Thread mit eigener LatencyEngine und eigenem Event-Loop, den stop()
+    notfalls anhalten kann.
+    """
+
+    def __init__(self, test, target, interval=0.1, idle_count=20):
+        self.test = test
+        self.target = target
+        self.interval = interval
+        self.idle_count = idle_count
+        latency = test.latency
+        self.engine = LatencyEngine(interface=latency.interface, timeout=latency.timeout,
+                                    tcp_port=latency.tcp_port, methods=latency.methods)
+        self.stopped = threading.Event()
+        self.samples = {"download": [], "upload": []}
+        self.idle = None
+        self.thread = None
+        self.loop = None
+
+    async def _probe_loaded(self):
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        pending = []
+        i = 0
+        while not self.stopped.is_set():
+            pending.append((self.test.phase, asyncio.ensure_future(self.engine.probe(self.target))))
+            i += 1
+            await asyncio.sleep(max(0, start + i * self.interval - loop.time()))
+        for phase, task in pending:
+            result = await task
+            if phase in self.samples:
+                self.samples[phase].append(result["avg_ms"] if result.get("success") else None)
+
+    def _run(self):
+        """Thread mit eigenem Event-Loop, den nur dieser Thread schließt"""
+        loop = self.loop
+        try:
+            loop.run_until_complete(self._probe_loaded())
+        except RuntimeError:
+            # Von stop() angehalten: hängende Proben abbrechen
+            tasks = asyncio.all_tasks(loop)
+            for task in tasks:
+                task.cancel()
+            loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+        finally:
+            loop.close()
+
+    def start(self):
+        self.idle = self.engine.ping_burst(self.target, self.idle_count, self.interval)
+        self.engine.close()
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self._run, name="speedtest-latency", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """Messung beenden, wirft nie - sonst ginge das Speedtest-Ergebnis verloren
+
+        Eine einzelne Probe braucht bis zu Auflösung plus Messung, also
+        zweimal den Timeout. Hängt der Thread danach noch, wird sein Loop
+        angehalten statt von außen geschlossen.
+        """
+        self.stopped.set()
+        if self.thread is None:
+            return
+        self.thread.join(2 * self.engine.timeout + 1)
+        if self.thread.is_alive():
+            try:
+                self.loop.call_soon_threadsafe(self.loop.stop)
+            except RuntimeError:
+                pass  # Loop inzwischen geschlossen
+
+    def result(self):
+        """Leerlauf- und Last-Verteilungen, zusätzliche Latenz und Note"""
+        result = {"target": self.target, "idle": self.idle}
+        added = []
+        for phase, rtts in self.samples.items():
+            if not rtts:
+                continue
+            summary = summarize_samples(rtts)
+            result[phase] = summary
+            if self.idle.get("success") and summary["success"]:
+                added.append(summary["p50_ms"] - self.idle["p50_ms"])
+        if added:
+            result["bufferbloat_ms"] = round(max(max(added), 0), 1)
+            result["grade"] = bufferbloat_grade(result["bufferbloat_ms"])
+        return result
+
+
+def terminate(proc, grace=2.0):
+    """Beendet einen Prozess samt Prozessgruppe: erst SIGTERM, nach `grace` SIGKILL"""
+    if proc.poll() is not None:
+        return
+    for sig, wait in ((signal.SIGTERM, grace), (signal.SIGKILL, None)):
+        try:
+            os.killpg(proc.pid, sig)
+        except ProcessLookupError:
+            break
+        try:
+            proc.communicate(timeout=wait)
+            return
         except subprocess.TimeoutExpired:
-            return "", "Timeout nach 60s", 1
-        except Exception as e:
-            return "", str(e), 1
-    
+            continue
+
+
+class SpeedTest:
+    """Speedtest mit austauschbarem Backend, Fortschritts-Callback und Abbruch
+
+    Das Backend läuft im aufrufenden Thread, liefert alle `sample_interval`
+    Sekunden Durchsatz-Samples an `progress(phase, sekunden, mbps)` und bricht
+    bei cancel() oder nach `timeout` Sekunden ab, ohne Prozesse zurückzulassen.
+    """
+
+    def __init__(self, targets=None, latency=None, backend=None, timeout=60, interface="wlan0",
+                 sample_interval=0.25, loaded_latency=False, loaded_latency_target=None,
+                 loaded_latency_interval=0.1, interface_state=None):
+        self.results = {}
+        self.targets = targets or {"google": "8.8.8.8", "cloudflare": "1.1.1.1"}
+        self.latency = latency
+        self.backend = backend or CliBackend()
+        self.timeout = timeout
+        self.interface = interface
+        self.interface_state = interface_state
+        self.sample_interval = sample_interval
+        self.cancelled = threading.Event()
+        self.deadline = None
+        self.progress = None
+        self.phase = None  # "download", "upload" oder None, gesetzt vom Backend
+        self.loaded_latency = loaded_latency
+        self.loaded_latency_target = loaded_latency_target
+        self.loaded_latency_interval = loaded_latency_interval
+
+    def cancel(self):
+        """Laufenden Speedtest abbrechen (z.B. aus dem Signal-Handler)"""
+        self.cancelled.set()
+
+    def source_address(self):
+        """IPv4 des Interfaces: aus dem InterfaceState, sonst per ioctl"""
+        if not self.interface:
+            return None
+        if self.interface_state is not None:
+            return self.interface_state.get().get("ip")
+        return interface_address(self.interface)
+
+    def check(self):
+        """Wird vom Backend zwischen den Samples aufgerufen"""
+        if self.cancelled.is_set():
+            raise SpeedtestCancelled("Speedtest abgebrochen")
+        if time.monotonic() > self.deadline:
+            raise TimeoutError(f"Timeout nach {self.timeout}s")
+
+    def report(self, phase, elapsed, mbps):
+        if self.progress is not None:
+            self.progress(phase, elapsed, mbps)
+
     def check_internet(self):
-        """Prüfe Internet-Verbindung"""
+        """Prüfe Internet-Verbindung (alle Ziele gleichzeitig, eins muss antworten)"""
         print("Prüfe Internet-Verbindung...")
-        stdout, stderr, code = self.run_command("ping -c 3 8.8.8.8")
-        return code == 0
-    
-    def run_speedtest(self):
-        """Führe Speedtest durch"""
+        if self.latency is None:
+            from latency_engine import LatencyEngine
+            self.latency = LatencyEngine()
+        results = self.latency.ping_many(self.targets)
+        return any(r.get("success") for r in results.values())
+
+    def run_speedtest(self, progress=None):
+        """Führe Speedtest durch, None bei Fehler, Timeout oder Abbruch"""
+        self.cancelled.clear()
         if not self.check_internet():
             print("Keine Internet-Verbindung!")
             return None
-        
-        print("Starte Speedtest (kann 30-60s dauern)...")
-        stdout, stderr, code = self.run_command("speedtest-cli --json --source $(ip -4 addr show wlan0 | grep -oP '(?<=inet\\s)\\d+(\\.\\d+){3}')")
-        
-        if code != 0:
-            print(f"Speedtest-Fehler: {stderr}")
-            return None
-        
+
+        loaded = None
+        if self.loaded_latency:
+            target = self.loaded_latency_target or next(iter(self.targets.values()))
+            loaded = LoadedLatency(self, self.targets.get(target, target), self.loaded_latency_interval)
+            loaded.start()
+
+        print(f"Starte Speedtest über {self.backend.name}...")
+        self.progress = progress
+        self.phase = None
+        self.deadline = time.monotonic() + self.timeout
+        start = time.monotonic()
         try:
-            data = json.loads(stdout)
-            self.results = {
-                "timestamp": datetime.now().isoformat(),
-                "download_mbps": round(data.get("download", 0) / 1_000_000, 2),
-                "upload_mbps": round(data.get("upload", 0) / 1_000_000, 2),
-                "ping_ms": data.get("ping", 0),
-                "server": data.get("server", {}).get("name", "Unbekannt"),
-                "isp": data.get("client", {}).get("isp", "Unbekannt")
-            }
-            return self.results
+            result = self.backend.run(self)
+        except SpeedtestCancelled:
+            print("Speedtest abgebrochen")
+            return None
         except Exception as e:
-            print(f"Fehler beim Parsen der Speedtest-Daten: {e}")
+            print(f"Speedtest-Fehler: {e}")
             return None
-    
+        finally:
+            self.progress = None
+            if loaded is not None:
+                loaded.stop()
+
+        self.results = dict(
+            {"timestamp": datetime.now().isoformat()},
+            **result,
+            backend=self.backend.name,
+            duration_seconds=round(time.monotonic() - start, 1)
+        )
+        if loaded is not None:
+            self.results["loaded_latency"] = loaded.result()
+        return self.results
+
     def save_results(self, filename="speedtest_results.json"):
         """Speichere Ergebnisse"""
         try:
@@ -60,35 +461,156 @@ class SpeedTest:
                     all_results = json.load(f)
             except FileNotFoundError:
                 all_results = {"tests": []}
-            
+
             # Neues Ergebnis hinzufügen
             all_results["tests"].append(self.results)
-            
+
             # Speichern
             with open(filename, 'w') as f:
                 json.dump(all_results, f, indent=2)
-            
+
             print(f"Speedtest-Ergebnis in {filename} gespeichert")
         except Exception as e:
             print(f"Fehler beim Speichern: {e}")
-    
+
     def print_results(self):
         """Zeige Ergebnisse an"""
         if not self.results:
             print("Keine Ergebnisse vorhanden")
             return
-        
+
         print("\\n=== Speedtest-Ergebnis ===")
         print(f"Download: {self.results['download_mbps']} Mbps")
         print(f"Upload:   {self.results['upload_mbps']} Mbps")
         print(f"Ping:     {self.results['ping_ms']} ms")
         print(f"Server:   {self.results['server']}")
         print(f"ISP:      {self.results['isp']}")
+        loaded = self.results.get("loaded_latency")
+        if loaded and "grade" in loaded:
+            print(f"Bufferbloat: +{loaded['bufferbloat_ms']} ms (Note {loaded['grade']})")
+
+
+class BulkTransferHandler(http.server.BaseHTTPRequestHandler):
+    """Gegenstelle für HttpBackend: liefert Nullbytes und verwirft Uploads"""
+
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        parts = urlsplit(self.path)
+        if not parts.path.endswith("/download"):
+            self.send_error(404)
+            return
+        remaining = int(parse_qs(parts.query).get("bytes", [CHUNK_SIZE * 16])[0])
+        self.send_response(200)
+        self.send_header("Content-Type", "application/octet-stream")
+        self.send_header("Content-Length", str(remaining))
+        self.end_headers()
+        try:
+            while remaining > 0:
+                chunk = BULK_CHUNK if remaining >= CHUNK_SIZE else BULK_CHUNK[:remaining]
+                self.wfile.write(chunk)
+                remaining -= len(chunk)
+        except (BrokenPipeError, ConnectionResetError):
+            self.close_connection = True
+
+    def do_POST(self):
+        if not self.path.endswith("/upload"):
+            self.send_error(404)
+            return
+        received = 0
+        try:
+            if self.headers.get("Transfer-Encoding", "").lower() == "chunked":
+                while True:
+                    size = int(self.rfile.readline().split(b";")[0], 16)
+                    if size == 0:
+                        self.rfile.readline()
+                        break
+                    received += len(self.rfile.read(size))
+                    self.rfile.readline()
+            else:
+                remaining = int(self.headers.get("Content-Length", 0))
+                while remaining > 0:
+                    chunk = self.rfile.read(min(remaining, CHUNK_SIZE))
+                    if not chunk:
+                        break
+                    received += len(chunk)
+                    remaining -= len(chunk)
+        except (ValueError, ConnectionResetError):
+            self.close_connection = True
+            return
+        body = json.dumps({"received_bytes": received}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve_bulk(host="0.0.0.0", port=8080):
+    """Startet den Bulk-Transfer-Server (blockiert)"""
+    server = http.server.ThreadingHTTPServer((host, port), BulkTransferHandler)
+    server.daemon_threads = True
+    print(f"Bulk-Transfer-Server auf http://{host}:{port}")
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+
+
+def backend_from_config(config):
+    """Backend aus dem `speedtest`-Abschnitt: "cli" (speedtest-cli) oder "http" (http_url)"""
+    speedtest = config.get("speedtest", {})
+    if speedtest.get("backend", "cli") == "http":
+        if not speedtest.get("http_url"):
+            raise ValueError("speedtest.backend = http braucht speedtest.http_url")
+        return HttpBackend(speedtest["http_url"], streams=speedtest.get("http_streams", 4),
+                           phase_seconds=speedtest.get("phase_seconds", 10))
+    return CliBackend(server_id=speedtest.get("server_id"))
+
+
+def speedtest_from_config(config, targets=None, latency=None, interface_state=None):
+    """Erzeugt den SpeedTest aus wifi_config.json"""
+    speedtest = config.get("speedtest", {})
+    return SpeedTest(
+        targets=targets,
+        latency=latency,
+        backend=backend_from_config(config),
+        timeout=speedtest.get("timeout_seconds", 60),
+        interface=config.get("wifi", {}).get("interface", "wlan0"),
+        sample_interval=speedtest.get("sample_interval_ms", 250) / 1000,
+        loaded_latency=speedtest.get("loaded_latency", False),
+        loaded_latency_target=speedtest.get("loaded_latency_target"),
+        loaded_latency_interval=speedtest.get("loaded_latency_interval_ms", 100) / 1000,
+        interface_state=interface_state
+    )
+
 
 def main():
-    tester = SpeedTest()
-    result = tester.run_speedtest()
-    
+    import argparse
+    parser = argparse.ArgumentParser(description="Speedtest (speedtest-cli oder HTTP-Bulk-Transfer)")
+    parser.add_argument("--serve", type=int, metavar="PORT", help="Bulk-Transfer-Server starten")
+    parser.add_argument("--url", help="HTTP-Backend gegen diesen Server statt speedtest-cli")
+    parser.add_argument("--interface", default=None, help="Quell-Interface (Standard: Routing-Tabelle)")
+    parser.add_argument("--seconds", type=float, default=10, help="Dauer pro Phase beim HTTP-Backend")
+    parser.add_argument("--loaded-latency", action="store_true", help="Latenz während des Tests messen (Bufferbloat)")
+    args = parser.parse_args()
+
+    if args.serve:
+        serve_bulk(port=args.serve)
+        return
+
+    backend = HttpBackend(args.url, phase_seconds=args.seconds) if args.url else CliBackend()
+    tester = SpeedTest(backend=backend, interface=args.interface, timeout=max(60, args.seconds * 3),
+                       loaded_latency=args.loaded_latency)
+    if args.url:
+        # Offline-Test: nur der Server selbst muss erreichbar sein
+        tester.targets = {"server": f"{backend.host}:{backend.port}"}
+    signal.signal(signal.SIGINT, lambda signum, frame: tester.cancel())
+    result = tester.run_speedtest(progress=lambda phase, t, mbps: print(f"{phase:<8} {t:6.2f}s {mbps:9.2f} Mbps"))
+
     if result:
         tester.print_results()
         tester.save_results()
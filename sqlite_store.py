@@ -0,0 +1,332 @@
+#!/usr/bin/env python3
+import json
+import sqlite3
+import threading
+from pathlib import Path
+from result_store import ResultStore, parse_timestamp, network_band, finish_network_summary, bufferbloat_values, PING_FIELDS
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS probes (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    ts REAL NOT NULL,
+    timestamp TEXT NOT NULL,
+    networks_found INTEGER,
+    system_info TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_probes_ts ON probes(ts);
+
+CREATE TABLE IF NOT EXISTS pings (
+    probe_id INTEGER NOT NULL,
+    ts REAL NOT NULL,
+    target TEXT NOT NULL,
+    avg_ms REAL,
+    success INTEGER NOT NULL,
+    data TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_pings_ts ON pings(ts, target);
+CREATE INDEX IF NOT EXISTS idx_pings_probe ON pings(probe_id);
+
+CREATE TABLE IF NOT EXISTS speedtests (
+    probe_id INTEGER NOT NULL,
+    ts REAL NOT NULL,
+    download_mbps REAL,
+    upload_mbps REAL,
+    ping_ms REAL,
+    server TEXT,
+    isp TEXT,
+    error TEXT,
+    data TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_speedtests_ts ON speedtests(ts);
+CREATE INDEX IF NOT EXISTS idx_speedtests_probe ON speedtests(probe_id);
+
+CREATE TABLE IF NOT EXISTS scan_rows (
+    probe_id INTEGER NOT NULL,
+    ts REAL NOT NULL,
+    bssid TEXT,
+    essid TEXT,
+    signal INTEGER,
+    frequency TEXT,
+    encryption TEXT,
+    data TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_scan_rows_ts ON scan_rows(ts);
+CREATE INDEX IF NOT EXISTS idx_scan_rows_bssid ON scan_rows(bssid, ts);
+CREATE INDEX IF NOT EXISTS idx_scan_rows_probe ON scan_rows(probe_id);
+"""
+
+CHILD_TABLES = ("pings", "speedtests", "scan_rows")
+
+
+class ThreadConnections:
+    """Eine sqlite3-Verbindung pro Thread (Verbindungen dürfen nicht zwischen Threads geteilt werden)
+
+    Merkt sich alle geöffneten Verbindungen: Verbindungen beendeter Threads
+    (Scheduler-Jobs, Flask-Requests) werden beim nächsten Öffnen geschlossen,
+    close() schließt die aller Threads. Danach öffnet get() neu.
+    """
+
+    def __init__(self, path, timeout=10):
+        self.path = str(path)
+        self.timeout = timeout
+        self._local = threading.local()
+        self._conns = {}
+        self._lock = threading.Lock()
+        self._generation = 0
+
+    def get(self):
+        cached = getattr(self._local, "conn", None)
+        if cached is not None and cached[0] == self._generation:
+            return cached[1]
+        # check_same_thread=False nur, damit close() aus einem anderen Thread schließen darf
+        conn = sqlite3.connect(self.path, timeout=self.timeout, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        thread = threading.current_thread()
+        with self._lock:
+            for other in [t for t in self._conns if not t.is_alive()]:
+                self._conns.pop(other).close()
+            self._conns[thread] = conn
+            self._local.conn = (self._generation, conn)
+        return conn
+
+    def close(self):
+        with self._lock:
+            conns, self._conns = list(self._conns.values()), {}
+            self._generation += 1
+        for conn in conns:
+            conn.close()
+
+
+class SQLiteStore(ResultStore):
+    """Normalisierte Zeitreihen in SQLite, alle Tabellen über den Zeitstempel indiziert
+
+    Jede Dashboard-Abfrage wird damit zu einer begrenzten Range-Query, die
+    Laufzeit hängt von der Fenstergröße ab und nicht von der Gesamt-Historie.
+    """
+
+    def __init__(self, path, max_results=1000, prune_every=100):
+        self.path = str(path)
+        self.max_results = max_results
+        self.prune_every = prune_every
+        self._connections = ThreadConnections(self.path)
+        self._inserts = 0
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        self.conn.executescript(SCHEMA)
+
+    @property
+    def conn(self):
+        # Flask ist threaded, jeder Thread bekommt seine eigene Verbindung
+        return self._connections.get()
+
+    # --- Schreiben ---
+
+    def _insert(self, conn, result):
+        ts = parse_timestamp(result["timestamp"])
+        scan = result.get("wifi_scan")
+        cur = conn.execute(
+            "INSERT INTO probes (ts, timestamp, networks_found, system_info) VALUES (?, ?, ?, ?)",
+            (ts, result["timestamp"], scan.get("networks_found", 0) if scan is not None else None,
+             json.dumps(result["system_info"]) if "system_info" in result else None)
+        )
+        probe_id = cur.lastrowid
+
+        conn.executemany(
+            "INSERT INTO pings (probe_id, ts, target, avg_ms, success, data) VALUES (?, ?, ?, ?, ?, ?)",
+            [(probe_id, ts, name, p.get("avg_ms"), 1 if p.get("success") else 0, json.dumps(p))
+             for name, p in result.get("ping", {}).items() if isinstance(p, dict)]
+        )
+
+        st = result.get("speedtest")
+        if st is not None:
+            conn.execute(
+                "INSERT INTO speedtests (probe_id, ts, download_mbps, upload_mbps, ping_ms, server, isp, error, data) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (probe_id, ts, st.get("download_mbps"), st.get("upload_mbps"), st.get("ping_ms"),
+                 st.get("server"), st.get("isp"), st.get("error"), json.dumps(st))
+            )
+
+        if scan is not None:
+            conn.executemany(
+                "INSERT INTO scan_rows (probe_id, ts, bssid, essid, signal, frequency, encryption, data) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [(probe_id, ts, n.get("bssid"), n.get("essid"), n.get("signal"), n.get("frequency"),
+                  n.get("encryption"), json.dumps(n)) for n in scan.get("networks", [])]
+            )
+
+    def append(self, result):
+        conn = self.conn
+        with conn:
+            self._insert(conn, result)
+        self._inserts += 1
+        if self._inserts % self.prune_every == 0:
+            self.prune()
+
+    def import_results(self, results):
+        """Massenimport (Migration), eine Transaktion"""
+        count = 0
+        conn = self.conn
+        with conn:
+            for r in results:
+                if "timestamp" not in r:
+                    continue
+                try:
+                    self._insert(conn, r)
+                    count += 1
+                except ValueError:
+                    continue
+        self.prune()
+        return count
+
+    def prune(self):
+        """Entfernt alles jenseits von max_stored_results"""
+        if not self.max_results:
+            return
+        conn = self.conn
+        row = conn.execute("SELECT MAX(id) FROM probes").fetchone()
+        if not row or row[0] is None:
+            return
+        limit_id = row[0] - self.max_results
+        if limit_id <= 0:
+            return
+        with conn:
+            for table in CHILD_TABLES:
+                conn.execute(f"DELETE FROM {table} WHERE probe_id <= ?", (limit_id,))
+            conn.execute("DELETE FROM probes WHERE id <= ?", (limit_id,))
+
+    def is_empty(self):
+        return self.conn.execute("SELECT 1 FROM probes LIMIT 1").fetchone() is None
+
+    # --- Lesen ---
+
+    def iter_results(self, since=None):
+        """Rekonstruiert die ursprünglichen Ergebnis-Dicts (für Export/Migration)"""
+        conn = self.conn
+        since = since if since is not None else float("-inf")
+        probes = conn.execute(
+            "SELECT id, ts, timestamp, networks_found, system_info FROM probes WHERE ts >= ? ORDER BY ts, id",
+            (since,)
+        )
+        for probe_id, ts, timestamp, networks_found, system_info in probes:
+            result = {"timestamp": timestamp}
+            if networks_found is not None:
+                nets = [json.loads(d) for (d,) in conn.execute(
+                    "SELECT data FROM scan_rows WHERE probe_id = ?", (probe_id,))]
+                result["wifi_scan"] = {"networks_found": networks_found, "bssids_found": len(nets), "networks": nets}
+            st = conn.execute("SELECT data FROM speedtests WHERE probe_id = ?", (probe_id,)).fetchone()
+            if st:
+                result["speedtest"] = json.loads(st[0])
+            pings = conn.execute("SELECT target, data FROM pings WHERE probe_id = ?", (probe_id,)).fetchall()
+            if pings:
+                result["ping"] = {name: json.loads(d) for name, d in pings}
+            if system_info:
+                result["system_info"] = json.loads(system_info)
+            yield result
+
+    def summary(self, since):
+        conn = self.conn
+        total, last_id = conn.execute("SELECT COUNT(*), MAX(id) FROM probes").fetchone()
+        last = ""
+        if last_id is not None:
+            last = conn.execute("SELECT timestamp FROM probes ORDER BY ts DESC LIMIT 1").fetchone()[0]
+        recent, avg_wifi = conn.execute(
+            "SELECT COUNT(*), AVG(networks_found) FROM probes WHERE ts > ?", (since,)
+        ).fetchone()
+        avg_speed = conn.execute(
+            "SELECT AVG(download_mbps) FROM speedtests WHERE ts > ? AND download_mbps IS NOT NULL", (since,)
+        ).fetchone()[0]
+        return {
+            "total_probes": total,
+            "probes_in_window": recent,
+            "avg_wifi_networks": avg_wifi or 0,
+            "avg_download_speed": avg_speed or 0,
+            "last_probe": last
+        }
+
+    def speedtest_series(self, since):
+        return self.conn.execute(
+            "SELECT p.timestamp, s.download_mbps, COALESCE(s.upload_mbps, 0) FROM speedtests s "
+            "JOIN probes p ON p.id = s.probe_id "
+            "WHERE s.ts > ? AND s.download_mbps IS NOT NULL ORDER BY s.ts",
+            (since,)
+        ).fetchall()
+
+    def bufferbloat_series(self, since):
+        rows = []
+        for timestamp, loaded in self.conn.execute(
+            "SELECT p.timestamp, json_extract(s.data, '$.loaded_latency') FROM speedtests s "
+            "JOIN probes p ON p.id = s.probe_id "
+            "WHERE s.ts > ? AND json_extract(s.data, '$.loaded_latency') IS NOT NULL ORDER BY s.ts",
+            (since,)
+        ):
+            loaded = json.loads(loaded)
+            rows.append((timestamp, bufferbloat_values({"loaded_latency": loaded}), loaded.get("grade")))
+        return rows
+
+    def wifi_series(self, since):
+        return self.conn.execute(
+            "SELECT timestamp, networks_found FROM probes WHERE ts > ? AND networks_found IS NOT NULL ORDER BY ts", (since,)
+        ).fetchall()
+
+    def ping_series(self, since, field="avg_ms"):
+        if field not in PING_FIELDS:
+            raise ValueError(f"Unbekanntes Ping-Feld: {field}")
+        if field == "avg_ms":
+            value, condition = "g.avg_ms", "g.success = 1"
+        else:
+            # Burst-Statistiken stehen nur im JSON, Feldname ist gegen PING_FIELDS geprüft
+            value = f"json_extract(g.data, '$.{field}')"
+            condition = "1" if field == "loss_pct" else "g.success = 1"
+        rows = []
+        last_id = None
+        for probe_id, timestamp, target, val in self.conn.execute(
+            f"SELECT g.probe_id, p.timestamp, g.target, {value} FROM pings g "
+            "JOIN probes p ON p.id = g.probe_id "
+            f"WHERE g.ts > ? AND {condition} AND {value} IS NOT NULL ORDER BY g.ts, g.probe_id",
+            (since,)
+        ):
+            if probe_id != last_id:
+                rows.append((timestamp, {}))
+                last_id = probe_id
+            rows[-1][1][target] = val
+        return rows
+
+    def probe_health(self, since):
+        rows = self.conn.execute(
+            "SELECT p.timestamp, "
+            "(SELECT MAX(g.success) FROM pings g WHERE g.probe_id = p.id), "
+            "EXISTS(SELECT 1 FROM speedtests s WHERE s.probe_id = p.id AND s.error IS NOT NULL) "
+            "FROM probes p WHERE p.ts > ? "
+            "AND (EXISTS(SELECT 1 FROM pings g WHERE g.probe_id = p.id) "
+            "OR EXISTS(SELECT 1 FROM speedtests s WHERE s.probe_id = p.id)) "
+            "ORDER BY p.ts",
+            (since,)
+        )
+        return [(ts, None if ping_ok is None else bool(ping_ok), bool(st_failed)) for ts, ping_ok, st_failed in rows]
+
+    def version(self):
+        first, last = self.conn.execute("SELECT MIN(id), MAX(id) FROM probes").fetchone()
+        return f"{first}-{last}"
+
+    def network_summary(self, since):
+        networks = {
+            ssid: {"ssid": ssid, "first_seen": first, "last_seen": last, "max_signal": max_signal,
+                   "encryption": encryption or "Unknown", "count": count, "_aps": {}}
+            for ssid, first, last, max_signal, encryption, count in self.conn.execute(
+                "SELECT r.essid, MIN(p.timestamp), MAX(p.timestamp), MAX(COALESCE(r.signal, -100)), "
+                "r.encryption, COUNT(DISTINCT r.probe_id) FROM scan_rows r JOIN probes p ON p.id = r.probe_id "
+                "WHERE r.ts >= ? AND r.essid IS NOT NULL AND r.essid != '' GROUP BY r.essid",
+                (since,)
+            )
+        }
+        for ssid, bssid, frequency, band in self.conn.execute(
+            "SELECT DISTINCT essid, bssid, frequency, json_extract(data, '$.band') FROM scan_rows "
+            "WHERE ts >= ? AND essid IS NOT NULL AND essid != '' AND bssid IS NOT NULL AND bssid != ''",
+            (since,)
+        ):
+            if ssid in networks:
+                networks[ssid]["_aps"][bssid] = network_band({"band": band, "frequency": frequency})
+        return [finish_network_summary(entry) for entry in networks.values()]
+
+    def close(self):
+        self._connections.close()
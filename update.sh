@@ -11,6 +11,7 @@ git pull origin main
 # 3. Services neustarten (damit der neue Code geladen wird)
 echo ">>> Starte Services neu..."
 sudo systemctl restart wifi-prober.service
+sudo systemctl restart wifi-dashboard-sampler.service
 sudo systemctl restart wifi-dashboard.service
 
 echo ">>> Update fertig! System läuft mit neuer Version."
@@ -3,20 +3,55 @@ import json
 import time
 import logging
 import signal
-import subprocess
-import re
+import threading
 from datetime import datetime, timedelta
-from pathlib import Path
-from wifi_scanner import WiFiScanner
-from speedtest_runner import SpeedTest
+from wifi_scanner import WiFiScanner, count_ssids
+from speedtest_runner import speedtest_from_config
+from probe_config import load_config, get_default_config
+from result_store import open_store
+from rollups import open_rollups
+from latency_engine import engine_from_config, targets_from_config
+from scheduler import Job, Scheduler, schedule_from_config
+from interface_state import state_from_config, status_label
+from metrics import ProbeMetrics, serve_metrics
+from alerting import alerts_from_config
+from control import ControlServer, control_path
+from fleet import pusher_from_config
 
 class WiFiProberV2:
-    def __init__(self, config_file="wifi_config.json"):
+    def __init__(self, config_file=None):
         self.config = self.load_config(config_file)
         self.setup_logging()
-        self.scanner = WiFiScanner()
-        self.speedtest = SpeedTest()
+        self.store = open_store(self.config, migrate=True)
+        self.rollups = open_rollups(self.config)
+        if self.rollups.needs_rebuild():
+            self.rollups.rebuild(self.store.iter_results())
+        self.rollups.prune()
+        wifi = self.config.get("wifi", {})
+        self.scanner = WiFiScanner(
+            interface=wifi.get("interface", "wlan0"),
+            backend=wifi.get("scan_backend", "auto"),
+            timeout=wifi.get("scan_timeout_seconds", 30)
+        )
+        self.latency = engine_from_config(self.config)
+        self.metrics = ProbeMetrics()
+        self.latency.observer = self.metrics.observe_rtts
+        self.iface = state_from_config(self.config)
+        self.speedtest = speedtest_from_config(
+            self.config,
+            targets=self.get_check_targets(),
+            latency=self.latency,
+            interface_state=self.iface
+        )
+        self.alerts = alerts_from_config(self.config, self.logger)
+        # Optional: Ergebnisse zusätzlich an den zentralen Collector (None ohne "fleet.collector_url")
+        self.fleet = pusher_from_config(self.config, self.logger)
         self.running = True
+        self.scheduler = None
+        self.system_info = None
+        # Jobs laufen in eigenen Threads, Store und Rollups schreiben nacheinander
+        self.save_lock = threading.Lock()
+        self.last_timestamp = None
         self.interface = self.config.get("wifi", {}).get("interface", "wlan0")
         signal.signal(signal.SIGINT, self.signal_handler)
         signal.signal(signal.SIGTERM, self.signal_handler)
@@ -24,24 +59,11 @@ class WiFiProberV2:
     
     def load_config(self, config_file):
         """Lade Konfiguration"""
-        try:
-            with open(config_file, 'r') as f:
-                return json.load(f)
-        except FileNotFoundError:
-            print(f"Warnung: {config_file} nicht gefunden, verwende Defaults")
-            return self.get_default_config()
-        except Exception as e:
-            print(f"Fehler beim Laden der Konfiguration: {e}")
-            return self.get_default_config()
+        return load_config(config_file)
     
     def get_default_config(self):
         """Standard Konfiguration"""
-        return {
-            "general": {"probe_interval_seconds": 300, "max_stored_results": 1000, "log_level": "INFO"},
-            "wifi": {"interface": "wlan0", "scan_timeout_seconds": 30, "known_networks": []},
-            "speedtest": {"enabled": True, "timeout_seconds": 60, "server_id": None},
-            "monitoring": {"nagios_enabled": False, "checkmk_enabled": False, "alert_on_no_internet": True, "alert_on_low_speed_mbps": 10}
-        }
+        return get_default_config()
     
     def setup_logging(self):
         """Logging einrichten"""
@@ -60,63 +82,147 @@ class WiFiProberV2:
         """Signal Handler für graceful shutdown"""
         self.logger.info(f"Signal {signum} empfangen, stoppe graceful...")
         self.running = False
+        # Laufenden Speedtest abbrechen statt bis zu timeout_seconds auf ihn zu warten
+        self.speedtest.cancel()
+        if self.scheduler is not None:
+            self.scheduler.stop()
     
     def run_ping(self, target):
-        """Führe Ping aus"""
+        """Führe Ping-Burst zu einem Ziel aus (ICMP/TCP über die LatencyEngine, kein ping-Prozess)"""
+        ping_config = self.config.get("ping", {})
         try:
-            # Versuche Ping über das konfigurierte Interface
-            cmd = ['ping', '-I', self.interface, '-c', '1', '-W', '2', target]
-            result = subprocess.run(cmd, capture_output=True, text=True, timeout=3)
-            # Fallback: Falls Interface-Bind fehlschlägt, versuche normalen Ping
-            if result.returncode != 0:
-                cmd = ['ping', '-c', '1', '-W', '2', target]
-                result = subprocess.run(cmd, capture_output=True, text=True, timeout=3)
-            if result.returncode == 0:
-                match = re.search(r'time=([\d.]+)', result.stdout)
-                if match:
-                    return {"avg_ms": float(match.group(1)), "success": True}
+            return self.latency.ping_burst(
+                target,
+                count=max(1, ping_config.get("burst_count", 10)),
+                interval=ping_config.get("burst_interval_ms", 100) / 1000
+            )
         except Exception as e:
             self.logger.debug(f"Ping Fehler zu {target}: {e}")
-            pass
         return {"avg_ms": 0, "success": False}
     
+    def run_pings(self, targets):
+        """Ping-Burst zu allen Zielen gleichzeitig, begrenzt durch das Zyklus-Budget"""
+        ping_config = self.config.get("ping", {})
+        try:
+            return self.latency.ping_many_burst(
+                targets,
+                count=max(1, ping_config.get("burst_count", 10)),
+                interval=ping_config.get("burst_interval_ms", 100) / 1000,
+                budget=ping_config.get("cycle_budget_seconds", 10)
+            )
+        except Exception as e:
+            self.logger.error(f"Ping Fehler: {e}")
+        return {name: {"avg_ms": 0, "success": False} for name in targets}
+    
+    def get_check_targets(self):
+        """Ziele für den Internet-Check vor dem Speedtest"""
+        targets = targets_from_config(self.config)
+        names = self.config.get("speedtest", {}).get("check_targets", [])
+        selected = {n: t for n, t in targets.items() if n in names}
+        return selected or targets
+    
+    def make_result(self, **parts):
+        """Ergebnis-Datensatz eines Jobs, ergänzt um den zuletzt erfassten System-Status
+
+        Den Zeitstempel setzt erst record(), siehe dort.
+        """
+        result = dict(parts)
+        result["system_info"] = self.system_info or self.get_system_info()
+        return result
+    
+    def stamp(self, result):
+        """Zeitstempel setzen, nie älter als der zuletzt gespeicherte (Aufruf unter save_lock)"""
+        now = datetime.now()
+        if self.last_timestamp is not None and now <= self.last_timestamp:
+            # Uhr zurückgestellt (NTP) oder gleicher Takt: knapp hinter den letzten Datensatz
+            now = self.last_timestamp + timedelta(microseconds=1)
+        self.last_timestamp = now
+        return {"timestamp": now.isoformat(), **result}
+    
+    def record(self, result):
+        """Speichert ein Job-Ergebnis und prüft die Alerts
+
+        Der Zeitstempel entsteht unter save_lock, damit parallele Jobs in
+        Zeitstempel-Reihenfolge anhängen; HistoryCache, die since-Cursor und
+        der Export-Cursor setzen eine sortierte Historie voraus.
+        """
+        with self.save_lock:
+            result = self.stamp(result)
+            self.save_result(result)
+        self.metrics.record(result)
+        self.check_alerts(result)
+        return result
+    
+    def probe_ping(self):
+        """Ping-Burst zu allen Zielen"""
+        pings = self.run_pings(targets_from_config(self.config))
+        self.logger.info("Ping " + ", ".join(
+            f"{name}: {p['avg_ms']}ms" if p.get("success") else f"{name}: Timeout" for name, p in pings.items()
+        ))
+        return self.record(self.make_result(ping=pings))
+    
+    def probe_scan(self):
+        """WiFi Scan"""
+        networks = self.scanner.scan_networks()
+        self.logger.info(f"{count_ssids(networks)} WiFi-Netzwerke ({len(networks)} BSSIDs) gefunden")
+        return self.record(self.make_result(wifi_scan={
+            "networks_found": count_ssids(networks),
+            "bssids_found": len(networks),
+            "backend": self.scanner.last_backend,
+            "networks": networks
+        }))
+    
+    def probe_speedtest(self):
+        """Speedtest (lastet die Leitung voll aus, Ping und Scan sind per Ausschlussregel gesperrt)"""
+        speedtest_result = self.speedtest.run_speedtest(
+            progress=lambda phase, elapsed, mbps: self.logger.debug(f"Speedtest {phase} {elapsed}s: {mbps} Mbps")
+        )
+        if speedtest_result:
+            self.logger.info(f"Speedtest: {speedtest_result['download_mbps']} Mbps down")
+        return self.record(self.make_result(
+            speedtest=speedtest_result if speedtest_result else {"error": "Fehlgeschlagen"}
+        ))
+    
+    def refresh_system_info(self):
+        """System-Status auffrischen, wird mit den nächsten Ergebnissen gespeichert"""
+        self.system_info = self.get_system_info()
+        self.metrics.record_system(self.system_info, self.get_uptime_seconds())
+    
     def run_probe_cycle(self):
-        """Führe einen kompletten Probe-Zyklus aus"""
+        """Führe einen kompletten Probe-Zyklus seriell aus (einmalige Messung ohne Scheduler)"""
         self.logger.info("Starte Probe-Zyklus")
         try:
+            self.refresh_system_info()
             # 1. ZUERST Ping (auf ruhiger Leitung) - VERMEIDET BUFFERBLOAT SPIKES
-            ping_google = self.run_ping("8.8.8.8")
-            ping_cloudflare = self.run_ping("1.1.1.1")
-            self.logger.info(f"Ping Google: {ping_google['avg_ms']}ms, Cloudflare: {ping_cloudflare['avg_ms']}ms")
-            
+            self.probe_ping()
             # 2. DANN WiFi Scan
-            networks = self.scanner.scan_networks()
-            self.logger.info(f"{len(networks)} WiFi-Netzwerke gefunden")
-            
+            self.probe_scan()
             # 3. ZULETZT Speedtest (da dieser die Leitung voll auslastet)
-            speedtest_result = None
             if self.config["speedtest"]["enabled"]:
-                speedtest_result = self.speedtest.run_speedtest()
-                if speedtest_result:
-                    self.logger.info(f"Speedtest: {speedtest_result['download_mbps']} Mbps down")
-            
-            result = {
-                "timestamp": datetime.now().isoformat(),
-                "wifi_scan": {"networks_found": len(networks), "networks": networks},
-                "speedtest": speedtest_result if speedtest_result else {"error": "Deaktiviert oder fehlgeschlagen"},
-                "ping": {
-                    "google": ping_google,
-                    "cloudflare": ping_cloudflare
-                },
-                "system_info": self.get_system_info()
-            }
-            
-            self.save_result(result)
-            self.check_alerts(result)
-            return result
+                self.probe_speedtest()
+            return True
         except Exception as e:
             self.logger.error(f"Fehler im Probe-Zyklus: {e}")
-            return None
+            return False
+    
+    def build_scheduler(self):
+        """Scheduler mit einem Job pro Messung und den Ausschlussregeln aus `schedule`"""
+        scheduler = Scheduler(logger=self.logger, on_finish=self.metrics.record_job)
+        funcs = {
+            "ping": self.probe_ping,
+            "scan": self.probe_scan,
+            "speedtest": self.probe_speedtest,
+            "system_info": self.refresh_system_info
+        }
+        jobs, exclusive = schedule_from_config(self.config)
+        for name, interval, jitter, first_delay in jobs:
+            if name == "speedtest" and not self.config["speedtest"]["enabled"]:
+                continue
+            scheduler.add(Job(name, funcs[name], interval, jitter, first_delay))
+            self.logger.info(f"Job {name}: alle {interval}s (Jitter {jitter}s, Start nach {first_delay}s)")
+        for group in exclusive:
+            scheduler.exclude(*group)
+        return scheduler
     
     def get_system_info(self):
         """Holt System-Informationen"""
@@ -125,17 +231,24 @@ class WiFiProberV2:
             "uptime": self.get_uptime(),
             "memory_usage": self.get_memory_usage(),
             "wifi_interface_status": self.get_wifi_status(),
-            "wifi_ip_address": self.get_wifi_ip()
+            "wifi_ip_address": self.get_wifi_ip(),
+            "wifi_link": self.get_wifi_link()
         }
     
-    def get_uptime(self):
-        """Holt System Uptime"""
+    def get_uptime_seconds(self):
+        """System Uptime in Sekunden, None wenn nicht lesbar"""
         try:
             with open('/proc/uptime', 'r') as f:
-                uptime_seconds = float(f.readline().split()[0])
-                return str(timedelta(seconds=int(uptime_seconds)))
-        except:
+                return float(f.readline().split()[0])
+        except (OSError, ValueError, IndexError):
+            return None
+    
+    def get_uptime(self):
+        """Holt System Uptime"""
+        uptime_seconds = self.get_uptime_seconds()
+        if uptime_seconds is None:
             return "Unbekannt"
+        return str(timedelta(seconds=int(uptime_seconds)))
     
     def get_memory_usage(self):
         """Holt RAM Auslastung"""
@@ -150,96 +263,77 @@ class WiFiProberV2:
             return "Unbekannt"
     
     def get_wifi_status(self):
-        """Holt WiFi Verbindungsstatus"""
-        try:
-            result = subprocess.run(['iwconfig', self.interface], capture_output=True, text=True)
-            if 'ESSID:off' in result.stdout:
-                return "Nicht verbunden"
-            if 'ESSID:' in result.stdout:
-                # Zusätzlich IP prüfen
-                ip_result = subprocess.run(
-                    ['ip', '-4', 'addr', 'show', self.interface],
-                    capture_output=True, text=True
-                )
-                if 'inet ' in ip_result.stdout:
-                    return "Verbunden mit IP"
-                return "Verbunden ohne IP"
-            return "Interface down"
-        except:
-            return "Unbekannt"
+        """Holt WiFi Verbindungsstatus (aus dem InterfaceState, kein iwconfig/ip)"""
+        return status_label(self.iface.get())
     
     def get_wifi_ip(self):
         """Holt die IP-Adresse des WiFi Interfaces"""
-        try:
-            result = subprocess.run(
-                ['ip', '-4', 'addr', 'show', self.interface],
-                capture_output=True, text=True
-            )
-            match = re.search(r'inet\s+(\d+\.\d+\.\d+\.\d+)', result.stdout)
-            if match:
-                return match.group(1)
-        except:
-            pass
-        return None
+        return self.iface.get().get("ip")
+    
+    def get_wifi_link(self):
+        """SSID, BSSID, Signal und Bitrate der aktuellen Verbindung"""
+        snapshot = self.iface.get()
+        return {key: snapshot.get(key) for key in ("ssid", "bssid", "frequency", "signal", "tx_bitrate_mbps", "rx_bitrate_mbps")}
     
     def save_result(self, result):
-        """Speichert Ergebnis in JSON-Datei"""
-        results_file = "/home/azubi/wifi_probe_results.json"
+        """Hängt Ergebnis an den Result-Store an und schreibt die Rollups fort"""
         try:
-            if Path(results_file).exists():
-                with open(results_file, 'r') as f:
-                    data = json.load(f)
-            else:
-                data = {"probe_results": []}
-            
-            data["probe_results"].append(result)
-            
-            # Maximale Anzahl Ergebnisse begrenzen
-            max_results = self.config["general"]["max_stored_results"]
-            if len(data["probe_results"]) > max_results:
-                data["probe_results"] = data["probe_results"][-max_results:]
-            
-            with open(results_file, 'w') as f:
-                json.dump(data, f, indent=2)
+            self.store.append(result)
         except Exception as e:
             self.logger.error(f"Fehler beim Speichern: {e}")
+            return
+        try:
+            self.rollups.add_result(result)
+        except Exception as e:
+            self.logger.error(f"Fehler beim Aktualisieren der Rollups: {e}")
+        if self.fleet is not None:
+            try:
+                self.fleet.add(result)
+            except OSError as e:
+                self.logger.error(f"Fehler beim Spoolen für den Collector: {e}")
     
     def check_alerts(self, result):
-        """Prüft auf Alert-Bedingungen"""
-        monitoring = self.config["monitoring"]
-        
-        if monitoring["alert_on_no_internet"]:
-            speedtest = result.get("speedtest", {})
-            if "error" in speedtest:
-                self.logger.warning("ALERT: Keine Internet-Verbindung verfügbar")
-                self.send_alert("Keine Internet-Verbindung", "WiFi Prober kann keine Internet-Geschwindigkeit messen")
-        
-        if monitoring.get("alert_on_low_speed_mbps", 0) > 0:
-            speedtest = result.get("speedtest", {})
-            if "download_mbps" in speedtest and speedtest["download_mbps"] < monitoring["alert_on_low_speed_mbps"]:
-                self.logger.warning(f"ALERT: Niedrige Internet-Geschwindigkeit: {speedtest['download_mbps']} Mbps")
-                self.send_alert(
-                    "Niedrige Internet-Geschwindigkeit",
-                    f"Download-Speed: {speedtest['download_mbps']} Mbps (Limit: {monitoring['alert_on_low_speed_mbps']} Mbps)"
-                )
+        """Wertet die Alert-Regeln aus, gemeldet wird nur bei Zustandswechseln"""
+        try:
+            self.alerts.observe(result)
+        except Exception as e:
+            self.logger.error(f"Fehler beim Auswerten der Alerts: {e}")
     
     def send_alert(self, title, message):
-        """Sendet Alert in Log-Datei"""
+        """Einzelnen Alert über die konfigurierten Sinks verschicken"""
         self.logger.info(f"ALERT: {title} - {message}")
-        alert_data = {"timestamp": datetime.now().isoformat(), "title": title, "message": message}
-        with open("/home/azubi/alerts.json", "a") as f:
-            f.write(json.dumps(alert_data) + "\n")
+        self.alerts.notify(title, message)
     
     def run(self):
-        """Hauptschleife"""
-        interval = self.config["general"]["probe_interval_seconds"]
-        self.logger.info(f"Starte WiFi Probing Station (Intervall: {interval}s)")
-        
-        while self.running:
-            self.run_probe_cycle()
-            if self.running:
-                time.sleep(interval)
+        """Hauptschleife: Ping, Scan, Speedtest und System-Status als unabhängige Jobs"""
+        self.logger.info("Starte WiFi Probing Station")
+        monitoring = self.config.get("monitoring", {})
+        if monitoring.get("metrics_enabled", True):
+            try:
+                serve_metrics(self.metrics.registry, monitoring.get("metrics_host", "0.0.0.0"),
+                              monitoring.get("metrics_port", 9101))
+                self.logger.info(f"Prometheus-Metriken auf Port {monitoring.get('metrics_port', 9101)}/metrics")
+            except OSError as e:
+                self.logger.error(f"Metrik-Endpoint konnte nicht gestartet werden: {e}")
+        self.scheduler = self.build_scheduler()
+        control = None
+        if self.config.get("control", {}).get("enabled", True):
+            try:
+                control = ControlServer(control_path(self.config), self.scheduler, self.logger).start()
+                self.logger.info(f"Control-Socket: {control.path}")
+            except OSError as e:
+                self.logger.error(f"Control-Socket konnte nicht gestartet werden: {e}")
+        if self.running:
+            self.scheduler.run()
+        if control is not None:
+            control.close()
+        self.scheduler.join()
         
+        self.iface.stop()
+        self.alerts.close()
+        if self.fleet is not None:
+            self.fleet.close()
+        self.store.close()
         self.logger.info("WiFi Probing Station gestoppt")
 
 def main():
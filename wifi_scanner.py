@@ -4,10 +4,145 @@ import re
 import json
 import time
 from datetime import datetime
+from functools import lru_cache
+import nl80211
+from nl80211 import CIPHER_SUITES, AKM_SUITES, encryption_label, freq_to_band, freq_to_channel
+
+SCAN_BACKENDS = ("auto", "nl80211", "iwlist")
+
+# Zellen werden am Adress-Trenner zerlegt, danach jede Zelle per str.find
+# statt Zeile für Zeile mit mehreren Regex-Suchen ausgewertet
+CELL_SEPARATOR = " - Address: "
+QUALITY = re.compile(r"Quality[=:](\d+)/(\d+)")
+SIGNED_INT = re.compile(r"-?\d+")
+FREQUENCY = re.compile(r"Frequency:([0-9.]+) GHz")
+INT = re.compile(r"\d+")
+IE_HEADERS = (("rsn", "IE: IEEE 802.11i/WPA2 Version"), ("wpa", "IE: WPA Version"))
+
+# iwlist schreibt unbekannte Suites als "unknown (8)", sonst eigene Namen
+IWLIST_SUITE_NAMES = {"802.1x": "802.1X"}
+SUITE_TOKENS = re.compile(r"unknown \((\d+)\)|(\S+)")
+
+
+@lru_cache(maxsize=256)
+def suite_names(text, akm=False):
+    """Cipher/AKM-Liste einer iwlist-Zeile auf die nl80211-Namen abbilden
+
+    Die Zeilen wiederholen sich über alle Zellen eines Scans, daher gecacht.
+    """
+    table = AKM_SUITES if akm else CIPHER_SUITES
+    names = []
+    for suite, name in SUITE_TOKENS.findall(text):
+        if suite:
+            names.append(table.get(int(suite), f"unknown-{suite}"))
+        else:
+            names.append(IWLIST_SUITE_NAMES.get(name, name))
+    return tuple(names)
+
+
+def line_after(block, marker):
+    """Rest der Zeile hinter `marker` (oder None), ohne die Zelle zeilenweise zu zerlegen"""
+    i = block.find(marker)
+    if i < 0:
+        return None
+    i += len(marker)
+    eol = block.find("\n", i)
+    return block[i:eol if eol >= 0 else len(block)].rstrip()
+
+
+@lru_cache(maxsize=256)
+def parse_ie(section):
+    """Cipher/AKM-Zeilen eines WPA/RSN-IE (gecacht, die IEs gleichen sich zwischen APs)"""
+    group = line_after(section, "Group Cipher : ")
+    pairwise = line_after(section, "Pairwise Ciphers (")
+    akm = line_after(section, "Authentication Suites (")
+    return (
+        (suite_names(group) or (None,))[0] if group else None,
+        suite_names(pairwise.partition(" : ")[2]) if pairwise else (),
+        suite_names(akm.partition(" : ")[2], akm=True) if akm else ()
+    )
+
+
+def parse_cell(block, timestamp):
+    """Eine Zelle (Text ab der BSSID bis zur nächsten Zelle) auswerten"""
+    net = {
+        "timestamp": timestamp,
+        "bssid": block[:17],
+        "essid": "",
+        "signal": 0,
+        "frequency": "",
+        "encryption": "Open",
+        "channel": None,
+        "band": None,
+        "quality_pct": None,
+        "rsn": None,
+        "wpa": None,
+        "last_seen_ms": None
+    }
+
+    # iwlist gibt die Standardfelder vor den IEs aus, nur dort suchen
+    ie_start = block.find("IE: ")
+    head = block[:ie_start] if ie_start >= 0 else block
+
+    i = head.find('ESSID:"')
+    if i >= 0:
+        essid = head[i + 7:head.find("\n", i)].rstrip()
+        net["essid"] = essid[:-1] if essid.endswith('"') else essid
+
+    i = head.find("Quality")
+    if i >= 0:
+        m = QUALITY.match(head, i)
+        if m:
+            net["quality_pct"] = round(int(m.group(1)) * 100 / max(int(m.group(2)), 1))
+    i = head.find("Signal level", max(i, 0))
+    if i >= 0:
+        m = SIGNED_INT.match(head, i + 13)
+        if m:
+            net["signal"] = int(m.group(0))
+
+    m = FREQUENCY.search(head)
+    freq = 0
+    if m:
+        net["frequency"] = m.group(1) + " GHz"
+        freq = round(float(m.group(1)) * 1000)
+        net["band"] = freq_to_band(freq)
+    i = head.find("Channel:")
+    if i >= 0:
+        m = INT.match(head, i + 8)
+        net["channel"] = int(m.group(0)) if m else None
+    if net["channel"] is None and freq:
+        net["channel"] = freq_to_channel(freq)
+
+    i = head.find("Last beacon:")
+    if i >= 0:
+        m = INT.search(head, i + 12, i + 20)
+        net["last_seen_ms"] = int(m.group(0)) if m else None
+
+    if ie_start >= 0:
+        for key, header in IE_HEADERS:
+            i = block.find(header, ie_start)
+            if i >= 0:
+                end = block.find("IE: ", i + 4)
+                group, pairwise, akm = parse_ie(block[i:end if end >= 0 else len(block)])
+                net[key] = {"group_cipher": group, "pairwise_ciphers": list(pairwise), "akm_suites": list(akm)}
+
+    # Verschlüsselung erst am Ende bestimmen, unabhängig von der Zeilenreihenfolge
+    net["encryption"] = encryption_label(net["rsn"], net["wpa"], "Encryption key:on" in head)
+    return net
+
+def count_ssids(networks):
+    """Anzahl unterschiedlicher (nicht versteckter) SSIDs in einem Scan"""
+    return len({net["essid"] for net in networks if net.get("essid")})
 
 class WiFiScanner:
-    def __init__(self):
-        self.interface = "wlan0"
+    def __init__(self, interface="wlan0", backend="auto", timeout=30):
+        if backend not in SCAN_BACKENDS:
+            print(f"Unbekanntes Scan-Backend '{backend}', verwende auto")
+            backend = "auto"
+        self.interface = interface
+        self.backend = backend
+        self.timeout = timeout
+        self.last_backend = None
         self.scan_results = []
     
     def run_command(self, cmd):
@@ -21,101 +156,59 @@ class WiFiScanner:
             return "", str(e), 1
     
     def scan_networks(self):
-        """Scanne nach WiFi-Netzwerken"""
-        print(f"Scanne WiFi-Netzwerke auf {self.interface}...")
+        """Scanne nach WiFi-Netzwerken (nl80211, iwlist als Fallback)"""
+        print(f"Scanne WiFi-Netzwerke auf {self.interface} ({self.backend})...")
         
+        networks = None
+        if self.backend in ("auto", "nl80211"):
+            networks = self.scan_nl80211()
+        if not networks and self.backend in ("auto", "iwlist"):
+            # Auch ein leerer nl80211-Dump wird gegengeprüft (gefiltert oder abgebrochen)
+            if networks == []:
+                print("nl80211-Scan ohne Ergebnis, prüfe mit iwlist")
+            fallback = self.scan_iwlist()
+            if fallback is not None:
+                networks = fallback
+        if not networks:
+            return []
+        
+        # Alle BSSIDs behalten (Mesh/Enterprise: mehrere APs pro SSID, versteckte SSIDs)
+        print(f"Scan: {len(networks)} BSSIDs, {count_ssids(networks)} SSIDs ({self.last_backend})")
+        
+        return networks
+    
+    def scan_nl80211(self):
+        """Scan direkt über nl80211 (Generic Netlink), ohne sudo und Textausgabe"""
+        try:
+            networks = nl80211.scan(self.interface, timeout=self.timeout)
+        except Exception as e:
+            print(f"nl80211-Scan fehlgeschlagen: {e}")
+            return None
+        self.last_backend = "nl80211"
+        return networks
+    
+    def scan_iwlist(self):
+        """Scan über `iwlist scan` und Parsen der Textausgabe"""
         # Interface aktivieren
         stdout, stderr, code = self.run_command(f"sudo ip link set {self.interface} up")
         if code != 0:
             print(f"Fehler beim Aktivieren von {self.interface}: {stderr}")
-            return []
+            return None
         
         # Scan durchführen
         stdout, stderr, code = self.run_command(f"sudo iwlist {self.interface} scan")
         if code != 0:
             print(f"Scan-Fehler: {stderr}")
-            return []
+            return None
         
-        networks = self.parse_scan_results(stdout)
-        
-        # NEU: Deduplizierung nach SSID
-        if networks:
-            print(f"Raw-Scan: {len(networks)} Einträge gefunden")
-            networks = self.deduplicate_by_ssid(networks)
-            print(f"Nach Deduplizierung: {len(networks)} unique SSIDs")
-        
-        return networks
-    
-    def parse_scan_results(self, scan_output):
-        """Parse iwlist scan Ausgabe"""
-        networks = []
-        current_network = {}
-        
-        for line in scan_output.split('\n'):
-            line = line.strip()
-            
-            # Neues Netzwerk
-            if "Cell" in line and "Address:" in line:
-                if current_network:
-                    networks.append(current_network)
-                current_network = {
-                    "timestamp": datetime.now().isoformat(),
-                    "bssid": "",
-                    "essid": "",
-                    "signal": 0,
-                    "frequency": "",
-                    "encryption": "Open"
-                }
-                
-                # MAC-Adresse extrahieren
-                mac_match = re.search(r'([0-9A-Fa-f]{2}[:-]){5}([0-9A-Fa-f]{2})', line)
-                if mac_match:
-                    current_network["bssid"] = mac_match.group(0)
-            
-            # ESSID (Netzwerk-Name)
-            elif "ESSID:" in line:
-                essid_match = re.search(r'ESSID:"([^"]*)"', line)
-                if essid_match:
-                    current_network["essid"] = essid_match.group(1)
-            
-            # Signal-Stärke
-            elif "Signal level=" in line:
-                signal_match = re.search(r'Signal level=(-?\d+)', line)
-                if signal_match:
-                    current_network["signal"] = int(signal_match.group(1))
-            
-            # Frequenz
-            elif "Frequency:" in line:
-                freq_match = re.search(r'Frequency:([0-9.]+) GHz', line)
-                if freq_match:
-                    current_network["frequency"] = freq_match.group(1) + " GHz"
-            
-            # Verschlüsselung
-            elif "Encryption key:on" in line:
-                current_network["encryption"] = "WEP/WPA"
-            elif "WPA" in line:
-                current_network["encryption"] = "WPA/WPA2"
-        
-        # Letztes Netzwerk hinzufügen
-        if current_network:
-            networks.append(current_network)
-        
-        return networks
+        self.last_backend = "iwlist"
+        return self.parse_scan_results(stdout, datetime.now().isoformat())
     
-    def deduplicate_by_ssid(self, networks):
-        """Dedupliziere Netzwerke nach ESSID, behalte stärkstes Signal"""
-        unique = {}
-        
-        for net in networks:
-            ssid = net.get("essid", "")
-            if not ssid or ssid == "":
-                continue  # Überspringe leere SSIDs
-            
-            # Wenn SSID noch nicht gesehen oder aktuelles Signal stärker
-            if ssid not in unique or net["signal"] > unique[ssid]["signal"]:
-                unique[ssid] = net
-        
-        return list(unique.values())
+    def parse_scan_results(self, scan_output, timestamp=None):
+        """Parse iwlist scan Ausgabe (ein Zeitstempel pro Scan)"""
+        timestamp = timestamp or datetime.now().isoformat()
+        cells = scan_output.split(CELL_SEPARATOR)[1:]
+        return [parse_cell(block, timestamp) for block in cells]
     
     def save_results(self, networks, filename="wifi_scan.json"):
         """Speichere Ergebnisse in JSON-Datei"""
@@ -124,7 +217,9 @@ class WiFiScanner:
                 json.dump({
                     "scan_time": datetime.now().isoformat(),
                     "interface": self.interface,
-                    "networks_found": len(networks),
+                    "backend": self.last_backend,
+                    "networks_found": count_ssids(networks),
+                    "bssids_found": len(networks),
                     "networks": networks
                 }, f, indent=2)
             print(f"Ergebnisse in {filename} gespeichert")
@@ -135,7 +230,7 @@ class WiFiScanner:
         """Zeige Ergebnisse an"""
         print(f"\n=== {len(networks)} WiFi-Netzwerke gefunden ===")
         for i, net in enumerate(networks, 1):
-            print(f"{i:2}. {net['essid']:<20} | {net['signal']:3} dBm | {net['encryption']:<8} | {net['bssid']}")
+            print(f"{i:2}. {net['essid'] or '<versteckt>':<20} | {net['signal']:3} dBm | {net['encryption']:<8} | {net['bssid']}")
 
 def main():
     scanner = WiFiScanner()